@@ -1,13 +1,27 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from bson import ObjectId
 from datetime import datetime
-import shutil
+from typing import List
+import asyncio
+import json
 import os
+import shutil
+import uuid
+import zipfile
 
 from pymongo import MongoClient
 from app.services.pdf_processor import PDFProcessor
 from app.services.ai_extractor import AIExtractor
+from app.services.result_cache import ResultCache
+from app.services.layout_templates import LayoutTemplateStore
+from app.services.llm_metrics import llm_metrics
+from app.services.pipeline import ExtractionPipeline, PipelineOverloaded, PipelineUnavailable
+from app.services.job_queue import JobQueue, JobRunner
+from app.services.upload_store import UploadStore, UploadTooLarge
+from app.utils.config import settings
 
 # -------------------------------------------------
 # App Init
@@ -50,9 +64,15 @@ invoice_collection = db["invoices"]
 # -------------------------------------------------
 pdf_processor = PDFProcessor()
 ai_extractor = AIExtractor()
+result_cache = ResultCache() if settings.RESULT_CACHE_ENABLED else None
+layout_templates = LayoutTemplateStore() if settings.TEMPLATES_ENABLED else None
+pipeline = ExtractionPipeline(ai_extractor, result_cache, templates=layout_templates)
+job_queue = JobQueue()
+job_runner = JobRunner(job_queue, pipeline)
 
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
+upload_store = UploadStore(UPLOAD_DIR)
 
 # -------------------------------------------------
 # Health
@@ -61,6 +81,44 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 def root():
     return {"status": "Backend running"}
 
+
+@app.on_event("startup")
+async def start_job_runner():
+    job_runner.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_pipeline():
+    await job_runner.stop()
+    pipeline.shutdown()
+    await ai_extractor.aclose()
+
+
+async def run_pipeline(source, digest: str):
+    try:
+        return await pipeline.run(source, digest)
+    except PipelineOverloaded as e:
+        raise HTTPException(
+            status_code=429,
+            detail=str(e),
+            headers={"Retry-After": str(settings.OVERLOAD_RETRY_AFTER_SECONDS)}
+        )
+    except PipelineUnavailable as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(settings.OVERLOAD_RETRY_AFTER_SECONDS)}
+        )
+
+
+async def store_upload(file: UploadFile, in_memory: bool = False):
+    try:
+        if in_memory:
+            return await upload_store.read_upload(file)
+        return await upload_store.save_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
 # -------------------------------------------------
 # 1️⃣ Extract Invoice (NO SAVE)
 # -------------------------------------------------
@@ -69,15 +127,206 @@ async def extract_invoice(file: UploadFile = File(...)):
     if not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF allowed")
 
-    pdf_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(pdf_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    stored = await store_upload(file, in_memory=settings.IN_MEMORY_PROCESSING)
+
+    cached = pipeline.lookup(stored.digest)
+    if cached is not None:
+        return cached
+
+    return await run_pipeline(stored.source, stored.digest)
+
+# -------------------------------------------------
+# Extract Invoice, streamed (Server-Sent Events)
+# -------------------------------------------------
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+@app.post("/extract-invoice/stream")
+async def extract_invoice_stream(file: UploadFile = File(...)):
+    """
+    Same result as /extract-invoice as text/event-stream:
+    "stage" events, then "field" (each header field) and "item" (each line
+    item) while Gemini is still writing, then "result" with the full JSON.
+    Failures after the stream started arrive as an "error" event.
+    """
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF allowed")
+
+    stored = await store_upload(file, in_memory=settings.IN_MEMORY_PROCESSING)
+    cached = pipeline.lookup(stored.digest)
+
+    if cached is None and pipeline.pending >= pipeline.max_pending:
+        raise HTTPException(
+            status_code=429,
+            detail=f"{pipeline.pending} extractions pending (limit {pipeline.max_pending})",
+            headers={"Retry-After": str(settings.OVERLOAD_RETRY_AFTER_SECONDS)}
+        )
+
+    async def events():
+        if cached is not None:
+            yield _sse("result", cached)
+            return
+
+        try:
+            async for event in pipeline.stream(stored.source, stored.digest):
+                kind = event.pop("type")
+                yield _sse(kind, event["value"] if kind == "result" else event)
+        except Exception as e:
+            yield _sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# -------------------------------------------------
+# Bulk Extract (NDJSON stream, completion order)
+# -------------------------------------------------
+def _unpack_bulk_upload(file: UploadFile, store: UploadStore):
+    """
+    Yields (input_name, StoredUpload or None, error or None) for one uploaded
+    file; zip archives are expanded into their PDF entries.
+    """
+    name = file.filename or "upload"
+
+    if name.lower().endswith(".zip"):
+        try:
+            archive = zipfile.ZipFile(file.file)
+        except zipfile.BadZipFile:
+            yield name, None, "Invalid zip archive"
+            return
+
+        with archive:
+            for entry in archive.infolist():
+                if entry.is_dir() or entry.filename.startswith("__MACOSX/"):
+                    continue
+                if not entry.filename.lower().endswith(".pdf"):
+                    yield entry.filename, None, "Only PDF allowed"
+                    continue
+                if entry.file_size > store.max_bytes:
+                    yield entry.filename, None, "File too large"
+                    continue
+
+                try:
+                    with archive.open(entry) as src:
+                        yield entry.filename, store.save(src), None
+                except UploadTooLarge as e:
+                    yield entry.filename, None, str(e)
+        return
+
+    if not name.lower().endswith(".pdf"):
+        yield name, None, "Only PDF allowed"
+        return
+
+    try:
+        yield name, store.save(file.file), None
+    except UploadTooLarge as e:
+        yield name, None, str(e)
+
+
+@app.post("/extract-invoices/bulk")
+async def extract_invoices_bulk(files: List[UploadFile] = File(...)):
+    batch_dir = os.path.join(UPLOAD_DIR, f"bulk_{uuid.uuid4().hex}")
+    store = UploadStore(batch_dir)
+
+    # Unpack everything before streaming (uploads are closed once the response starts),
+    # off the event loop: inflating and writing a large archive takes a while
+    documents = await run_in_threadpool(
+        lambda: [doc for file in files for doc in _unpack_bulk_upload(file, store)]
+    )
+
+    limit = asyncio.Semaphore(settings.BULK_CONCURRENCY)
+
+    async def process_one(input_name: str, stored, error: str):
+        if error:
+            return {"file_name": input_name, "status": "error", "error": error}
+
+        try:
+            async with limit:
+                result = pipeline.lookup(stored.digest)
+                while result is None:
+                    # Same admission gate as single uploads; a busy server is waited out, not skipped
+                    try:
+                        result = await pipeline.run(stored.path, stored.digest)
+                    except PipelineOverloaded:
+                        await asyncio.sleep(settings.OVERLOAD_RETRY_AFTER_SECONDS)
+
+            return {"file_name": input_name, "status": "ok", "result": result}
+
+        except Exception as e:
+            return {"file_name": input_name, "status": "error", "error": str(e)}
+
+    async def stream():
+        tasks = [asyncio.create_task(process_one(*doc)) for doc in documents]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                line = await finished
+                yield json.dumps(line, default=str) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+# -------------------------------------------------
+# Async Jobs (submit → poll → fetch)
+# -------------------------------------------------
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    if not file.filename.lower().endswith(".pdf"):
+        raise HTTPException(status_code=400, detail="Only PDF allowed")
+
+    stored = await store_upload(file)
+
+    job_id = job_queue.submit(stored.path, file.filename, stored.digest)
+    job_runner.notify()
+
+    return {"job_id": job_id, "status": "queued"}
+
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+# -------------------------------------------------
+# Cache Stats
+# -------------------------------------------------
+@app.get("/cache/stats")
+def cache_stats():
+    if not result_cache:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.get_stats()}
+
+
+@app.get("/templates/stats")
+def template_stats():
+    if not layout_templates:
+        return {"enabled": False}
+    return {"enabled": True, **layout_templates.get_stats()}
+
+
+@app.get("/llm/stats")
+def llm_stats():
+    return {
+        **llm_metrics.get_stats(),
+        "repair": pipeline.repairer.stats if pipeline.repairer else {"enabled": False},
+        "pruning": pipeline.pruner.stats if pipeline.pruner else {"enabled": False},
+    }
 
-    text = pdf_processor.extract_text(pdf_path)
-    tables = pdf_processor.extract_tables(pdf_path)
-    result = ai_extractor.extract_from_text(text, tables)
 
-    return result
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(
+        llm_metrics.render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
 
 # -------------------------------------------------
 # 2️⃣ Save Invoice to MongoDB
@@ -99,7 +348,14 @@ def save_invoice(payload: dict):
         }
 
         res = invoice_collection.insert_one(doc)
-        return {"success": True, "id": str(res.inserted_id)}
+
+        # A saved extraction is a confirmed one: learn the vendor's layout from it
+        template = None
+        if layout_templates:
+            metadata = payload.get("_metadata") or {}
+            template = layout_templates.learn(metadata.get("document_id"), payload)
+
+        return {"success": True, "id": str(res.inserted_id), "template": template}
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
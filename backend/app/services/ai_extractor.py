@@ -1074,95 +1074,333 @@
 # app/services/ai_extractor.py
 
 import json
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
-import google.generativeai as genai
+from app.services.compact_output import COMPACT_JSON_FORMAT, expand, expand_event
+from app.services.json_stream import IncrementalJSONParser
+from app.services.llm_backends import LLMBackend, create_backend
+from app.services.llm_metrics import LLMMetrics, call_cost, llm_metrics
 from app.utils.config import settings
 
 
-class AIExtractor:
-    def __init__(self):
-        if not settings.GEMINI_API_KEY:
-            raise RuntimeError("❌ GEMINI_API_KEY not set in .env")
+def _cell(value) -> str:
+    if value is None:
+        return ""
+    # A literal "|" is escaped, not replaced: part numbers, references and
+    # IBANs must reach the model exactly as printed
+    return " ".join(str(value).split()).replace("|", "\\|")
 
-        genai.configure(api_key=settings.GEMINI_API_KEY)
 
-        self.model = genai.GenerativeModel(
-            model_name="models/gemini-2.5-flash"
-        )
+def format_tables(tables: List, compact: bool = True) -> str:
+    """
+    Encode tables for the prompt.
 
-    # --------------------------------------------------
-    # PROMPT
-    # --------------------------------------------------
+    compact=True: per table, one header row then one " | "-delimited row
+    per record. json.dumps(indent=2) repeats every header on every row plus
+    indentation, which is where most prompt tokens went on item-heavy invoices.
+    """
+    if not compact:
+        return json.dumps(tables, indent=2)
 
-    def _prompt(self, text: str, tables: List[Dict]) -> str:
-        return f"""
-You are a STRICT invoice extraction engine.
+    blocks = ['(first row of each table = column headers, cells separated by " | ", "\\|" = literal "|")']
+    for i, table in enumerate(tables, start=1):
+        rows = table if isinstance(table, list) else [table]
+        if not rows or not all(isinstance(r, dict) for r in rows):
+            blocks.append(f"[table {i}]\n{json.dumps(table, separators=(',', ':'), ensure_ascii=False)}")
+            continue
+
+        headers = list(dict.fromkeys(k for row in rows for k in row))
+        lines = [f"[table {i}]", " | ".join(_cell(h) for h in headers)]
+        for row in rows:
+            lines.append(" | ".join(_cell(row.get(h)) for h in headers))
+        blocks.append("\n".join(lines))
+
+    return "\n\n".join(blocks)
+
+
+PROMPT_RULES = """You are a STRICT invoice extraction engine.
 
 RULES:
 - Use ONLY values present in tables or text
+- In TABLES, "\\|" inside a cell is a literal "|" character, not a cell separator
 - Convert all dates to YYYY-MM-DD format
 - DO NOT calculate totals
 - DO NOT guess numbers
 - If missing → null
 - Output ONLY valid JSON
-- No explanations
+- No explanations"""
 
-TEXT:
-{text}
-
-TABLES:
-{json.dumps(tables, indent=2)}
-
-JSON FORMAT:
-{{
+JSON_FORMAT = """{
   "invoice_number": null,
   "invoice_date": null,
-  "vendor": {{
+  "vendor": {
     "name": null,
     "address": null
-  }},
-  "customer": {{
+  },
+  "customer": {
     "name": null
-  }},
+  },
   "items": [
-    {{
+    {
       "description": "",
       "quantity": null,
       "unit_price": null,
       "total": null
-    }}
+    }
   ],
   "subtotal": null,
   "tax_amount": null,
   "total": null,
   "currency": "EUR"
-}}
+}"""
+
+# Bump whenever PROMPT_RULES / JSON_FORMAT change (reported in _metadata["llm"])
+PROMPT_VERSION = "2"
+
+# Identical for every call so the provider can serve it from its context cache;
+# everything document-specific goes after it
+PROMPT_PREFIX = f"""{PROMPT_RULES}
+
+JSON FORMAT:
+{JSON_FORMAT}
+"""
+
+# COMPACT_OUTPUT: same rules, short-key answer expanded locally (see compact_output)
+COMPACT_PROMPT_PREFIX = f"""{PROMPT_RULES}
+
+JSON FORMAT:
+{COMPACT_JSON_FORMAT}
 """
 
+
+class AIExtractor:
+    def __init__(
+        self,
+        backend: Optional[LLMBackend] = None,
+        metrics: Optional[LLMMetrics] = None,
+        compact_output: Optional[bool] = None
+    ):
+        # LLM_PROVIDER picks the backend: "gemini" (default) or "http" (offline stand-in)
+        self.backend = backend or create_backend()
+        self.metrics = metrics or llm_metrics
+        self.compact_output = settings.COMPACT_OUTPUT if compact_output is None else compact_output
+        self.prefix = COMPACT_PROMPT_PREFIX if self.compact_output else PROMPT_PREFIX
+
+    async def aclose(self):
+        await self.backend.aclose()
+
     # --------------------------------------------------
-    # CORE EXTRACTION (PDF → TEXT + TABLES)
+    # PROMPT
     # --------------------------------------------------
 
-    def extract(self, text: str, tables: List[Dict]) -> Dict:
-        response = self.model.generate_content(
-            self._prompt(text, tables),
-            generation_config={
-                "temperature": 0,
-                "response_mime_type": "application/json"
-            }
+    def _prompt(self, text: str, tables: List[Dict], part: Optional[Tuple[int, int]] = None) -> str:
+        """Per-document part of the prompt; the prefix (self.prefix) is sent in front of it."""
+        return f"""{self._part_rule(part)}
+TEXT:
+{text}
+
+TABLES:
+{format_tables(tables, compact=settings.COMPACT_TABLES)}
+"""
+
+    @staticmethod
+    def _part_rule(part: Optional[Tuple[int, int]]) -> str:
+        if not part:
+            return ""
+        index, count = part
+        return (
+            f"\n- This is part {index} of {count} of ONE long invoice; extract only what appears in this part"
+            "\n- List every item row in this part; header fields or totals not shown here → null\n"
         )
 
-        data = json.loads(response.text)
+    def _batch_prompt(self, docs: Dict[str, Tuple[str, List[Dict]]]) -> str:
+        """
+        Several invoices in one request, after the shared prefix;
+        the model answers with one object keyed by invoice id.
+        """
+        sections = []
+        for invoice_id, (text, tables) in docs.items():
+            sections.append(f"""
+=== INVOICE {invoice_id} ===
+TEXT:
+{text}
+
+TABLES:
+{format_tables(tables, compact=settings.COMPACT_TABLES)}
+""")
+
+        ids = ", ".join(f'"{invoice_id}"' for invoice_id in docs)
+        return f"""
+- Extract EACH invoice below independently; never mix values between invoices
+{"".join(sections)}
+OUTPUT: one JSON object whose keys are the invoice ids ({ids}),
+each value using the JSON FORMAT above
+"""
+
+    # --------------------------------------------------
+    # INSTRUMENTATION
+    # --------------------------------------------------
+
+    @contextmanager
+    def _tracked(self, kind: str):
+        """
+        Wraps one LLM call. Yields the per-call info dict the backend fills
+        with token counts and retries; wall time and cost are added here and
+        the call is recorded in LLMMetrics (errors included).
+        """
+        info = {
+            "model": self.backend.model,
+            "provider": self.backend.provider,
+            "kind": kind,
+            "prompt_version": PROMPT_VERSION,
+            "output_format": "compact" if self.compact_output else "full"
+        }
+        start = time.perf_counter()
+        try:
+            yield info
+        except Exception:
+            self._record(info, start, error=True)
+            raise
+        self._record(info, start)
+
+    def _record(self, info: Dict, start: float, error: bool = False):
+        info["seconds"] = round(time.perf_counter() - start, 3)
+
+        # How much of the static prefix the provider served from its cache
+        prefix_tokens = info.get("prefix_tokens") or 0
+        cached = min(prefix_tokens, info.get("cached_tokens") or 0)
+        info["prefix_cached_tokens"] = cached
+        info["prefix_billed_tokens"] = prefix_tokens - cached
+
+        info["cost_usd"] = round(call_cost(
+            info.get("prompt_tokens") or 0,
+            info.get("output_tokens") or 0,
+            info.get("cached_tokens") or 0
+        ), 6)
+        self.metrics.record_call(info, info["kind"], error)
+
+    # --------------------------------------------------
+    # CORE EXTRACTION (PDF → TEXT + TABLES)
+    # --------------------------------------------------
+
+    def _parse_response(self, raw: str, info: Optional[Dict] = None) -> Dict:
+        data = json.loads(raw)
+        if self.compact_output:
+            data = expand(data)
 
         data["_metadata"] = {
             "extraction_timestamp": datetime.now().isoformat(),
-            "confidence": "HIGH (digital pdf)"
+            "confidence": "HIGH (digital pdf)",
+            "llm": info
         }
 
         return data
 
+    def extract(self, text: str, tables: List[Dict], part: Optional[Tuple[int, int]] = None) -> Dict:
+        with self._tracked("chunk" if part else "single") as info:
+            raw = self.backend.generate(self._prompt(text, tables, part), info, self.prefix)
+        return self._parse_response(raw, info)
+
+    async def extract_async(self, text: str, tables: List[Dict], part: Optional[Tuple[int, int]] = None) -> Dict:
+        """
+        Same contract as `extract`, but non-blocking: goes through the shared
+        AsyncGeminiClient (in-flight limit + RPM/TPM token buckets).
+        """
+        with self._tracked("chunk" if part else "single") as info:
+            raw = await self.backend.generate_async(self._prompt(text, tables, part), info, self.prefix)
+
+        return self._parse_response(raw, info)
+
+    async def extract_stream(self, text: str, tables: List[Dict]) -> AsyncIterator[Dict]:
+        """
+        Streamed variant of `extract_async`.
+
+        Yields IncrementalJSONParser events ("field" per header field,
+        "item" per line item) while the model is still writing, then
+        {"type": "result", "value": <same dict as extract_async>}.
+        """
+        parser = IncrementalJSONParser(("i",) if self.compact_output else ("items",))
+        with self._tracked("stream") as info:
+            async for piece in self.backend.stream_async(self._prompt(text, tables), info, self.prefix):
+                for event in parser.feed(piece):
+                    yield expand_event(event) if self.compact_output else event
+
+        data = expand(parser.result()) if self.compact_output else parser.result()
+        data["_metadata"] = {
+            "extraction_timestamp": datetime.now().isoformat(),
+            "confidence": "HIGH (digital pdf)",
+            "streamed": True,
+            "llm": info
+        }
+        yield {"type": "result", "value": data}
+
+    def extract_batch(self, docs: Dict[str, Tuple[str, List[Dict]]]) -> Dict[str, Dict]:
+        """
+        Extract several invoices with one Gemini call.
+
+        Args:
+            docs: invoice id -> (text, tables)
+
+        Returns:
+            invoice id -> extracted data (ids the model dropped are absent)
+        """
+        with self._tracked("batch") as info:
+            raw = self.backend.generate(self._batch_prompt(docs), info, self.prefix)
+
+        return self._batch_results(raw, docs, info)
+
+    async def extract_batch_async(self, docs: Dict[str, Tuple[str, List[Dict]]]) -> Dict[str, Dict]:
+        """Same contract as `extract_batch`, through the shared AsyncGeminiClient (rate limiter)."""
+        with self._tracked("batch") as info:
+            raw = await self.backend.generate_async(self._batch_prompt(docs), info, self.prefix)
+
+        return self._batch_results(raw, docs, info)
+
+    def _batch_results(self, raw: str, docs: Dict[str, Tuple[str, List[Dict]]], info: Dict) -> Dict[str, Dict]:
+        data = json.loads(raw)
+        if not isinstance(data, dict):
+            raise ValueError("Batch response is not a JSON object keyed by invoice id")
+
+        results = {}
+        for invoice_id in docs:
+            item = data.get(invoice_id)
+            if not isinstance(item, dict):
+                continue
+            if self.compact_output:
+                item = expand(item)
+
+            item["_metadata"] = {
+                "extraction_timestamp": datetime.now().isoformat(),
+                "confidence": "HIGH (digital pdf)",
+                "batch_size": len(docs),
+                # One call shared by the whole batch
+                "llm": info
+            }
+            results[invoice_id] = item
+
+        return results
+
+    # --------------------------------------------------
+    # FOLLOW-UP CALLS
+    # --------------------------------------------------
+
+    def complete(self, prompt: str, kind: str) -> Tuple[Dict, Dict]:
+        """
+        One JSON call with a caller-built prompt (no extraction prefix),
+        e.g. the FieldRepairer follow-up. Returns (parsed JSON, llm info).
+        """
+        with self._tracked(kind) as info:
+            raw = self.backend.generate(prompt, info)
+        return json.loads(raw), info
+
+    async def complete_async(self, prompt: str, kind: str) -> Tuple[Dict, Dict]:
+        with self._tracked(kind) as info:
+            raw = await self.backend.generate_async(prompt, info)
+        return json.loads(raw), info
+
     # --------------------------------------------------
     # FASTAPI COMPATIBILITY METHOD (IMPORTANT)
     # --------------------------------------------------
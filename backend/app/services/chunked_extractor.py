@@ -0,0 +1,213 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from app.services.ai_extractor import format_tables
+from app.services.gemini_client import estimate_tokens
+from app.utils.config import settings
+
+HEADER_FIELDS = ("invoice_number", "invoice_date", "vendor", "customer", "currency")
+TOTAL_FIELDS = ("subtotal", "tax_amount", "total")
+
+# How far back into the previous chunk a repeated item row is looked for
+BOUNDARY_ITEMS = 5
+
+
+def split_into_chunks(parsed: Dict, pages_per_chunk: int, max_tokens: int) -> List[Dict]:
+    """
+    Split a parsed document on page boundaries.
+
+    A chunk closes after `pages_per_chunk` pages or when the next page
+    would push it past `max_tokens`; a table always travels with the page
+    it was found on.
+
+    Returns:
+        [{"pages": [first, last], "text", "tables", "tokens"}, ...]
+    """
+    text = parsed["text"]
+    offsets = parsed.get("page_offsets") or []
+    table_pages = parsed.get("table_page_numbers") or []
+
+    tables_on = {}
+    for page, table in zip(table_pages, parsed["tables"]):
+        tables_on.setdefault(page, []).append(table)
+
+    chunks, current = [], None
+
+    def close():
+        if current:
+            first, last = current["span"]
+            chunks.append({
+                "pages": [current["pages"][0], current["pages"][-1]],
+                "text": text[first:last],
+                "tables": current["tables"],
+                "tokens": current["tokens"],
+            })
+
+    for span in offsets:
+        page_tables = tables_on.get(span["page"], [])
+        tokens = estimate_tokens(text[span["start"]:span["end"]])
+        if page_tables:
+            tokens += estimate_tokens(format_tables(page_tables, compact=settings.COMPACT_TABLES))
+
+        if current and (
+            len(current["pages"]) >= pages_per_chunk or current["tokens"] + tokens > max_tokens
+        ):
+            close()
+            current = None
+
+        if current is None:
+            current = {"pages": [], "span": [span["start"], span["end"]], "tables": [], "tokens": 0}
+
+        current["pages"].append(span["page"])
+        current["span"][1] = span["end"]
+        current["tables"].extend(page_tables)
+        current["tokens"] += tokens
+
+    close()
+    return chunks
+
+
+def _item_key(item: Dict):
+    return (
+        " ".join(str(item.get("description") or "").lower().split()),
+        item.get("quantity"),
+        item.get("unit_price"),
+        item.get("total"),
+    )
+
+
+def _has_value(value) -> bool:
+    """
+    A chunk without the header still answers vendor / customer as
+    {"name": null, "address": null}; that must not beat a later chunk's
+    real party, so a dict only counts when one of its fields is set.
+    """
+    if isinstance(value, dict):
+        return any(_has_value(v) for v in value.values())
+    return value not in (None, "")
+
+
+def merge_chunks(results: List[Dict]) -> Dict:
+    """
+    Header fields from the first chunk that has them, totals from the last
+    chunk that has them, items concatenated in page order.
+
+    An item row repeated at the top of a chunk that already closed the
+    previous chunk (carried-over rows, repeated last line before a page
+    break) is dropped once; repeats elsewhere are kept as real line items.
+    """
+    merged = {}
+
+    for field in HEADER_FIELDS:
+        merged[field] = next((r[field] for r in results if _has_value(r.get(field))), None)
+    for field in TOTAL_FIELDS:
+        merged[field] = next((r[field] for r in reversed(results) if r.get(field) is not None), None)
+
+    items, duplicates = [], 0
+    previous_tail: List = []
+    for result in results:
+        chunk_items = [item for item in result.get("items") or [] if isinstance(item, dict)]
+
+        leading = 0
+        while leading < len(chunk_items) and _item_key(chunk_items[leading]) in previous_tail:
+            previous_tail.remove(_item_key(chunk_items[leading]))
+            leading += 1
+
+        duplicates += leading
+        items.extend(chunk_items[leading:])
+        previous_tail = [_item_key(item) for item in chunk_items[-BOUNDARY_ITEMS:]]
+
+    merged["items"] = items
+    merged["_metadata"] = {"duplicate_items_dropped": duplicates}
+    return merged
+
+
+def merge_llm_usage(results: List[Dict]) -> Optional[Dict]:
+    """Sum the per-chunk _metadata["llm"] records into one for the document."""
+    calls = [(r.get("_metadata") or {}).get("llm") for r in results]
+    calls = [c for c in calls if c]
+    if not calls:
+        return None
+
+    usage = {"model": calls[0].get("model"), "provider": calls[0].get("provider"), "kind": "chunked", "calls": len(calls)}
+    for key in ("prompt_tokens", "output_tokens", "total_tokens", "cached_tokens",
+                "prefix_cached_tokens", "prefix_billed_tokens", "retries"):
+        usage[key] = sum(c.get(key) or 0 for c in calls)
+    usage["cost_usd"] = round(sum(c.get("cost_usd") or 0.0 for c in calls), 6)
+    return usage
+
+
+class ChunkedExtractor:
+    """
+    Chunked Extractor
+    =================
+    Long invoices (CHUNK_MIN_PAGES+) are split on page boundaries into
+    chunks of CHUNK_PAGES pages / CHUNK_MAX_TOKENS tokens. Every chunk is
+    extracted concurrently (same rate limiter as single calls), then the
+    partial results are merged: header from the first chunk, totals from
+    the last, items concatenated with boundary de-duplication.
+
+    Per-chunk timings end up in _metadata["chunks"], the summed token
+    usage and cost in _metadata["llm"].
+    """
+
+    def __init__(
+        self,
+        ai_extractor,
+        executor=None,
+        min_pages: Optional[int] = None,
+        pages_per_chunk: Optional[int] = None,
+        max_tokens: Optional[int] = None
+    ):
+        self.ai_extractor = ai_extractor
+        self.executor = executor
+        self.min_pages = min_pages or settings.CHUNK_MIN_PAGES
+        self.pages_per_chunk = pages_per_chunk or settings.CHUNK_PAGES
+        self.max_tokens = max_tokens or settings.CHUNK_MAX_TOKENS
+
+    def applies(self, parsed: Dict) -> bool:
+        return len(parsed.get("page_offsets") or []) >= self.min_pages
+
+    async def _extract_chunk(self, chunk: Dict, part: tuple) -> Dict:
+        if settings.LLM_ASYNC or self.executor is None:
+            return await self.ai_extractor.extract_async(chunk["text"], chunk["tables"], part)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            self.ai_extractor.extract,
+            chunk["text"],
+            chunk["tables"],
+            part
+        )
+
+    async def extract(self, parsed: Dict) -> Dict:
+        chunks = split_into_chunks(parsed, self.pages_per_chunk, self.max_tokens)
+        timings = [None] * len(chunks)
+
+        async def run(index: int, chunk: Dict) -> Dict:
+            start = time.perf_counter()
+            result = await self._extract_chunk(chunk, (index + 1, len(chunks)))
+            timings[index] = {
+                "pages": chunk["pages"],
+                "tokens": chunk["tokens"],
+                "seconds": round(time.perf_counter() - start, 3),
+                "items": len(result.get("items") or []),
+                "cost_usd": ((result.get("_metadata") or {}).get("llm") or {}).get("cost_usd"),
+            }
+            return result
+
+        start = time.perf_counter()
+        # Any chunk failing fails the document: a partial item list is worse than a retry
+        results = await asyncio.gather(*(run(i, chunk) for i, chunk in enumerate(chunks)))
+
+        merged = merge_chunks(results)
+        merged["_metadata"].update({
+            **(results[0].get("_metadata") or {}),
+            "chunked": True,
+            "chunks": timings,
+            "chunk_wall_seconds": round(time.perf_counter() - start, 3),
+            "llm": merge_llm_usage(results),
+        })
+        return merged
@@ -0,0 +1,89 @@
+from typing import Dict, List
+
+# Response format asked for with COMPACT_OUTPUT: short keys, vendor as a
+# pair and every line item as a positional array. Most output tokens of a
+# long invoice went into repeating the four item keys on every row.
+COMPACT_JSON_FORMAT = """{"n": invoice_number, "d": invoice_date, "v": [vendor name, vendor address], "c": customer name,
+ "i": [[description, quantity, unit_price, total], ...],
+ "s": subtotal, "x": tax_amount, "t": total, "cur": "EUR"}
+- "i": one 4-element array per line item, in that order
+- Write the JSON on one line, no indentation"""
+
+FIELDS = {
+    "n": "invoice_number",
+    "d": "invoice_date",
+    "s": "subtotal",
+    "x": "tax_amount",
+    "t": "total",
+    "cur": "currency",
+}
+ITEM_FIELDS = ("description", "quantity", "unit_price", "total")
+
+COMPACT_KEYS = set(FIELDS) | {"v", "c", "i"}
+FULL_KEYS = set(FIELDS.values()) | {"vendor", "customer", "items"}
+
+
+def _pair(value) -> List:
+    values = list(value) if isinstance(value, list) else [value]
+    return (values + [None, None])[:2]
+
+
+def expand_item(row):
+    """One compact item array → {"description", "quantity", "unit_price", "total"}."""
+    if not isinstance(row, list):
+        return row
+    return dict(zip(ITEM_FIELDS, (row + [None] * len(ITEM_FIELDS))[:len(ITEM_FIELDS)]))
+
+
+def expand_field(key: str, value):
+    """(full field name, value in the full shape) for one compact top-level key."""
+    if key in FIELDS:
+        return FIELDS[key], value
+    if key == "v":
+        if isinstance(value, dict):
+            return "vendor", value
+        name, address = _pair(value)
+        return "vendor", {"name": name, "address": address}
+    if key == "c":
+        return "customer", value if isinstance(value, dict) else {"name": value}
+    if key == "i":
+        return "items", [expand_item(row) for row in value or []]
+    return key, value
+
+
+def expand(data):
+    """
+    A compact answer in the full JSON FORMAT shape. An answer already in
+    the full shape (the model ignored the compact format) is returned as is.
+    """
+    if not isinstance(data, dict) or not (set(data) & COMPACT_KEYS) or (set(data) & FULL_KEYS):
+        return data
+    return dict(expand_field(key, value) for key, value in data.items())
+
+
+def expand_event(event: Dict) -> Dict:
+    """IncrementalJSONParser event on a compact answer, renamed / expanded."""
+    if event["type"] == "field":
+        name, value = expand_field(event["name"], event["value"])
+        return {**event, "name": name, "value": value}
+    if event["type"] == "item" and event["field"] == "i":
+        return {**event, "field": "items", "value": expand_item(event["value"])}
+    return event
+
+
+def compact(data: Dict) -> Dict:
+    """Inverse of `expand` (used by the Gemini stand-in and benchmarks)."""
+    names = {full: short for short, full in FIELDS.items()}
+    out = {}
+    for key, value in data.items():
+        if key in names:
+            out[names[key]] = value
+        elif key == "vendor":
+            out["v"] = [(value or {}).get("name"), (value or {}).get("address")]
+        elif key == "customer":
+            out["c"] = (value or {}).get("name")
+        elif key == "items":
+            out["i"] = [[item.get(field) for field in ITEM_FIELDS] for item in value or []]
+        else:
+            out[key] = value
+    return out
@@ -0,0 +1,348 @@
+import asyncio
+import json
+from typing import Dict, List, Optional, Tuple
+
+from app.services.ai_extractor import PROMPT_RULES, format_tables
+from app.services.gemini_client import estimate_tokens
+from app.services.rule_extractor import (
+    GROSS_LABEL_RE, NET_LABEL_RE, PLAIN_TOTAL_RE, TAX_LABEL_RE, find_amounts, item_columns, parse_amount
+)
+from app.utils.config import settings
+
+TOTAL_FIELDS = ("subtotal", "tax_amount", "total")
+HEADER_FIELDS = ("invoice_number", "invoice_date", "vendor")
+
+# Shape of the object-valued fields, spelled out in the repair prompt
+FIELD_FORMATS = {
+    "vendor": 'vendor = an object {"name", "address"}, never a plain string',
+    "customer": 'customer = an object {"name"}, never a plain string',
+    "items": 'items = the complete list of line items, each {"description", "quantity", "unit_price", "total"}',
+}
+
+# Same rounding slack as the rule extractor's consistency checks
+TOLERANCE = 0.011
+
+# Groups are repaired in this order: items are checked against the (repaired) totals
+GROUPS = ("header", "totals", "items")
+
+
+def _amount(value) -> Optional[float]:
+    try:
+        return parse_amount(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _party(value) -> Dict:
+    """vendor / customer as the object the JSON FORMAT asks for ({} when it is not one)."""
+    return value if isinstance(value, dict) else {}
+
+
+def normalize_parties(data: Dict) -> Dict:
+    """`data` with a plain-string vendor / customer turned into {"name": ...}."""
+    for field in ("vendor", "customer"):
+        if isinstance(data.get(field), str):
+            data[field] = {"name": data[field]}
+    return data
+
+
+def missing_header(data: Dict) -> List[str]:
+    missing = [field for field in ("invoice_number", "invoice_date") if not data.get(field)]
+    if not _party(data.get("vendor")).get("name"):
+        missing.append("vendor")
+    return missing
+
+
+def find_issues(data: Dict) -> Dict[str, List[str]]:
+    """
+    Missing or inconsistent fields of an extraction, by group:
+    "header" (invoice number, date, vendor name), "totals" (total missing,
+    subtotal + tax != total) and "items" (no items, item totals not adding
+    up to the subtotal). Groups without issues are absent.
+    """
+    if not isinstance(data, dict):
+        return {"header": ["answer is not a JSON object"]}
+    issues = {}
+
+    header = missing_header(data)
+    if header:
+        issues["header"] = [f"{field} missing" for field in header]
+
+    subtotal, tax, total = (_amount(data.get(field)) for field in TOTAL_FIELDS)
+    totals = []
+    if total is None:
+        totals.append("total missing")
+    elif subtotal is not None and tax is not None and abs(subtotal + tax - total) > TOLERANCE:
+        totals.append(f"subtotal {subtotal:.2f} + tax_amount {tax:.2f} != total {total:.2f}")
+    if totals:
+        issues["totals"] = totals
+
+    items = [item for item in data.get("items") or [] if isinstance(item, dict)]
+    if not items:
+        issues["items"] = ["no line items"]
+    else:
+        line_totals = [_amount(item.get("total")) for item in items]
+        target = subtotal
+        if target is None and total is not None:
+            target = total - (tax or 0)
+
+        if None in line_totals:
+            issues["items"] = [f"{line_totals.count(None)} item(s) without total"]
+        elif target is not None and abs(sum(line_totals) - target) > TOLERANCE * max(1, len(items)):
+            issues["items"] = [f"item totals sum to {sum(line_totals):.2f}, expected {target:.2f}"]
+
+    return issues
+
+
+# Lines kept from the top of the first page for header fields,
+# and around the labelled total lines for the totals
+HEADER_LINES = 15
+TOTALS_WINDOW = 3
+
+
+def _pages(parsed: Dict) -> List[Tuple[int, str]]:
+    text = parsed.get("text") or ""
+    offsets = parsed.get("page_offsets") or []
+    if not offsets:
+        return [(1, text)]
+    return [(span["page"], text[span["start"]:span["end"]]) for span in offsets]
+
+
+TOTAL_LABELS = (GROSS_LABEL_RE, NET_LABEL_RE, TAX_LABEL_RE, PLAIN_TOTAL_RE)
+
+
+def _total_label(line: str) -> Optional[int]:
+    """Which TOTAL_LABELS entry an amount line starts with, if any."""
+    line = " ".join(line.split())
+    if not find_amounts(line):
+        return None
+    return next((i for i, regex in enumerate(TOTAL_LABELS) if regex.match(line)), None)
+
+
+def _rows(table) -> List[Dict]:
+    return [row for row in (table if isinstance(table, list) else []) if isinstance(row, dict)]
+
+
+def select_context(groups: List[str], parsed: Dict) -> Tuple[List[Tuple[str, str]], List[int]]:
+    """
+    What a repair of `groups` needs to see, as ([(label, text), ...],
+    indexes into parsed["tables"]):
+    - header: the top of the first page
+    - totals: the labelled total / tax / net lines (with a few lines
+      around them) on the page with the most kinds of them (the later
+      page on a tie), plus that page's non-item tables
+    - items:  the item tables (header keywords), or the pages holding the
+      most amount-bearing lines when there are none
+    """
+    pages = _pages(parsed)
+    tables = parsed.get("tables") or []
+    table_pages = parsed.get("table_page_numbers") or []
+    item_tables = [i for i, table in enumerate(tables) if item_columns(_rows(table))]
+    sections, table_indexes = [], set()
+
+    if "header" in groups:
+        page, text = pages[0]
+        sections.append((f"page {page}, top", "\n".join(text.strip().splitlines()[:HEADER_LINES])))
+
+    if "totals" in groups:
+        best = None
+        for page, text in pages:
+            lines = text.splitlines()
+            labels = {i: _total_label(line) for i, line in enumerate(lines)}
+            labelled = [i for i, label in labels.items() if label is not None]
+            kinds = len({labels[i] for i in labelled})
+            if labelled and (best is None or kinds >= best[0]):
+                best = (kinds, page, lines, labelled)
+
+        if best:
+            _, page, lines, labelled = best
+            first, last = max(0, labelled[0] - TOTALS_WINDOW), labelled[-1] + TOTALS_WINDOW + 1
+            sections.append((f"page {page}, totals", "\n".join(lines[first:last]).strip()))
+            table_indexes.update(i for i, p in enumerate(table_pages) if p == page and i not in item_tables)
+        else:
+            page, text = pages[-1]
+            sections.append((f"page {page}", text.strip()))
+
+    if "items" in groups:
+        if item_tables:
+            table_indexes.update(item_tables)
+        else:
+            counts = [
+                (sum(len(find_amounts(line)) >= 2 for line in text.splitlines()), page, text)
+                for page, text in pages
+            ]
+            best = max(count for count, _, _ in counts)
+            sections.extend(
+                (f"page {page}", text.strip()) for count, page, text in counts if count and count >= best / 2
+            )
+
+    return sections, sorted(table_indexes)
+
+
+class FieldRepairer:
+    """
+    Field Repairer
+    ==============
+    Second, much smaller LLM call for an extraction that came back with
+    missing or inconsistent fields (see `find_issues`), instead of
+    re-running the whole document.
+
+    The follow-up prompt lists the problems and the current values and
+    carries only the page text / tables those fields come from
+    (`select_context`, capped at REPAIR_MAX_CHARS). A repaired group is
+    only taken over when it has fewer issues than before; the line items
+    are never replaced from an excerpt that had to be cut short.
+
+    The outcome is reported in _metadata["repair"].
+    """
+
+    def __init__(self, ai_extractor, executor=None, max_chars: Optional[int] = None):
+        self.ai_extractor = ai_extractor
+        self.executor = executor
+        self.max_chars = max_chars or settings.REPAIR_MAX_CHARS
+        self.stats = {"checked": 0, "calls": 0, "repaired": 0, "failed": 0}
+
+    # ============================================
+    # PROMPT
+    # ============================================
+
+    def _excerpt(self, groups: List[str], parsed: Dict) -> Tuple[str, bool]:
+        sections, table_indexes = select_context(groups, parsed)
+        tables = parsed.get("tables") or []
+
+        blocks = [f"[{label}]\n{text}" for label, text in sections if text]
+        if table_indexes:
+            blocks.append(format_tables([tables[i] for i in table_indexes], compact=settings.COMPACT_TABLES))
+
+        excerpt = "\n\n".join(blocks)
+        if len(excerpt) <= self.max_chars:
+            return excerpt, False
+        return excerpt[:self.max_chars], True
+
+    @staticmethod
+    def _fields(groups: List[str], data: Dict) -> List[str]:
+        fields = []
+        for group in groups:
+            if group == "header":
+                fields.extend(missing_header(data))
+            elif group == "totals":
+                fields.extend(TOTAL_FIELDS)
+            else:
+                fields.append("items")
+        return fields
+
+    @staticmethod
+    def _prompt(data: Dict, issues: Dict[str, List[str]], groups: List[str], fields: List[str], excerpt: str) -> str:
+        # The item list itself is not echoed back: the model re-reads it from the excerpt
+        current = {field: data.get(field) for field in fields if field != "items"}
+        if "items" in fields:
+            current["items"] = f"{len(data.get('items') or [])} items (re-read them from the EXCERPT)"
+        problems = "\n".join(f"- {message}" for group in groups for message in issues[group])
+        keys = ", ".join(f'"{field}"' for field in fields)
+        formats = "".join(f"\n({FIELD_FORMATS[field]})" for field in fields if field in FIELD_FORMATS)
+
+        return f"""
+{PROMPT_RULES}
+- Re-read the EXCERPT and correct ONLY the fields listed below
+
+PROBLEMS IN THE PREVIOUS EXTRACTION:
+{problems}
+
+CURRENT VALUES:
+{json.dumps(current, ensure_ascii=False, default=str)}
+
+EXCERPT:
+{excerpt}
+
+OUTPUT: one JSON object with exactly these keys: {keys}{formats}
+"""
+
+    # ============================================
+    # REPAIR
+    # ============================================
+
+    async def _call(self, prompt: str) -> Tuple[Dict, Dict]:
+        if settings.LLM_ASYNC or self.executor is None:
+            return await self.ai_extractor.complete_async(prompt, "repair")
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.ai_extractor.complete, prompt, "repair")
+
+    @staticmethod
+    def _apply(data: Dict, answer: Dict, groups: List[str], fields: List[str]) -> Tuple[Dict, List[str]]:
+        if not isinstance(answer, dict):
+            return data, []
+
+        answer = normalize_parties(dict(answer))
+        repaired = []
+        for group in groups:
+            before = find_issues(data).get(group, [])
+            candidate = dict(data)
+            for field in fields:
+                in_group = (
+                    (group == "header" and field in HEADER_FIELDS)
+                    or (group == "totals" and field in TOTAL_FIELDS)
+                    or (group == "items" and field == "items")
+                )
+                if in_group and field in answer:
+                    candidate[field] = answer[field]
+
+            if len(find_issues(candidate).get(group, [])) < len(before):
+                data = candidate
+                repaired.append(group)
+        return data, repaired
+
+    async def repair(self, data: Dict, parsed: Dict) -> Dict:
+        """`data` with its problem fields re-asked; unchanged when nothing is wrong."""
+        self.stats["checked"] += 1
+        if not isinstance(data, dict):
+            return data
+        issues = find_issues(normalize_parties(data))
+        if not issues:
+            return data
+
+        groups = [group for group in GROUPS if group in issues]
+        excerpt, truncated = self._excerpt(groups, parsed)
+        report = {"issues": [message for group in groups for message in issues[group]]}
+
+        if truncated and "items" in groups and (data.get("items") or []):
+            # A cut-off item table would come back as a shorter item list
+            groups.remove("items")
+            report["skipped"] = ["items"]
+        if not groups or not excerpt.strip():
+            data.setdefault("_metadata", {})["repair"] = report
+            return data
+
+        fields = self._fields(groups, data)
+        prompt = self._prompt(data, issues, groups, fields, excerpt)
+        report.update(
+            fields=fields,
+            prompt_tokens_estimate=estimate_tokens(prompt),
+            document_tokens_estimate=estimate_tokens(parsed.get("text") or ""),
+        )
+
+        self.stats["calls"] += 1
+        try:
+            answer, info = await self._call(prompt)
+            repaired_data, repaired = self._apply(data, answer, groups, fields)
+            remaining = [message for messages in find_issues(repaired_data).values() for message in messages]
+        except Exception as e:
+            # The first answer still stands; a failed fix-up never fails the document
+            self.stats["failed"] += 1
+            report["error"] = f"{type(e).__name__}: {e}"
+            data.setdefault("_metadata", {})["repair"] = report
+            return data
+
+        metadata = data.get("_metadata") or {}
+        data = repaired_data
+        self.stats["repaired"] += bool(repaired)
+        data["_metadata"] = {
+            **metadata,
+            "repair": {
+                **report,
+                "repaired": repaired,
+                "remaining": remaining,
+                "llm": info,
+            },
+        }
+        return data
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import time
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+
+from app.services.llm_retry import LatencyTracker, RetryPolicy, is_retryable
+from app.services.rate_limiter import LLMRateLimiter
+from app.utils.config import settings
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 chars/token) for when the API isn't available."""
+    return max(1, len(text) // 4) if text else 0
+
+
+class LLMError(Exception):
+    """Provider returned an error response."""
+
+    def __init__(self, status_code: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(f"LLM error {status_code}: {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def usage_tokens(usage: Dict) -> Dict:
+    """Gemini usageMetadata -> prompt / output / total / cached token counts."""
+    return {
+        "prompt_tokens": usage.get("promptTokenCount", 0),
+        "output_tokens": usage.get("candidatesTokenCount", 0),
+        "total_tokens": usage.get("totalTokenCount", 0),
+        # Part of prompt_tokens served from context caching
+        "cached_tokens": usage.get("cachedContentTokenCount", 0),
+    }
+
+
+def request_body(prompt: str, generation_config: Optional[Dict] = None) -> Dict:
+    return {
+        "contents": [{"role": "user", "parts": [{"text": prompt}]}],
+        "generationConfig": generation_config or {},
+    }
+
+
+def parse_retry_after(response: httpx.Response) -> Optional[float]:
+    value = response.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class AsyncGeminiClient:
+    """
+    Async Gemini Client
+    ===================
+    Calls the Gemini REST API (generateContent) over one shared
+    httpx.AsyncClient, so concurrency is bounded by LLMRateLimiter
+    instead of by threads.
+
+    GEMINI_API_BASE can point at a local stub server (benchmarks/gemini_stub.py).
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        model: Optional[str] = None,
+        base_url: Optional[str] = None,
+        limiter: Optional[LLMRateLimiter] = None
+    ):
+        self.api_key = api_key or settings.GEMINI_API_KEY
+        self.model = model or settings.GEMINI_MODEL
+        self.base_url = (base_url or settings.GEMINI_API_BASE).rstrip("/")
+        self.timeout = settings.LLM_TIMEOUT_SECONDS
+        self.limiter = limiter or LLMRateLimiter()
+        self.retry = RetryPolicy()
+        self.latencies = LatencyTracker()
+        self.stats = {"retries": 0, "hedges": 0, "hedge_wins": 0}
+
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                headers={"x-goog-api-key": self.api_key},
+                limits=httpx.Limits(max_connections=self.limiter.max_in_flight)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ============================================
+    # GENERATE
+    # ============================================
+
+    async def generate(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        info: Optional[Dict] = None
+    ) -> Tuple[str, Dict]:
+        """
+        Returns:
+            (response text, usageMetadata dict)
+
+        `info`, when given, is filled with token counts, retries and
+        whether the call was hedged.
+
+        Transient failures (429/5xx/timeouts) are retried with jittered
+        backoff; with LLM_HEDGING a second request is sent when the first
+        is slower than the observed LLM_HEDGE_QUANTILE latency.
+        """
+        body = request_body(prompt, generation_config)
+        estimated = estimate_tokens(prompt)
+        info = {} if info is None else info
+        info.update(retries=0, hedged=False)
+
+        def on_retry(error: Exception, wait: float):
+            info["retries"] += 1
+            self._on_retry(error, wait)
+
+        text, usage = await self.retry.run_async(
+            lambda: self._hedged(body, estimated, info),
+            on_retry=on_retry
+        )
+        info.update(usage_tokens(usage))
+        return text, usage
+
+    def _on_retry(self, error: Exception, wait: float):
+        self.stats["retries"] += 1
+        if getattr(error, "status_code", None) == 429:
+            self.limiter.cool_down(wait)
+
+    def _hedge_delay(self, kind: str) -> Optional[float]:
+        if not settings.LLM_HEDGING or self.latencies.count(kind) < settings.LLM_HEDGE_MIN_SAMPLES:
+            return None
+        return self.latencies.quantile(kind, settings.LLM_HEDGE_QUANTILE)
+
+    async def _hedged(self, body: Dict, estimated: int, info: Dict) -> Tuple[str, Dict]:
+        # Hedge delay from calls of the same kind (AIExtractor._tracked sets it)
+        kind = info.get("kind") or "default"
+        delay = self._hedge_delay(kind)
+        if delay is None:
+            return await self._attempt(body, estimated, kind)
+
+        primary = asyncio.ensure_future(self._attempt(body, estimated, kind))
+        pending = {primary}
+
+        # Everything below can be cancelled by the caller: the finally
+        # makes sure no attempt is left running (and holding a limiter slot)
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.stats["hedges"] += 1
+            info["hedged"] = True
+            hedge = asyncio.ensure_future(self._attempt(body, estimated, kind))
+            pending = {primary, hedge}
+            error = None
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _attempt(self, body: Dict, estimated: int, kind: str) -> Tuple[str, Dict]:
+        async with self.limiter.slot(estimated):
+            start = time.perf_counter()
+            response = await self._get_client().post(
+                f"/v1beta/{self.model}:generateContent",
+                json=body
+            )
+
+        if response.status_code >= 400:
+            raise LLMError(response.status_code, response.text[:500], parse_retry_after(response))
+
+        self.latencies.record(kind, time.perf_counter() - start)
+
+        data = response.json()
+        usage = data.get("usageMetadata", {})
+
+        # Reconcile the token bucket with what the provider actually counted
+        actual = usage.get("totalTokenCount")
+        if actual:
+            self.limiter.tokens.charge(actual - estimated)
+
+        return self._text(data), usage
+
+    # ============================================
+    # STREAM
+    # ============================================
+
+    async def stream(
+        self,
+        prompt: str,
+        generation_config: Optional[Dict] = None,
+        info: Optional[Dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield response text pieces as the model produces them
+        (streamGenerateContent over server-sent events).
+
+        Failures before the first piece are retried like `generate`;
+        once text has been handed out they propagate to the caller.
+        `info` gets token counts and retries once the stream is done.
+        """
+        body = request_body(prompt, generation_config)
+        estimated = estimate_tokens(prompt)
+        info = {} if info is None else info
+        info.update(retries=0)
+
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async for piece in self._stream_attempt(body, estimated, info):
+                    started = True
+                    yield piece
+                return
+            except Exception as e:
+                if started or attempt >= self.retry.max_retries or not is_retryable(e):
+                    raise
+                wait = self.retry.delay(attempt, e)
+                self._on_retry(e, wait)
+                info["retries"] += 1
+                attempt += 1
+                await asyncio.sleep(wait)
+
+    async def _stream_attempt(self, body: Dict, estimated: int, info: Dict) -> AsyncIterator[str]:
+        usage = {}
+        async with self.limiter.slot(estimated):
+            async with self._get_client().stream(
+                "POST",
+                f"/v1beta/{self.model}:streamGenerateContent",
+                params={"alt": "sse"},
+                json=body
+            ) as response:
+                if response.status_code >= 400:
+                    await response.aread()
+                    raise LLMError(response.status_code, response.text[:500], parse_retry_after(response))
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = json.loads(line[5:])
+                    usage = data.get("usageMetadata") or usage
+                    if data.get("candidates"):
+                        piece = self._text(data)
+                        if piece:
+                            yield piece
+
+        info.update(usage_tokens(usage))
+        actual = usage.get("totalTokenCount")
+        if actual:
+            self.limiter.tokens.charge(actual - estimated)
+
+    @staticmethod
+    def _text(data: Dict) -> str:
+        candidates = data.get("candidates") or []
+        if not candidates:
+            raise LLMError(200, f"No candidates in response: {data.get('promptFeedback')}")
+
+        parts = candidates[0].get("content", {}).get("parts", [])
+        return "".join(part.get("text", "") for part in parts)
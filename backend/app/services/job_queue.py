@@ -0,0 +1,228 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.utils.config import settings
+
+STAGES = ("parse", "extract")
+
+
+class JobQueue:
+    """
+    Durable Job Queue
+    =================
+    SQLite-backed queue for asynchronous extraction jobs.
+
+    Job status: queued -> running -> done | failed
+    Each job also tracks per-stage progress (see STAGES).
+    """
+
+    def __init__(self, db_path: Optional[Path] = None):
+        db_path = Path(db_path or settings.JOB_DB)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL,"
+            " file_name TEXT,"
+            " pdf_path TEXT NOT NULL,"
+            " digest TEXT,"
+            " stages TEXT NOT NULL,"
+            " result TEXT,"
+            " error TEXT,"
+            " created_at TEXT NOT NULL,"
+            " updated_at TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+        self._db.commit()
+
+    # ============================================
+    # PRODUCER SIDE
+    # ============================================
+
+    def submit(self, pdf_path: str, file_name: str, digest: Optional[str] = None) -> str:
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow().isoformat()
+        stages = {stage: "pending" for stage in STAGES}
+
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, status, file_name, pdf_path, digest, stages, created_at, updated_at)"
+                " VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+                (job_id, file_name, pdf_path, digest, json.dumps(stages), now, now)
+            )
+            self._db.commit()
+
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        return {
+            "id": row["id"],
+            "status": row["status"],
+            "file_name": row["file_name"],
+            "stages": json.loads(row["stages"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    # ============================================
+    # WORKER SIDE
+    # ============================================
+
+    def claim(self) -> Optional[Dict]:
+        """Atomically move the oldest queued job to running."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, pdf_path, digest FROM jobs WHERE status = 'queued'"
+                " ORDER BY created_at LIMIT 1"
+            ).fetchone()
+
+            if row is None:
+                return None
+
+            self._db.execute(
+                "UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?",
+                (datetime.utcnow().isoformat(), row["id"])
+            )
+            self._db.commit()
+
+        return {"id": row["id"], "pdf_path": row["pdf_path"], "digest": row["digest"]}
+
+    def set_stage(self, job_id: str, stage: str, state: str):
+        with self._lock:
+            row = self._db.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return
+
+            stages = json.loads(row["stages"])
+            stages[stage] = state
+            self._db.execute(
+                "UPDATE jobs SET stages = ?, updated_at = ? WHERE id = ?",
+                (json.dumps(stages), datetime.utcnow().isoformat(), job_id)
+            )
+            self._db.commit()
+
+    def complete(self, job_id: str, result: Dict):
+        self._finish(job_id, "done", result=json.dumps(result, default=str))
+
+    def fail(self, job_id: str, error: str):
+        job = self.get(job_id)
+        if job:
+            for stage, state in job["stages"].items():
+                if state == "running":
+                    self.set_stage(job_id, stage, "failed")
+        self._finish(job_id, "failed", error=error)
+
+    def _finish(self, job_id: str, status: str, result: Optional[str] = None, error: Optional[str] = None):
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ? WHERE id = ?",
+                (status, result, error, datetime.utcnow().isoformat(), job_id)
+            )
+            self._db.commit()
+
+    def requeue_interrupted(self) -> int:
+        """Jobs left 'running' by a previous process go back to the queue."""
+        with self._lock:
+            cur = self._db.execute(
+                "UPDATE jobs SET status = 'queued', updated_at = ? WHERE status = 'running'",
+                (datetime.utcnow().isoformat(),)
+            )
+            self._db.commit()
+            return cur.rowcount
+
+
+class JobRunner:
+    """
+    Job Worker Pool
+    ===============
+    JOB_WORKERS asyncio tasks that pull jobs from a JobQueue and run them
+    through the ExtractionPipeline, recording per-stage progress.
+    """
+
+    def __init__(self, queue: JobQueue, pipeline, workers: Optional[int] = None):
+        self.queue = queue
+        self.pipeline = pipeline
+        self.workers = workers or settings.JOB_WORKERS
+        self.poll_interval = settings.JOB_POLL_INTERVAL_SECONDS
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self):
+        requeued = self.queue.requeue_interrupted()
+        if requeued:
+            print(f"🔁 Requeued {requeued} interrupted jobs")
+
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._worker(i))
+            for i in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self):
+        """Wake idle workers right after a submit instead of waiting for the next poll."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self, index: int):
+        while True:
+            # Clear before claiming so a submit racing with an empty claim still wakes us
+            self._wakeup.clear()
+            job = self.queue.claim()
+
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            await self._run(job)
+
+    async def _run(self, job: Dict):
+        job_id = job["id"]
+
+        def on_stage(stage: str, state: str):
+            self.queue.set_stage(job_id, stage, state)
+
+        try:
+            cached = self.pipeline.lookup(job["digest"])
+            if cached is not None:
+                for stage in STAGES:
+                    on_stage(stage, "cached")
+                result = cached
+            else:
+                result = await self.pipeline.process(job["pdf_path"], job["digest"], on_stage)
+
+            self.queue.complete(job_id, result)
+
+        except asyncio.CancelledError:
+            # Left as 'running'; requeued on next start
+            raise
+
+        except Exception as e:
+            self.queue.fail(job_id, str(e))
@@ -0,0 +1,140 @@
+import json
+from typing import Dict, Iterable, List, Optional
+
+
+class IncrementalJSONParser:
+    """
+    Incremental JSON Parser
+    =======================
+    Fed the model's JSON output piece by piece while it streams, emits
+    each top-level field as soon as its value is complete, and each
+    element of the `stream_arrays` fields (the invoice line items) as soon
+    as that element closes, instead of waiting for json.loads on the whole
+    response.
+
+    Events:
+        {"type": "field", "name": str, "value": any}
+        {"type": "item", "field": str, "index": int, "value": any}
+
+    Anything before the opening "{" (e.g. a ```json fence) is ignored.
+    Call `result()` at the end for the fully parsed document.
+    """
+
+    def __init__(self, stream_arrays: Iterable[str] = ("items",)):
+        self.stream_arrays = set(stream_arrays)
+        self.buffer = ""
+
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect_key = False
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._element_start: Optional[int] = None
+        self._element_index = 0
+        self._root_start: Optional[int] = None
+        self._root_end: Optional[int] = None
+
+    def feed(self, chunk: str) -> List[Dict]:
+        events = []
+        offset = len(self.buffer)
+        self.buffer += chunk
+
+        for i in range(offset, len(self.buffer)):
+            if self._root_end is not None:
+                break
+            self._step(i, self.buffer[i], events)
+
+        return events
+
+    def result(self) -> Dict:
+        start = self._root_start or 0
+        end = self._root_end + 1 if self._root_end is not None else len(self.buffer)
+        return json.loads(self.buffer[start:end])
+
+    # --------------------------------------------------
+    # STATE MACHINE
+    # --------------------------------------------------
+
+    def _streaming_array(self) -> bool:
+        return self._key in self.stream_arrays
+
+    def _emit_field(self, end: int, events: List[Dict]):
+        if not self._streaming_array():
+            value = json.loads(self.buffer[self._value_start:end])
+            events.append({"type": "field", "name": self._key, "value": value})
+        self._value_start = None
+
+    def _step(self, i: int, ch: str, events: List[Dict]):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+                if self._key_start is not None:
+                    self._key = json.loads(self.buffer[self._key_start:i + 1])
+                    self._key_start = None
+            return
+
+        if self._depth == 0:
+            if ch == "{":
+                self._root_start = i
+                self._depth = 1
+                self._expect_key = True
+            return
+
+        if ch == '"':
+            self._in_string = True
+            if self._depth == 1 and self._expect_key:
+                self._key_start = i
+            else:
+                self._mark_value_start(i)
+            return
+
+        if ch in "{[":
+            self._mark_value_start(i)
+            self._depth += 1
+            return
+
+        if ch in "}]":
+            self._depth -= 1
+
+            if self._depth == 2 and self._element_start is not None and self._streaming_array():
+                value = json.loads(self.buffer[self._element_start:i + 1])
+                events.append({"type": "item", "field": self._key, "index": self._element_index, "value": value})
+                self._element_index += 1
+                self._element_start = None
+
+            if self._depth == 1 and self._value_start is not None and self.buffer[self._value_start] in "{[":
+                self._emit_field(i + 1, events)
+            elif self._depth == 0:
+                # "}" of the root object also ends a trailing scalar value
+                if self._value_start is not None:
+                    self._emit_field(i, events)
+                self._root_end = i
+            return
+
+        if ch == ":" and self._depth == 1:
+            self._expect_key = False
+            return
+
+        if ch == ",":
+            if self._depth == 1:
+                if self._value_start is not None:
+                    self._emit_field(i, events)
+                self._expect_key = True
+            return
+
+        if not ch.isspace():
+            self._mark_value_start(i)
+
+    def _mark_value_start(self, i: int):
+        if self._depth == 1 and not self._expect_key and self._value_start is None:
+            self._value_start = i
+            self._element_index = 0
+        elif self._depth == 2 and self._streaming_array() and self._element_start is None \
+                and self.buffer[i] in "{[":
+            self._element_start = i
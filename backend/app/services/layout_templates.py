@@ -0,0 +1,398 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from app.services.rule_extractor import (
+    find_amounts,
+    find_dates,
+    items_from_rows,
+    parse_amount,
+    parse_quantity,
+    text_lines,
+)
+from app.utils.config import settings
+
+# Scalar fields located by position, and how to read their value off a line
+FIELD_KINDS = {
+    "invoice_number": "token",
+    "invoice_date": "date",
+    "subtotal": "amount",
+    "tax_amount": "amount",
+    "total": "amount",
+    "customer.name": "line",
+}
+
+# Only label-like tables count towards the fingerprint (data tables vary per invoice)
+FINGERPRINT_TABLES = 2
+
+PERSIST_INTERVAL_SECONDS = 3600
+
+
+def _mask(text: str) -> str:
+    """Layout form of a line: lower-case, every digit -> '#'."""
+    return re.sub(r"\d", "#", " ".join(str(text).lower().split()))
+
+
+def _get(data: Dict, path: str):
+    for part in path.split("."):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(part)
+    return data
+
+
+def _set(data: Dict, path: str, value):
+    *parents, leaf = path.split(".")
+    for part in parents:
+        data = data.setdefault(part, {})
+    data[leaf] = value
+
+
+def _rows(table) -> List[Dict]:
+    return [row for row in (table if isinstance(table, list) else [table]) if isinstance(row, dict)]
+
+
+def _values(kind: str, line: str) -> List[Tuple[int, object]]:
+    """Candidate (position, value) pairs of one kind on a line."""
+    if kind == "amount":
+        return find_amounts(line)
+    if kind == "date":
+        return find_dates(line)
+    if kind == "token":
+        return [(m.start(), m.group(0)) for m in re.finditer(r"\S+", line)]
+    return [(0, line)]
+
+
+def _same(kind: str, found, confirmed) -> bool:
+    if kind == "amount":
+        return parse_amount(confirmed) is not None and abs(found - parse_amount(confirmed)) < 0.005
+    return str(found).strip() == str(confirmed).strip()
+
+
+class LayoutTemplateStore:
+    """
+    Vendor Layout Templates
+    =======================
+    Learns one template per recurring invoice layout from confirmed
+    extractions (/save-invoice) and replays it on later documents with
+    the same layout, with no LLM call.
+
+    A template holds:
+    - fingerprint: hash of the masked sender line + label-table headers
+    - per field: anchor text (masked label before the value, or the label
+      row above it), line offset and which match on that line to take
+    - the item table's header row and column -> field mapping
+    - vendor / currency, which are fixed for a layout
+
+    Templates live in a dict keyed by fingerprint (one lookup per document),
+    persisted to SQLite. Least recently used templates beyond
+    TEMPLATE_MAX_COUNT, ones unused for TEMPLATE_TTL_DAYS and ones that
+    failed TEMPLATE_MAX_FAILURES times in a row are evicted.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        max_templates: Optional[int] = None,
+        ttl_days: Optional[float] = None,
+        max_failures: Optional[int] = None,
+        recent_documents: Optional[int] = None
+    ):
+        self.max_templates = max_templates or settings.TEMPLATE_MAX_COUNT
+        self.ttl_seconds = (ttl_days or settings.TEMPLATE_TTL_DAYS) * 86400
+        self.max_failures = max_failures or settings.TEMPLATE_MAX_FAILURES
+        self.recent_max = recent_documents or settings.TEMPLATE_RECENT_DOCUMENTS
+
+        self._templates: "OrderedDict[str, Dict]" = OrderedDict()
+        self._recent: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.stats = {"hits": 0, "misses": 0, "no_template": 0, "learned": 0, "evicted": 0}
+
+        db_path = Path(db_path or settings.TEMPLATE_DB)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS templates ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " template TEXT NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl_seconds
+        self._db.execute("DELETE FROM templates WHERE last_used < ?", (cutoff,))
+        self._db.commit()
+
+        rows = self._db.execute("SELECT fingerprint, template, last_used FROM templates ORDER BY last_used ASC")
+        for fingerprint, blob, last_used in rows:
+            self._templates[fingerprint] = {**json.loads(blob), "last_used": last_used}
+
+    # ============================================
+    # FINGERPRINT
+    # ============================================
+
+    @staticmethod
+    def fingerprint(lines: List[str], tables: List) -> Optional[str]:
+        if not lines:
+            return None
+
+        headers = []
+        for table in tables or []:
+            rows = _rows(table)
+            if not rows:
+                continue
+            columns = [_mask(c) for c in rows[0]]
+            if all(re.search(r"[a-zäöü]", c) for c in columns):
+                headers.append("|".join(columns))
+            if len(headers) == FINGERPRINT_TABLES:
+                break
+
+        signature = "\n".join([_mask(lines[0]), *headers])
+        return hashlib.sha1(signature.encode("utf-8")).hexdigest()
+
+    # ============================================
+    # LEARN
+    # ============================================
+
+    def remember(self, digest: str, parsed: Dict):
+        """Keep a parsed document around so a later confirmation can learn from it."""
+        with self._lock:
+            self._recent[digest] = {"text": parsed.get("text", ""), "tables": parsed.get("tables", [])}
+            self._recent.move_to_end(digest)
+            while len(self._recent) > self.recent_max:
+                self._recent.popitem(last=False)
+
+    def learn(self, digest: Optional[str], confirmed: Dict) -> Optional[str]:
+        """
+        Build a template from a confirmed extraction of a remembered document.
+
+        Returns:
+            the fingerprint, or None if the document is unknown or too few
+            fields could be located to replay the layout
+        """
+        with self._lock:
+            parsed = self._recent.get(digest) if digest else None
+        if parsed is None:
+            return None
+
+        lines = text_lines(parsed["text"])
+        fingerprint = self.fingerprint(lines, parsed["tables"])
+        if fingerprint is None:
+            return None
+
+        fields = {}
+        for path, kind in FIELD_KINDS.items():
+            value = _get(confirmed, path)
+            if value in (None, ""):
+                continue
+            location = self._locate(lines, kind, value)
+            if location:
+                fields[path] = location
+
+        if not {"invoice_number", "total"} <= fields.keys():
+            return None
+
+        template = {
+            "fields": fields,
+            "items": self._item_mapping(parsed["tables"], confirmed.get("items") or []),
+            "vendor": confirmed.get("vendor") or {"name": None, "address": None},
+            "currency": confirmed.get("currency"),
+            "failures": 0,
+            "learned_at": datetime.now().isoformat(),
+        }
+
+        with self._lock:
+            self._templates[fingerprint] = template
+            self._templates.move_to_end(fingerprint)
+            self._persist(fingerprint, template)
+            self._evict()
+            self.stats["learned"] += 1
+
+        return fingerprint
+
+    @staticmethod
+    def _locate(lines: List[str], kind: str, value) -> Optional[Dict]:
+        for i, line in enumerate(lines):
+            for n, (position, found) in enumerate(_values(kind, line)):
+                if not _same(kind, found, value):
+                    continue
+
+                # Same-line label ("Total 381,12 €"); a prefix starting with other
+                # values means a row of values under a label row, so anchor on that
+                label = _mask(line[:position])
+                if re.match(r"[^\W\d]", label) or (label and i == 0):
+                    return {"kind": kind, "anchor": label, "offset": 0, "index": n}
+                if i > 0:
+                    return {"kind": kind, "anchor": _mask(lines[i - 1]), "offset": 1, "index": n}
+        return None
+
+    @staticmethod
+    def _item_mapping(tables: List, items: List[Dict]) -> Optional[Dict]:
+        if not items:
+            return None
+
+        readers = {
+            "description": lambda v: " ".join(str(v or "").split()),
+            "quantity": parse_quantity,
+            "unit_price": parse_amount,
+            "total": parse_amount,
+        }
+
+        for table in tables or []:
+            rows = _rows(table)
+            if not rows:
+                continue
+
+            columns = {}
+            for field, read in readers.items():
+                wanted = [read(item.get(field)) for item in items if item.get(field) not in (None, "")]
+                if not wanted:
+                    continue
+                best, best_hits = None, 0
+                for column in rows[0]:
+                    cells = [read(row.get(column)) for row in rows]
+                    hits = sum(1 for value in wanted if value in cells)
+                    if hits > best_hits:
+                        best, best_hits = column, hits
+                if best is not None and best_hits * 2 >= len(wanted):
+                    columns[field] = best
+
+            if {"description", "total"} <= columns.keys():
+                return {"header": list(rows[0]), "columns": columns}
+
+        return None
+
+    # ============================================
+    # MATCH
+    # ============================================
+
+    def match(self, text: str, tables: List) -> Optional[Dict]:
+        """Template extraction for a known layout, or None (unknown layout / fields not found)."""
+        lines = text_lines(text)
+        fingerprint = self.fingerprint(lines, tables)
+
+        with self._lock:
+            template = self._templates.get(fingerprint) if fingerprint else None
+            if template is not None and time.time() - template["last_used"] > self.ttl_seconds:
+                self._drop(fingerprint)
+                template = None
+            if template is None:
+                self.stats["no_template"] += 1
+                return None
+
+        data = self._apply(template, lines, tables)
+
+        with self._lock:
+            if data is None:
+                self.stats["misses"] += 1
+                template["failures"] += 1
+                if template["failures"] >= self.max_failures:
+                    self._drop(fingerprint)
+                else:
+                    self._persist(fingerprint, template)
+                return None
+
+            self.stats["hits"] += 1
+            self._templates.move_to_end(fingerprint)
+            # Hits only touch SQLite when something changed or last_used is getting old
+            if template["failures"] or time.time() - template["last_used"] > PERSIST_INTERVAL_SECONDS:
+                template["failures"] = 0
+                self._persist(fingerprint, template)
+
+        data["_metadata"] = {
+            "extraction_timestamp": datetime.now().isoformat(),
+            "confidence": "TEMPLATE",
+            "method": "template",
+            "template": fingerprint[:12],
+        }
+        return data
+
+    @staticmethod
+    def _apply(template: Dict, lines: List[str], tables: List) -> Optional[Dict]:
+        data = {
+            "invoice_number": None,
+            "invoice_date": None,
+            "vendor": dict(template["vendor"]),
+            "customer": {"name": None},
+            "items": [],
+            "subtotal": None,
+            "tax_amount": None,
+            "total": None,
+            "currency": template["currency"],
+        }
+
+        for path, location in template["fields"].items():
+            value = None
+            for i, line in enumerate(lines):
+                masked = _mask(line)
+                hit = masked.startswith(location["anchor"]) if location["offset"] == 0 else masked == location["anchor"]
+                if not hit or i + location["offset"] >= len(lines):
+                    continue
+                candidates = _values(location["kind"], lines[i + location["offset"]])
+                if location["index"] < len(candidates):
+                    value = candidates[location["index"]][1]
+                    break
+
+            # Every field the layout had must be found again, otherwise it's not the same layout
+            if value is None:
+                return None
+            _set(data, path, value)
+
+        mapping = template.get("items")
+        if mapping:
+            for table in tables or []:
+                rows = _rows(table)
+                if rows and list(rows[0]) == mapping["header"]:
+                    data["items"] = items_from_rows(rows, mapping["columns"])
+                    break
+            if not data["items"]:
+                return None
+
+        subtotal, tax, total = data["subtotal"], data["tax_amount"], data["total"]
+        if None not in (subtotal, tax, total) and abs(subtotal + tax - total) > 0.011:
+            return None
+
+        return data
+
+    # ============================================
+    # STORAGE / EVICTION
+    # ============================================
+
+    def _persist(self, fingerprint: str, template: Dict):
+        template["last_used"] = time.time()
+        blob = json.dumps({k: v for k, v in template.items() if k != "last_used"})
+        self._db.execute(
+            "INSERT OR REPLACE INTO templates (fingerprint, template, last_used) VALUES (?, ?, ?)",
+            (fingerprint, blob, template["last_used"])
+        )
+        self._db.commit()
+
+    def _drop(self, fingerprint: str):
+        self._templates.pop(fingerprint, None)
+        self._db.execute("DELETE FROM templates WHERE fingerprint = ?", (fingerprint,))
+        self._db.commit()
+        self.stats["evicted"] += 1
+
+    def _evict(self):
+        cutoff = time.time() - self.ttl_seconds
+        stale = [fingerprint for fingerprint, template in self._templates.items() if template["last_used"] < cutoff]
+        for fingerprint in stale:
+            self._drop(fingerprint)
+
+        while len(self._templates) > self.max_templates:
+            fingerprint = next(iter(self._templates))
+            self._drop(fingerprint)
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, "templates": len(self._templates), "recent_documents": len(self._recent)}
@@ -0,0 +1,206 @@
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import google.generativeai as genai
+import httpx
+
+from app.services.gemini_client import (
+    AsyncGeminiClient, LLMError, estimate_tokens, parse_retry_after, request_body, usage_tokens
+)
+from app.services.llm_retry import RetryPolicy
+from app.utils.config import settings
+
+
+class LLMBackend:
+    """
+    LLM Backend
+    ===========
+    What AIExtractor needs from a model provider: one prompt in, the raw
+    response text out, sync, async and streamed.
+
+    Every call takes an optional `info` dict that is filled with
+    prompt_tokens / output_tokens / total_tokens / cached_tokens and
+    retries, and an optional static `prefix` that is sent in front of the
+    prompt. The prefix is byte-identical on every call, so the provider's
+    implicit prefix caching can serve it; how much it did comes back as
+    cached_tokens (usageMetadata.cachedContentTokenCount). Subclasses
+    implement the `_generate*` / `_stream` hooks for one request.
+
+    Provider, model name, timeout and JSON mode come from Settings
+    (LLM_PROVIDER, GEMINI_MODEL, LLM_TIMEOUT_SECONDS, LLM_JSON_MODE).
+    """
+
+    provider = "base"
+
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        timeout: Optional[float] = None,
+        json_mode: Optional[bool] = None
+    ):
+        self.model = model or settings.GEMINI_MODEL
+        self.timeout = timeout or settings.LLM_TIMEOUT_SECONDS
+        self.json_mode = settings.LLM_JSON_MODE if json_mode is None else json_mode
+        self.retry = RetryPolicy()
+
+    def generation_config(self) -> Dict:
+        config = {"temperature": 0}
+        if self.json_mode:
+            config["responseMimeType"] = "application/json"
+        return config
+
+    @staticmethod
+    def _with_prefix(prefix: str, prompt: str, info: Dict) -> str:
+        if prefix:
+            info["prefix_tokens"] = estimate_tokens(prefix)
+        return prefix + prompt
+
+    # ============================================
+    # CALLS
+    # ============================================
+
+    def generate(self, prompt: str, info: Optional[Dict] = None, prefix: str = "") -> str:
+        info = {} if info is None else info
+        return self._generate(self._with_prefix(prefix, prompt, info), info)
+
+    async def generate_async(self, prompt: str, info: Optional[Dict] = None, prefix: str = "") -> str:
+        info = {} if info is None else info
+        return await self._generate_async(self._with_prefix(prefix, prompt, info), info)
+
+    def stream_async(self, prompt: str, info: Optional[Dict] = None, prefix: str = "") -> AsyncIterator[str]:
+        """Response text pieces as they are generated."""
+        info = {} if info is None else info
+        return self._stream(self._with_prefix(prefix, prompt, info), info)
+
+    def _generate(self, prompt: str, info: Dict) -> str:
+        raise NotImplementedError
+
+    async def _generate_async(self, prompt: str, info: Dict) -> str:
+        text, _ = await self.async_client.generate(prompt, generation_config=self.generation_config(), info=info)
+        return text
+
+    def _stream(self, prompt: str, info: Dict) -> AsyncIterator[str]:
+        return self.async_client.stream(prompt, generation_config=self.generation_config(), info=info)
+
+    async def aclose(self):
+        pass
+
+
+class GeminiBackend(LLMBackend):
+    """
+    Google Gemini: google-generativeai SDK for blocking calls,
+    AsyncGeminiClient (shared rate limiter) for async ones.
+    """
+
+    provider = "gemini"
+
+    def __init__(self, api_key: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+
+        self.api_key = api_key or settings.GEMINI_API_KEY
+        if not self.api_key:
+            raise RuntimeError("❌ GEMINI_API_KEY not set in .env")
+
+        genai.configure(api_key=self.api_key)
+        self._model = genai.GenerativeModel(model_name=self.model)
+        self._async_client: Optional[AsyncGeminiClient] = None
+
+    @property
+    def async_client(self) -> AsyncGeminiClient:
+        # Shared by every async extraction so they all go through one rate limiter
+        if self._async_client is None:
+            self._async_client = AsyncGeminiClient(api_key=self.api_key, model=self.model)
+        return self._async_client
+
+    def _generate(self, prompt: str, info: Dict) -> str:
+        config = {"temperature": 0}
+        if self.json_mode:
+            config["response_mime_type"] = "application/json"
+
+        info["retries"] = 0
+        response = self.retry.run_sync(
+            lambda: self._model.generate_content(
+                prompt,
+                generation_config=config,
+                request_options={"timeout": self.timeout}
+            ),
+            on_retry=lambda error, wait: info.update(retries=info["retries"] + 1)
+        )
+
+        usage = response.usage_metadata
+        info.update(
+            prompt_tokens=usage.prompt_token_count,
+            output_tokens=usage.candidates_token_count,
+            total_tokens=usage.total_token_count,
+            cached_tokens=usage.cached_content_token_count
+        )
+        return response.text
+
+    async def aclose(self):
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+
+
+class HTTPBackend(LLMBackend):
+    """
+    Any server speaking the Gemini REST API at GEMINI_API_BASE, with no SDK
+    and no mandatory API key. Pointed at benchmarks/gemini_stub.py this
+    runs the whole pipeline offline (load tests, CI).
+    """
+
+    provider = "http"
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = (base_url or settings.GEMINI_API_BASE).rstrip("/")
+        self.api_key = api_key or settings.GEMINI_API_KEY or "offline"
+
+        self.async_client = AsyncGeminiClient(api_key=self.api_key, model=self.model, base_url=self.base_url)
+        self._client: Optional[httpx.Client] = None
+
+    def _get_client(self) -> httpx.Client:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.Client(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                headers={"x-goog-api-key": self.api_key}
+            )
+        return self._client
+
+    def _post(self, prompt: str) -> Tuple[str, Dict]:
+        response = self._get_client().post(
+            f"/v1beta/{self.model}:generateContent",
+            json=request_body(prompt, self.generation_config())
+        )
+        if response.status_code >= 400:
+            raise LLMError(response.status_code, response.text[:500], parse_retry_after(response))
+        data = response.json()
+        return AsyncGeminiClient._text(data), data.get("usageMetadata", {})
+
+    def _generate(self, prompt: str, info: Dict) -> str:
+        info["retries"] = 0
+        text, usage = self.retry.run_sync(
+            lambda: self._post(prompt),
+            on_retry=lambda error, wait: info.update(retries=info["retries"] + 1)
+        )
+        info.update(usage_tokens(usage))
+        return text
+
+    async def aclose(self):
+        await self.async_client.aclose()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+BACKENDS = {
+    GeminiBackend.provider: GeminiBackend,
+    HTTPBackend.provider: HTTPBackend,
+}
+
+
+def create_backend(provider: Optional[str] = None, **kwargs) -> LLMBackend:
+    provider = (provider or settings.LLM_PROVIDER).lower()
+    if provider not in BACKENDS:
+        raise ValueError(f"Unknown LLM_PROVIDER '{provider}' (expected one of: {', '.join(BACKENDS)})")
+    return BACKENDS[provider](**kwargs)
@@ -0,0 +1,155 @@
+import asyncio
+import uuid
+from typing import Dict, List, Optional
+
+from app.services.ai_extractor import format_tables
+from app.services.gemini_client import estimate_tokens
+from app.utils.config import settings
+
+
+class _PendingInvoice:
+    def __init__(self, text: str, tables: List, tokens: int, future: asyncio.Future):
+        self.id = uuid.uuid4().hex[:8]
+        self.text = text
+        self.tables = tables
+        self.tokens = tokens
+        self.future = future
+
+
+class ExtractionBatcher:
+    """
+    LLM Request Batcher
+    ===================
+    Packs several waiting invoices into one Gemini request.
+
+    A batch is flushed when any of these is hit:
+    - its estimated prompt tokens reach LLM_BATCH_MAX_TOKENS
+    - it holds LLM_BATCH_MAX_ITEMS invoices
+    - the oldest invoice has waited LLM_BATCH_MAX_WAIT_MS
+
+    Invoices the model leaves out of a batch answer (or all of them, when
+    the answer is not usable JSON) are retried one by one, so callers
+    always get their own result. A batch call that fails at the provider
+    (429 / 5xx / timeout after the client's own retries) fails every
+    invoice in it with that error instead: N single calls would only add
+    load while the provider is struggling.
+
+    With LLM_ASYNC, batch and single calls go through the async client
+    (LLMRateLimiter: RPM/TPM buckets, 429 cool-down) like unbatched ones;
+    otherwise they run in `executor`.
+    """
+
+    def __init__(
+        self,
+        ai_extractor,
+        executor,
+        max_tokens: Optional[int] = None,
+        max_items: Optional[int] = None,
+        max_wait_ms: Optional[int] = None
+    ):
+        self.ai_extractor = ai_extractor
+        self.executor = executor
+        self.max_tokens = max_tokens or settings.LLM_BATCH_MAX_TOKENS
+        self.max_items = max_items or settings.LLM_BATCH_MAX_ITEMS
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else settings.LLM_BATCH_MAX_WAIT_MS) / 1000
+
+        self._waiting: List[_PendingInvoice] = []
+        self._waiting_tokens = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+
+        self.stats = {"batches": 0, "batched_invoices": 0, "single_calls": 0, "fallbacks": 0, "failed_batches": 0}
+
+    async def submit(self, text: str, tables: List) -> Dict:
+        loop = asyncio.get_running_loop()
+        tokens = estimate_tokens(text) + estimate_tokens(format_tables(tables, compact=settings.COMPACT_TABLES))
+        pending = _PendingInvoice(text, tables, tokens, loop.create_future())
+
+        # Would overflow the budget: ship what's waiting first
+        if self._waiting and self._waiting_tokens + tokens > self.max_tokens:
+            self._flush()
+
+        self._waiting.append(pending)
+        self._waiting_tokens += tokens
+
+        if len(self._waiting) >= self.max_items or self._waiting_tokens >= self.max_tokens:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await pending.future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        batch, self._waiting, self._waiting_tokens = self._waiting, [], 0
+        if not batch:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _extract_batch(self, docs: Dict) -> Dict[str, Dict]:
+        if settings.LLM_ASYNC:
+            return await self.ai_extractor.extract_batch_async(docs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self.ai_extractor.extract_batch, docs)
+
+    async def _extract_single(self, pending: _PendingInvoice) -> Dict:
+        if settings.LLM_ASYNC:
+            return await self.ai_extractor.extract_async(pending.text, pending.tables)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            self.ai_extractor.extract_from_text,
+            pending.text,
+            pending.tables
+        )
+
+    async def _run(self, batch: List[_PendingInvoice]):
+        if len(batch) == 1:
+            await self._run_single(batch[0])
+            return
+
+        self.stats["batches"] += 1
+        try:
+            results = await self._extract_batch({p.id: (p.text, p.tables) for p in batch})
+        except ValueError:
+            # Unusable answer (bad JSON / not keyed by id): ask one by one
+            results = {}
+        except Exception as e:
+            self.stats["failed_batches"] += 1
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(e)
+            return
+
+        self.stats["batched_invoices"] += len(results)
+
+        leftovers = []
+        for pending in batch:
+            if pending.id in results:
+                if not pending.future.done():
+                    pending.future.set_result(results[pending.id])
+            else:
+                leftovers.append(pending)
+
+        self.stats["fallbacks"] += len(leftovers)
+        await asyncio.gather(*(self._run_single(p) for p in leftovers))
+
+    async def _run_single(self, pending: _PendingInvoice):
+        self.stats["single_calls"] += 1
+        try:
+            result = await self._extract_single(pending)
+        except Exception as e:
+            if not pending.future.done():
+                pending.future.set_exception(e)
+            return
+
+        if not pending.future.done():
+            pending.future.set_result(result)
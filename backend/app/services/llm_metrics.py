@@ -0,0 +1,141 @@
+import bisect
+import threading
+from typing import Dict, Iterable, Tuple
+
+from app.utils.config import settings
+
+LATENCY_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64, 120)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000)
+
+
+def call_cost(prompt_tokens: int, output_tokens: int, cached_tokens: int = 0) -> float:
+    """
+    USD for one call at LLM_PRICE_INPUT_PER_MTOK / LLM_PRICE_OUTPUT_PER_MTOK;
+    the cached part of the prompt at LLM_PRICE_CACHED_INPUT_PER_MTOK.
+    """
+    return (
+        (prompt_tokens - cached_tokens) * settings.LLM_PRICE_INPUT_PER_MTOK
+        + cached_tokens * settings.LLM_PRICE_CACHED_INPUT_PER_MTOK
+        + output_tokens * settings.LLM_PRICE_OUTPUT_PER_MTOK
+    ) / 1_000_000
+
+
+class _Histogram:
+    def __init__(self, buckets: Iterable[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class LLMMetrics:
+    """
+    LLM Metrics
+    ===========
+    Process-wide counters and histograms for every LLM call, labelled by
+    model and call kind (single / stream / batch / chunk), plus finished
+    extractions by method (template / rules / llm / chunked).
+
+    Exported as JSON (`get_stats`, /llm/stats) and in the Prometheus text
+    format (`render_prometheus`, /metrics).
+    """
+
+    COUNTERS = (
+        "calls", "errors", "prompt_tokens", "output_tokens", "retries", "cost_usd",
+        "prefix_cached_tokens", "prefix_billed_tokens",
+    )
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, str], Dict[str, float]] = {}
+        self._latency: Dict[Tuple[str, str], _Histogram] = {}
+        self._prompt_tokens: Dict[Tuple[str, str], _Histogram] = {}
+        self._extractions: Dict[str, _Histogram] = {}
+
+    def record_call(self, info: Dict, kind: str, error: bool = False):
+        """info: the per-call dict AIExtractor attaches to _metadata["llm"]."""
+        labels = (info.get("model") or "unknown", kind)
+
+        with self._lock:
+            counters = self._counters.setdefault(labels, dict.fromkeys(self.COUNTERS, 0))
+            counters["calls"] += 1
+            counters["errors"] += int(error)
+            counters["prompt_tokens"] += info.get("prompt_tokens") or 0
+            counters["output_tokens"] += info.get("output_tokens") or 0
+            counters["retries"] += info.get("retries") or 0
+            counters["cost_usd"] += info.get("cost_usd") or 0.0
+            counters["prefix_cached_tokens"] += info.get("prefix_cached_tokens") or 0
+            counters["prefix_billed_tokens"] += info.get("prefix_billed_tokens") or 0
+
+            self._latency.setdefault(labels, _Histogram(LATENCY_BUCKETS)).observe(info.get("seconds") or 0.0)
+            if info.get("prompt_tokens"):
+                self._prompt_tokens.setdefault(labels, _Histogram(TOKEN_BUCKETS)).observe(info["prompt_tokens"])
+
+    def record_extraction(self, method: str, seconds: float):
+        with self._lock:
+            self._extractions.setdefault(method, _Histogram(LATENCY_BUCKETS)).observe(seconds)
+
+    # ============================================
+    # EXPORT
+    # ============================================
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            calls = []
+            for (model, kind), counters in sorted(self._counters.items()):
+                latency = self._latency[(model, kind)]
+                calls.append({
+                    "model": model,
+                    "kind": kind,
+                    **{k: round(v, 6) if k == "cost_usd" else v for k, v in counters.items()},
+                    "avg_seconds": round(latency.sum / latency.count, 3) if latency.count else 0.0,
+                })
+
+            extractions = {
+                method: {"count": h.count, "avg_seconds": round(h.sum / h.count, 3) if h.count else 0.0}
+                for method, h in sorted(self._extractions.items())
+            }
+
+        return {"calls": calls, "extractions": extractions}
+
+    def render_prometheus(self) -> str:
+        lines = []
+
+        def histogram(name: str, help_text: str, series: Dict, label_names: Tuple[str, ...]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, h in sorted(series.items()):
+                labels = labels if isinstance(labels, tuple) else (labels,)
+                base = ",".join(f'{k}="{v}"' for k, v in zip(label_names, labels))
+                for bound, count in h.cumulative():
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f'{name}_bucket{{{base},le="{le}"}} {count}')
+                lines.append(f"{name}_sum{{{base}}} {h.sum:g}")
+                lines.append(f"{name}_count{{{base}}} {h.count}")
+
+        with self._lock:
+            for counter in self.COUNTERS:
+                name = f"invoice_llm_{counter}_total"
+                lines.append(f"# TYPE {name} counter")
+                for (model, kind), counters in sorted(self._counters.items()):
+                    lines.append(f'{name}{{model="{model}",kind="{kind}"}} {counters[counter]:g}')
+
+            histogram("invoice_llm_call_seconds", "Wall time per LLM call", self._latency, ("model", "kind"))
+            histogram("invoice_llm_prompt_tokens", "Prompt tokens per LLM call", self._prompt_tokens, ("model", "kind"))
+            histogram("invoice_extraction_seconds", "Extraction time per document", self._extractions, ("method",))
+
+        return "\n".join(lines) + "\n"
+
+
+llm_metrics = LLMMetrics()
@@ -0,0 +1,117 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from app.utils.config import settings
+
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def status_of(error: Exception) -> Optional[int]:
+    """HTTP status for LLMError / google.api_core errors, None otherwise."""
+    for attr in ("status_code", "code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Retry on throttling, server errors and timeouts / dropped connections.
+    Never on client errors (400/401/403/404) or bad model output (ValueError).
+    """
+    if isinstance(error, (httpx.TimeoutException, httpx.TransportError, asyncio.TimeoutError, TimeoutError)):
+        return True
+
+    status = status_of(error)
+    return status in RETRYABLE_STATUS
+
+
+class RetryPolicy:
+    """
+    Classified retries with "full jitter" exponential backoff:
+    sleep = random(0, min(cap, base * 2**attempt)), or the provider's
+    Retry-After when it sent one.
+    """
+
+    def __init__(
+        self,
+        max_retries: Optional[int] = None,
+        base: Optional[float] = None,
+        cap: Optional[float] = None
+    ):
+        self.max_retries = settings.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.base = base or settings.LLM_BACKOFF_BASE_SECONDS
+        self.cap = cap or settings.LLM_BACKOFF_MAX_SECONDS
+
+    def delay(self, attempt: int, error: Exception) -> float:
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            return min(float(retry_after), self.cap)
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+    async def run_async(
+        self,
+        call: Callable[[], Awaitable],
+        on_retry: Optional[Callable[[Exception, float], None]] = None
+    ):
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                wait = self.delay(attempt, e)
+                if on_retry:
+                    on_retry(e, wait)
+                attempt += 1
+                await asyncio.sleep(wait)
+
+    def run_sync(
+        self,
+        call: Callable[[], object],
+        on_retry: Optional[Callable[[Exception, float], None]] = None
+    ):
+        attempt = 0
+        while True:
+            try:
+                return call()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e):
+                    raise
+                wait = self.delay(attempt, e)
+                if on_retry:
+                    on_retry(e, wait)
+                attempt += 1
+                time.sleep(wait)
+
+
+class LatencyTracker:
+    """
+    Sliding window of recent call latencies per call kind (single, chunk,
+    batch, repair, ...), used to pick the hedge delay. Kinds are kept apart
+    so small repair calls don't pull down the delay of full extractions.
+    """
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, kind: str, seconds: float):
+        self._samples.setdefault(kind, deque(maxlen=self.window)).append(seconds)
+
+    def count(self, kind: str) -> int:
+        return len(self._samples.get(kind, ()))
+
+    def quantile(self, kind: str, q: float) -> Optional[float]:
+        samples = self._samples.get(kind)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
@@ -841,8 +841,239 @@
 #         return structured
 
 
+import io
+import math
+import os
+import tempfile
 import pdfplumber
 import camelot
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from pypdf import PdfReader, PdfWriter
+
+from app.utils.config import settings
+
+
+def _inside(obj: Dict, bbox: Tuple[float, float, float, float]) -> bool:
+    """Whether the centre of a pdfplumber char / word lies in (x0, top, x1, bottom)."""
+    x = (obj["x0"] + obj["x1"]) / 2
+    y = (obj["top"] + obj["bottom"]) / 2
+    return bbox[0] <= x <= bbox[2] and bbox[1] <= y <= bbox[3]
+
+
+# Share of the words in a table region that must appear in the camelot
+# cells before the region is cut from the prompt text
+TABLE_TEXT_COVERAGE = 0.9
+
+
+class ParsedPage:
+    """
+    A single pdfplumber page, parsed once.
+    Text, words and ruling lines/rects are computed on first access
+    and reused by every stage that reads the page afterwards.
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.page_number: int = page.page_number
+        self.width: float = float(page.width)
+        self.height: float = float(page.height)
+        self._text: Optional[str] = None
+        self._words: Optional[List[Dict]] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = self.page.extract_text() or ""
+        return self._text
+
+    @property
+    def words(self) -> List[Dict]:
+        if self._words is None:
+            self._words = self.page.extract_words()
+        return self._words
+
+    @property
+    def lines(self) -> List[Dict]:
+        return self.page.lines
+
+    @property
+    def rects(self) -> List[Dict]:
+        return self.page.rects
+
+    def text_outside(self, regions: List[Tuple[Tuple[float, float, float, float], str]]) -> str:
+        """
+        Page text without the characters inside each (x0, top, x1, bottom)
+        region; the region's label takes its place, as a line of its own.
+        """
+        def outside(obj) -> bool:
+            return obj.get("object_type") != "char" or not any(
+                _inside(obj, bbox) for bbox, _ in regions
+            )
+
+        lines = [(line["top"], line["text"]) for line in self.page.filter(outside).extract_text_lines()]
+        lines += [(bbox[1], label) for bbox, label in regions]
+        return "\n".join(text for _, text in sorted(lines, key=lambda line: line[0]))
+
+    def release(self):
+        """Drop cached parse results (pdfplumber objects included) for this page."""
+        self._text = None
+        self._words = None
+        self.page.close()
+
+    def count_rulings(self, tolerance: float = 2.0) -> Tuple[int, int]:
+        """
+        Count horizontal / vertical ruling segments from lines and rects.
+        Thin rects count as one ruling, larger rects as their four borders.
+        """
+        horizontal = vertical = 0
+
+        for line in self.lines:
+            if abs(line["top"] - line["bottom"]) <= tolerance:
+                horizontal += 1
+            elif abs(line["x0"] - line["x1"]) <= tolerance:
+                vertical += 1
+
+        for rect in self.rects:
+            w = abs(rect["x1"] - rect["x0"])
+            h = abs(rect["bottom"] - rect["top"])
+            if h <= tolerance and w > tolerance:
+                horizontal += 1
+            elif w <= tolerance and h > tolerance:
+                vertical += 1
+            elif w > tolerance and h > tolerance:
+                horizontal += 2
+                vertical += 2
+
+        return horizontal, vertical
+
+
+class ParsedDocument:
+    """
+    Parsed PDF document
+    ===================
+    Opens the PDF once and exposes its pages to the text, words,
+    lines/rects and table stages so none of them re-open the file.
+
+    The source is either a path on disk or the raw PDF bytes. With bytes,
+    pdfplumber reads from memory; a path (on IN_MEMORY_TMPFS_DIR) is only
+    materialized if a stage that needs one (camelot, sharded text) runs.
+    """
+
+    def __init__(self, source: Union[str, bytes]):
+        if isinstance(source, (bytes, bytearray)):
+            self._data = bytes(source)
+            self._path: Optional[str] = None
+            self._owns_path = True
+            self._pdf = pdfplumber.open(io.BytesIO(self._data))
+        else:
+            self._data = None
+            self._path = source
+            self._owns_path = False
+            self._pdf = pdfplumber.open(source)
+
+        self.pages: List[ParsedPage] = [ParsedPage(p) for p in self._pdf.pages]
+        self._reader: Optional[PdfReader] = None
+
+    @property
+    def path(self) -> str:
+        if self._path is None:
+            self._path = self._materialize()
+        return self._path
+
+    @staticmethod
+    def _temp_pdf(prefix: str):
+        # camelot only accepts paths ending in .pdf, so no memfd here
+        tmp_dir = settings.IN_MEMORY_TMPFS_DIR
+        if not tmp_dir or not os.path.isdir(tmp_dir):
+            tmp_dir = None
+
+        fd, path = tempfile.mkstemp(suffix=".pdf", prefix=prefix, dir=tmp_dir)
+        return os.fdopen(fd, "wb"), path
+
+    def _materialize(self) -> str:
+        f, path = self._temp_pdf("invoice_")
+        with f:
+            f.write(self._data)
+        return path
+
+    def page_path(self, page_number: int) -> str:
+        """
+        Temp file holding only page `page_number`, for camelot runs on a
+        single page: camelot reads whatever file it is given in full.
+        The caller removes it.
+        """
+        if self._reader is None:
+            self._reader = PdfReader(io.BytesIO(self._data) if self._data is not None else self._path)
+
+        writer = PdfWriter()
+        writer.add_page(self._reader.pages[page_number - 1])
+        f, path = self._temp_pdf("invoice_page_")
+        with f:
+            writer.write(f)
+        return path
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    @property
+    def page_numbers(self) -> List[int]:
+        return [p.page_number for p in self.pages]
+
+    def close(self):
+        self._pdf.close()
+        if self._owns_path and self._path:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            self._path = None
+
+    def __enter__(self) -> "ParsedDocument":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _extract_page_range(pdf_path: str, first: int, last: int) -> List[str]:
+    """
+    Worker for parallel text extraction: text of pages first..last (1-indexed).
+    Module-level so it can be shipped to a process pool.
+    """
+    with pdfplumber.open(pdf_path, pages=list(range(first, last + 1))) as pdf:
+        return [page.extract_text() or "" for page in pdf.pages]
+
+
+def _join_pages(page_texts: List[str], page_numbers: List[int]) -> Tuple[str, List[Dict]]:
+    """
+    Join page texts in page order and record where each page lands.
+    Offsets refer to the final (stripped) text, empty pages are skipped.
+    """
+    parts = []
+    offsets = []
+    cursor = 0
+    for number, page_text in zip(page_numbers, page_texts):
+        if not page_text:
+            continue
+        if parts:
+            cursor += 1  # "\n" separator
+        offsets.append({"page": number, "start": cursor, "end": cursor + len(page_text)})
+        parts.append(page_text)
+        cursor += len(page_text)
+
+    text = "\n".join(parts)
+    lead = len(text) - len(text.lstrip())
+    text = text.strip()
+
+    for o in offsets:
+        o["start"] = min(max(o["start"] - lead, 0), len(text))
+        o["end"] = min(max(o["end"] - lead, 0), len(text))
+
+    return text, offsets
 
 
 class PDFProcessor:
@@ -850,24 +1081,113 @@ class PDFProcessor:
     Handles DIGITAL PDFs
     - Extracts full text
     - Extracts structured tables
+
+    Every method accepts a PDF path, the PDF bytes, or an already opened
+    ParsedDocument (see `open`), so one parse can feed all stages.
+
+    Long PDFs (>= PARALLEL_TEXT_MIN_PAGES) have their text extracted
+    in page shards across TEXT_WORKERS processes. The pipeline's parse
+    workers turn this off (parse_pdf) so pools are never nested.
     """
 
-    def extract_text(self, pdf_path: str) -> str:
-        text = ""
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text += page_text + "\n"
-        return text.strip()
-
-    def extract_tables(self, pdf_path: str):
-        tables = camelot.read_pdf(
-            pdf_path,
-            pages="all",
-            flavor="lattice"
-        )
+    def __init__(self, text_workers: Optional[int] = None, parallel_min_pages: Optional[int] = None):
+        self.text_workers = settings.TEXT_WORKERS if text_workers is None else text_workers
+        self.parallel_min_pages = parallel_min_pages or settings.PARALLEL_TEXT_MIN_PAGES
+
+    def open(self, source: Union[str, bytes]) -> ParsedDocument:
+        return ParsedDocument(source)
+
+    @contextmanager
+    def _document(self, source: Union[str, bytes, ParsedDocument]):
+        if isinstance(source, ParsedDocument):
+            yield source
+            return
+
+        with self.open(source) as doc:
+            yield doc
+
+    def extract_text(self, source: Union[str, bytes, ParsedDocument]) -> str:
+        return self.extract_text_with_offsets(source)["text"]
+
+    def extract_text_with_offsets(
+        self,
+        source: Union[str, bytes, ParsedDocument],
+        parallel: Optional[bool] = None
+    ) -> Dict:
+        """
+        Extract text in page order.
+
+        Args:
+            source: PDF path or ParsedDocument
+            parallel: force (True) / disable (False) sharding across processes;
+                      None = auto, based on page count
+
+        Returns:
+            {"text": str, "page_offsets": [{"page", "start", "end"}, ...]}
+        """
+        with self._document(source) as doc:
+            if parallel is None:
+                parallel = self.text_workers > 1 and doc.page_count >= self.parallel_min_pages
+
+            if parallel and doc.page_count > 1:
+                page_texts = self._extract_text_parallel(doc.path, doc.page_count)
+                # Share the result with later stages reading the same document
+                for page, page_text in zip(doc.pages, page_texts):
+                    page._text = page_text
+            else:
+                page_texts = [page.text for page in doc.pages]
+
+            text, offsets = _join_pages(page_texts, doc.page_numbers)
+
+        return {"text": text, "page_offsets": offsets}
+
+    def _extract_text_parallel(self, pdf_path: str, page_count: int) -> List[str]:
+        workers = max(1, min(self.text_workers, page_count))
+        shard = math.ceil(page_count / workers)
+        ranges = [
+            (first, min(first + shard - 1, page_count))
+            for first in range(1, page_count + 1, shard)
+        ]
+
+        with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+            futures = [
+                pool.submit(_extract_page_range, pdf_path, first, last)
+                for first, last in ranges
+            ]
+            # Collect in submission (= page) order
+            page_texts = []
+            for future in futures:
+                page_texts.extend(future.result())
+
+        return page_texts
+
+    def _plan_page(self, page: ParsedPage) -> Dict:
+        if not settings.TABLE_PREPASS_ENABLED:
+            return {"page": page.page_number, "run": True, "horizontal": None, "vertical": None}
+
+        min_rulings = settings.TABLE_MIN_RULINGS
+        horizontal, vertical = page.count_rulings()
+        return {
+            "page": page.page_number,
+            "run": horizontal >= min_rulings and vertical >= min_rulings,
+            "horizontal": horizontal,
+            "vertical": vertical,
+        }
+
+    def plan_table_pages(self, source: Union[str, bytes, ParsedDocument]) -> List[Dict]:
+        """
+        Cheap pre-pass deciding which pages camelot (lattice) should run on.
+        A lattice table needs a grid, so pages without enough horizontal
+        AND vertical rulings are skipped.
 
+        Returns:
+            [{"page", "run", "horizontal", "vertical"}, ...] in page order
+        """
+        with self._document(source) as doc:
+            return [self._plan_page(page) for page in doc.pages]
+
+    @staticmethod
+    def _structure_tables(tables) -> List[List[Dict]]:
         structured = []
         for table in tables:
             df = table.df
@@ -881,9 +1201,157 @@ class PDFProcessor:
 
         return structured
 
-    # ✅ ADD THIS METHOD (THIS FIXES EVERYTHING)
-    def process(self, pdf_path: str):
+    def extract_tables(self, source: Union[str, bytes, ParsedDocument], plan: Optional[List[Dict]] = None):
+        return [table["rows"] for table in self.extract_tables_by_page(source, plan)]
+
+    def extract_tables_by_page(
+        self,
+        source: Union[str, bytes, ParsedDocument],
+        plan: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Returns:
+            [{"page": int, "rows": [record, ...], "bbox": (x0, top, x1, bottom)}, ...]
+            in page order; bbox in pdfplumber coordinates
+        """
+        with self._document(source) as doc:
+            if plan is None:
+                plan = self.plan_table_pages(doc)
+
+            candidates = [p["page"] for p in plan if p["run"]]
+            if not candidates:
+                return []
+
+            # Explicit page list: camelot skips its own page-count pass
+            tables = camelot.read_pdf(
+                doc.path,
+                pages=",".join(str(n) for n in candidates),
+                flavor="lattice"
+            )
+            heights = {page.page_number: page.height for page in doc.pages}
+
+        # camelot bboxes are PDF user space (origin bottom-left), pdfplumber's top-left
+        return [
+            {
+                "page": int(table.page),
+                "rows": rows,
+                "bbox": (
+                    table._bbox[0],
+                    heights[int(table.page)] - table._bbox[3],
+                    table._bbox[2],
+                    heights[int(table.page)] - table._bbox[1],
+                ),
+            }
+            for table, rows in zip(tables, self._structure_tables(tables))
+        ]
+
+    @staticmethod
+    def _covered(page: ParsedPage, table: Dict) -> bool:
+        """Whether the table's cells hold (nearly) all the words in its region."""
+        words = [word["text"] for word in page.words if _inside(word, table["bbox"])]
+        cells = set()
+        for row in table["rows"]:
+            for value in list(row.keys()) + list(row.values()):
+                cells.update(str(value).split())
+        return bool(words) and sum(word in cells for word in words) >= TABLE_TEXT_COVERAGE * len(words)
+
+    def text_without_tables(self, source: Union[str, bytes, ParsedDocument], tables: List[Dict]) -> Optional[Dict]:
+        """
+        Text with each table region (see extract_tables_by_page) replaced by
+        a "[see TABLES: <headers>]" line, so table cells are not sent twice.
+        A region whose words camelot did not fully capture is left as it is.
+
+        Returns:
+            {"text", "page_offsets", "tables_removed"}, or None when no
+            region was removed
+        """
+        with self._document(source) as doc:
+            regions = {}
+            for table in tables:
+                page = doc.pages[table["page"] - 1]
+                if table.get("bbox") and self._covered(page, table):
+                    cells = (" ".join(str(h).split()) for h in (table["rows"][0] if table["rows"] else {}))
+                    headers = " | ".join(cell for cell in cells if cell)
+                    regions.setdefault(page.page_number, []).append((table["bbox"], f"[see TABLES: {headers}]"))
+
+            if not regions:
+                return None
+
+            page_texts = [
+                page.text_outside(regions[page.page_number]) if page.page_number in regions else page.text
+                for page in doc.pages
+            ]
+            text, offsets = _join_pages(page_texts, doc.page_numbers)
+
         return {
-            "text": self.extract_text(pdf_path),
-            "tables": self.extract_tables(pdf_path)
+            "text": text,
+            "page_offsets": offsets,
+            "tables_removed": sum(len(r) for r in regions.values()),
         }
+
+    def _page_tables(self, doc: ParsedDocument, page_number: int) -> List[List[Dict]]:
+        path = doc.page_path(page_number)
+        try:
+            return self._structure_tables(camelot.read_pdf(path, pages="1", flavor="lattice"))
+        finally:
+            os.remove(path)
+
+    def iter_pages(self, source: Union[str, bytes, ParsedDocument], tables: bool = True) -> Iterator[Dict]:
+        """
+        Lazily yield per-page results as each page finishes.
+
+        Each page is released right after it is yielded, so memory stays
+        flat regardless of page count. camelot runs only on the pages the
+        pre-pass picks, each split out into a one-page file, so a page
+        costs the same on page 300 as on page 1. Use instead of `process`
+        for very long documents or when downstream stages can start early.
+
+        Yields:
+            {"page", "text", "words", "tables", "table_decision"}
+        """
+        with self._document(source) as doc:
+            for page in doc.pages:
+                decision = self._plan_page(page)
+                page_tables = self._page_tables(doc, page.page_number) if tables and decision["run"] else []
+
+                yield {
+                    "page": page.page_number,
+                    "text": page.text,
+                    "words": page.words,
+                    "tables": page_tables,
+                    "table_decision": decision,
+                }
+
+                page.release()
+
+    def process(self, source: Union[str, bytes], parallel: Optional[bool] = None):
+        """
+        parallel: passed to extract_text_with_offsets (None = auto).
+
+        Returns:
+            {"text", "tables", "table_pages" (pre-pass plan),
+             "page_offsets" (page spans in text), "table_page_numbers" (page of each table)}
+            plus, with EXCLUDE_TABLE_TEXT and a table region removed,
+            "prompt_text" / "prompt_page_offsets" / "tables_removed"
+            (see text_without_tables; "text" keeps the table lines)
+        """
+        with self.open(source) as doc:
+            plan = self.plan_table_pages(doc)
+            extracted = self.extract_text_with_offsets(doc, parallel)
+            tables = self.extract_tables_by_page(doc, plan)
+            result = {
+                "text": extracted["text"],
+                "tables": [table["rows"] for table in tables],
+                "table_pages": plan,
+                "page_offsets": extracted["page_offsets"],
+                "table_page_numbers": [table["page"] for table in tables]
+            }
+
+            stripped = self.text_without_tables(doc, tables) if settings.EXCLUDE_TABLE_TEXT and tables else None
+            if stripped:
+                result.update(
+                    prompt_text=stripped["text"],
+                    prompt_page_offsets=stripped["page_offsets"],
+                    tables_removed=stripped["tables_removed"],
+                )
+            return result
@@ -0,0 +1,329 @@
+import asyncio
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import AsyncIterator, Callable, Dict, Optional, Union
+
+from app.services.chunked_extractor import ChunkedExtractor
+from app.services.field_repair import FieldRepairer
+from app.services.gemini_client import estimate_tokens
+from app.services.layout_templates import LayoutTemplateStore
+from app.services.llm_batcher import ExtractionBatcher
+from app.services.llm_metrics import llm_metrics
+from app.services.pdf_processor import PDFProcessor
+from app.services.result_cache import ResultCache
+from app.services.rule_extractor import RuleExtractor
+from app.services.text_pruner import TextPruner
+from app.utils.config import settings
+
+
+class PipelineOverloaded(Exception):
+    """Too many extractions pending; caller should retry later (HTTP 429)."""
+
+
+class PipelineUnavailable(Exception):
+    """Parse workers are down or shutting down (HTTP 503)."""
+
+
+def parse_pdf(source: Union[str, bytes], parallel: Optional[bool] = False) -> Dict:
+    """
+    CPU-bound parse stage (pdfplumber + camelot).
+    Module-level so it can be shipped to a process pool.
+    source is a PDF path or, in diskless mode, the PDF bytes.
+
+    Text sharding (TEXT_WORKERS) stays off by default: inside a
+    PARSE_WORKERS process it would start a nested pool per document.
+    """
+    return PDFProcessor().process(source, parallel=parallel)
+
+
+class ExtractionPipeline:
+    """
+    Extraction Pipeline
+    ===================
+    Runs PDF parsing + AI extraction without blocking the event loop.
+
+    - parsing runs in a process pool (PARSE_WORKERS)
+    - a learned vendor layout template answers first, then the rule
+      extractor; Gemini is only called when neither is confident
+    - the prompt text leaves out the table regions, which the TABLES
+      section already carries (EXCLUDE_TABLE_TEXT), and is stripped of
+      repeated headers/footers and boilerplate (PRUNE_ENABLED)
+    - long documents (CHUNK_MIN_PAGES+) are extracted as parallel chunks
+    - an LLM answer with missing / inconsistent fields gets one small
+      follow-up call for just those fields (REPAIR_ENABLED)
+    - the Gemini call runs on the async client (LLM_ASYNC) or in a thread
+      pool (LLM_CONCURRENCY), optionally packed with other invoices by ExtractionBatcher (LLM_BATCHING)
+    - at most MAX_PENDING_EXTRACTIONS documents are admitted at once;
+      beyond that PipelineOverloaded is raised instead of queueing forever
+    """
+
+    def __init__(
+        self,
+        ai_extractor,
+        result_cache: Optional[ResultCache] = None,
+        templates: Optional[LayoutTemplateStore] = None,
+        parse_workers: Optional[int] = None,
+        llm_concurrency: Optional[int] = None,
+        max_pending: Optional[int] = None
+    ):
+        self.ai_extractor = ai_extractor
+        self.result_cache = result_cache
+        self.templates = templates
+
+        self.parse_workers = settings.PARSE_WORKERS if parse_workers is None else parse_workers
+        self.llm_concurrency = llm_concurrency or settings.LLM_CONCURRENCY
+        self.max_pending = max_pending or settings.MAX_PENDING_EXTRACTIONS
+
+        self._parse_pool = None
+        self._llm_pool = ThreadPoolExecutor(
+            max_workers=self.llm_concurrency,
+            thread_name_prefix="llm"
+        )
+        self.rules = RuleExtractor() if settings.RULE_FASTPATH_ENABLED else None
+        self.pruner = TextPruner() if settings.PRUNE_ENABLED else None
+        self.chunker = (
+            ChunkedExtractor(ai_extractor, self._llm_pool)
+            if settings.CHUNKED_EXTRACTION else None
+        )
+        self.batcher = (
+            ExtractionBatcher(ai_extractor, self._llm_pool)
+            if settings.LLM_BATCHING else None
+        )
+        self.repairer = FieldRepairer(ai_extractor, self._llm_pool) if settings.REPAIR_ENABLED else None
+        self._pending = 0
+        self._closed = False
+
+    # ============================================
+    # POOLS
+    # ============================================
+
+    def _get_parse_pool(self):
+        if self._closed:
+            raise PipelineUnavailable("Pipeline is shutting down")
+
+        if self._parse_pool is None:
+            if self.parse_workers > 0:
+                self._parse_pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+            else:
+                # As many documents in parse as can be in the LLM stage;
+                # long ones still shard their text across TEXT_WORKERS processes
+                self._parse_pool = ThreadPoolExecutor(
+                    max_workers=self.llm_concurrency,
+                    thread_name_prefix="parse"
+                )
+        return self._parse_pool
+
+    def shutdown(self):
+        self._closed = True
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+        self._llm_pool.shutdown(wait=False, cancel_futures=True)
+
+    # ============================================
+    # ADMISSION CONTROL
+    # ============================================
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @contextmanager
+    def admit(self):
+        if self._pending >= self.max_pending:
+            raise PipelineOverloaded(
+                f"{self._pending} extractions pending (limit {self.max_pending})"
+            )
+
+        self._pending += 1
+        try:
+            yield
+        finally:
+            self._pending -= 1
+
+    # ============================================
+    # STAGES
+    # ============================================
+
+    async def parse(self, source: Union[str, bytes]) -> Dict:
+        loop = asyncio.get_running_loop()
+        try:
+            # Shard long documents only when parsing on a thread (no parse processes to nest under)
+            return await loop.run_in_executor(
+                self._get_parse_pool(), parse_pdf, source, None if self.parse_workers <= 0 else False
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge PDF); start fresh next time
+            self._parse_pool = None
+            raise PipelineUnavailable("Parse worker crashed")
+
+    def fast_path(self, parsed: Dict) -> Optional[Dict]:
+        """Learned layout template, then rules; None means the LLM is needed."""
+        if self.templates:
+            result = self.templates.match(parsed["text"], parsed["tables"])
+            if result is not None:
+                return result
+
+        if self.rules:
+            return self.rules.fast_path(parsed["text"], parsed["tables"])
+
+        return None
+
+    async def extract(self, parsed: Dict) -> Dict:
+        result = self.fast_path(parsed)
+        if result is not None:
+            return result
+
+        llm_input = self.prompt_input(parsed)
+        result = self._note_pruning(await self.extract_llm(llm_input), llm_input)
+        return await self.repair(result, parsed)
+
+    def prompt_input(self, parsed: Dict) -> Dict:
+        """
+        What the LLM is shown: `parsed` with the table regions cut from the
+        text (PDFProcessor "prompt_text") and boilerplate pruned.
+        """
+        if parsed.get("prompt_text") is not None:
+            before, after = estimate_tokens(parsed["text"]), estimate_tokens(parsed["prompt_text"])
+            parsed = {
+                **parsed,
+                "text": parsed["prompt_text"],
+                "page_offsets": parsed["prompt_page_offsets"],
+                "table_text": {
+                    "tables_removed": parsed["tables_removed"],
+                    "tokens_before": before,
+                    "tokens_after": after,
+                    "tokens_saved": before - after,
+                },
+            }
+        return self.pruner.prune(parsed) if self.pruner else parsed
+
+    @staticmethod
+    def _note_pruning(result: Dict, llm_input: Dict) -> Dict:
+        for key in ("table_text", "pruning"):
+            if key in llm_input:
+                result.setdefault("_metadata", {})[key] = llm_input[key]
+        return result
+
+    async def repair(self, result: Dict, parsed: Dict) -> Dict:
+        if self.repairer is None:
+            return result
+        return await self.repairer.repair(result, parsed)
+
+    def streamable(self, parsed: Dict) -> bool:
+        """Only the plain single async call can stream; chunks/batches arrive whole."""
+        return settings.LLM_ASYNC and not self.batcher and not (self.chunker and self.chunker.applies(parsed))
+
+    async def extract_llm(self, parsed: Dict) -> Dict:
+        if self.chunker and self.chunker.applies(parsed):
+            return await self.chunker.extract(parsed)
+
+        if self.batcher:
+            return await self.batcher.submit(parsed["text"], parsed["tables"])
+
+        if settings.LLM_ASYNC:
+            return await self.ai_extractor.extract_async(parsed["text"], parsed["tables"])
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._llm_pool,
+            self.ai_extractor.extract_from_text,
+            parsed["text"],
+            parsed["tables"]
+        )
+
+    # ============================================
+    # FULL RUN
+    # ============================================
+
+    def lookup(self, digest: Optional[str]) -> Optional[Dict]:
+        if not self.result_cache or not digest:
+            return None
+        return self.result_cache.get(digest)
+
+    async def process(
+        self,
+        source: Union[str, bytes],
+        digest: Optional[str] = None,
+        on_stage: Optional[Callable[[str, str], None]] = None
+    ) -> Dict:
+        """
+        Parse + extract one document without admission control.
+        on_stage(stage, state) is called as "parse"/"extract" start and finish.
+        """
+        report = on_stage or (lambda stage, state: None)
+
+        report("parse", "running")
+        parsed = await self.parse(source)
+        report("parse", "done")
+
+        if self.templates and digest:
+            self.templates.remember(digest, parsed)
+
+        report("extract", "running")
+        start = time.perf_counter()
+        result = await self.extract(parsed)
+        report("extract", "done")
+
+        return self._finish(result, parsed, digest, time.perf_counter() - start)
+
+    async def stream(self, source: Union[str, bytes], digest: Optional[str] = None) -> AsyncIterator[Dict]:
+        """
+        `run` as a sequence of events (for the SSE endpoint):
+        {"type": "stage", "stage", "state"} as stages start and finish,
+        {"type": "field"} / {"type": "item"} while Gemini is still writing,
+        and finally {"type": "result", "value": <same dict as run>}.
+        """
+        with self.admit():
+            yield {"type": "stage", "stage": "parse", "state": "running"}
+            parsed = await self.parse(source)
+            yield {"type": "stage", "stage": "parse", "state": "done"}
+
+            if self.templates and digest:
+                self.templates.remember(digest, parsed)
+
+            yield {"type": "stage", "stage": "extract", "state": "running"}
+            start = time.perf_counter()
+            result = self.fast_path(parsed)
+
+            if result is None:
+                llm_input = self.prompt_input(parsed)
+                if self.streamable(llm_input):
+                    async for event in self.ai_extractor.extract_stream(llm_input["text"], llm_input["tables"]):
+                        if event["type"] == "result":
+                            result = event["value"]
+                        else:
+                            yield event
+                else:
+                    result = await self.extract_llm(llm_input)
+                result = await self.repair(self._note_pruning(result, llm_input), parsed)
+            yield {"type": "stage", "stage": "extract", "state": "done"}
+
+            seconds = time.perf_counter() - start
+            yield {"type": "result", "value": self._finish(result, parsed, digest, seconds)}
+
+    def _finish(self, result: Dict, parsed: Dict, digest: Optional[str], seconds: float) -> Dict:
+        metadata = result.setdefault("_metadata", {})
+        method = metadata.get("method") or ("chunked" if metadata.get("chunked") else "llm")
+        llm_metrics.record_extraction(method, seconds)
+
+        if parsed.get("table_pages") is not None:
+            metadata["table_pages"] = parsed["table_pages"]
+        if digest:
+            # Sent back with /save-invoice so the confirmation can teach a layout template
+            metadata["document_id"] = digest
+
+        if self.result_cache and digest:
+            self.result_cache.put(digest, result)
+
+        return result
+
+    async def run(
+        self,
+        source: Union[str, bytes],
+        digest: Optional[str] = None,
+        on_stage: Optional[Callable[[str, str], None]] = None
+    ) -> Dict:
+        with self.admit():
+            return await self.process(source, digest, on_stage)
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from app.utils.config import settings
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at `per_minute` units/minute.
+    A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.per_minute = per_minute
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        if self.rate <= 0:
+            return
+
+        # A single request bigger than the bucket waits for a full bucket
+        amount = min(amount, self.capacity)
+
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+    def charge(self, amount: float):
+        """Take extra units after the fact (e.g. actual > estimated tokens); may go negative."""
+        if self.rate <= 0 or amount <= 0:
+            return
+        self._refill()
+        self.level -= amount
+
+
+class LLMRateLimiter:
+    """
+    LLM Rate Limiter
+    ================
+    Shared by every async LLM call in the process:
+    - at most `max_in_flight` requests at once
+    - request bucket (LLM_RPM) and token bucket (LLM_TPM)
+    - a provider 429 pauses everyone until its Retry-After has passed
+    """
+
+    def __init__(
+        self,
+        max_in_flight: Optional[int] = None,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None
+    ):
+        self.max_in_flight = max_in_flight or settings.LLM_CONCURRENCY
+        self.requests = TokenBucket(settings.LLM_RPM if rpm is None else rpm)
+        self.tokens = TokenBucket(settings.LLM_TPM if tpm is None else tpm)
+
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._resume_at = 0.0
+        self.in_flight = 0
+
+    def cool_down(self, seconds: float):
+        self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        async with self._semaphore:
+            delay = self._resume_at - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+
+            self.in_flight += 1
+            try:
+                yield
+            finally:
+                self.in_flight -= 1
@@ -0,0 +1,188 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from app.utils.config import settings
+
+
+class ResultCache:
+    """
+    Extraction Result Cache
+    =======================
+    Content-addressed cache for /extract-invoice results.
+
+    Keys are the SHA-256 of the uploaded bytes plus the pipeline version,
+    so re-uploads of the same PDF skip parsing and the Gemini call.
+
+    Tiers:
+    - memory: LRU, bounded by RESULT_CACHE_MEMORY_MB
+    - disk:   SQLite, bounded by RESULT_CACHE_DISK_MB (least recently used evicted)
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[Path] = None,
+        memory_mb: Optional[int] = None,
+        disk_mb: Optional[int] = None,
+        version: Optional[str] = None
+    ):
+        self.version = version or settings.PIPELINE_VERSION
+        self.memory_max_bytes = (memory_mb if memory_mb is not None else settings.RESULT_CACHE_MEMORY_MB) * 1024 * 1024
+        self.disk_max_bytes = (disk_mb if disk_mb is not None else settings.RESULT_CACHE_DISK_MB) * 1024 * 1024
+
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+        db_path = Path(db_path or settings.RESULT_CACHE_DB)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " accessed REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_results_accessed ON results (accessed)")
+        self._db.commit()
+
+    # ============================================
+    # KEYS
+    # ============================================
+
+    @staticmethod
+    def hash_bytes(data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
+
+    def key(self, digest: str) -> str:
+        return f"{self.version}:{digest}"
+
+    # ============================================
+    # LOOKUP / STORE
+    # ============================================
+
+    def get(self, digest: str) -> Optional[Dict]:
+        key = self.key(digest)
+
+        with self._lock:
+            blob = self._memory.get(key)
+            if blob is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return json.loads(blob)
+
+            row = self._db.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.stats["misses"] += 1
+                return None
+
+            blob = bytes(row[0])
+            self._db.execute(
+                "UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            self._remember(key, blob)
+            self.stats["disk_hits"] += 1
+
+        return json.loads(blob)
+
+    def put(self, digest: str, result: Dict):
+        key = self.key(digest)
+        blob = json.dumps(result, default=str).encode("utf-8")
+
+        with self._lock:
+            self._remember(key, blob)
+
+            if len(blob) <= self.disk_max_bytes:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                    (key, blob, len(blob), time.time())
+                )
+                self._evict_disk()
+                self._db.commit()
+
+            self.stats["stores"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+
+    # ============================================
+    # EVICTION
+    # ============================================
+
+    def _remember(self, key: str, blob: bytes):
+        if len(blob) > self.memory_max_bytes:
+            return
+
+        old = self._memory.pop(key, None)
+        if old is not None:
+            self._memory_bytes -= len(old)
+
+        self._memory[key] = blob
+        self._memory_bytes += len(blob)
+
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self.stats["memory_evictions"] += 1
+
+    def _evict_disk(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+
+        rows = self._db.execute("SELECT key, size FROM results ORDER BY accessed ASC")
+        doomed = []
+        for key, size in rows:
+            if total <= self.disk_max_bytes:
+                break
+            doomed.append((key,))
+            total -= size
+
+        self._db.executemany("DELETE FROM results WHERE key = ?", doomed)
+        self.stats["disk_evictions"] += len(doomed)
+
+    # ============================================
+    # STATS
+    # ============================================
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            disk_entries, disk_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+            ).fetchone()
+
+            lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+            hits = lookups - self.stats["misses"]
+
+            return {
+                **self.stats,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+                "version": self.version,
+            }
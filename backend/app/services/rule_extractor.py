@@ -0,0 +1,445 @@
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.config import settings
+
+# --------------------------------------------------
+# PATTERNS
+# --------------------------------------------------
+
+# 1.234,56 / 1,234.56 / 1 234,56 / 130.00 — always two decimals, so ids and years don't match
+AMOUNT_RE = re.compile(r"(?<![\d.,])-?\d{1,3}(?:[.,\s']\d{3})*[.,]\d{2}(?![\d.,]*\d)|(?<![\d.,])-?\d+[.,]\d{2}(?![\d])")
+PERCENT_RE = re.compile(r"\d+(?:[.,]\d+)?\s*%")
+
+INVOICE_NUMBER_RE = re.compile(
+    r"\b(?:invoice|rechnung|bill)\s*(?:no\.?|number|nr\.?|nummer|#|id)\s*[:#.]?\s*([A-Z0-9][A-Z0-9\-/_.]{2,})",
+    re.IGNORECASE
+)
+DATE_LABEL_RE = re.compile(
+    r"\b(?:invoice\s+date|date\s+of\s+issue|issue\s+date|rechnungsdatum|datum|date)\b\s*[:.]?\s*(.+)",
+    re.IGNORECASE
+)
+
+MONTHS = {
+    "jan": 1, "january": 1, "januar": 1, "jänner": 1,
+    "feb": 2, "february": 2, "februar": 2,
+    "mar": 3, "march": 3, "märz": 3, "maerz": 3,
+    "apr": 4, "april": 4,
+    "may": 5, "mai": 5,
+    "jun": 6, "june": 6, "juni": 6,
+    "jul": 7, "july": 7, "juli": 7,
+    "aug": 8, "august": 8,
+    "sep": 9, "sept": 9, "september": 9,
+    "oct": 10, "october": 10, "okt": 10, "oktober": 10,
+    "nov": 11, "november": 11,
+    "dec": 12, "december": 12, "dez": 12, "dezember": 12,
+}
+
+NUMERIC_DATE_RE = re.compile(r"\b(\d{4})-(\d{1,2})-(\d{1,2})\b|\b(\d{1,2})[./](\d{1,2})[./](\d{4})\b")
+DAY_MONTH_YEAR_RE = re.compile(r"\b(\d{1,2})\.?\s+([A-Za-zäÄ]{3,9})\.?\s+(\d{4})\b")
+MONTH_DAY_YEAR_RE = re.compile(r"\b([A-Za-zäÄ]{3,9})\.?\s+(\d{1,2}),?\s+(\d{4})\b")
+
+CURRENCY_SYMBOLS = {"€": "EUR", "$": "USD", "£": "GBP", "₹": "INR", "¥": "JPY"}
+CURRENCY_CODE_RE = re.compile(r"\b(EUR|USD|GBP|INR|CHF|JPY|CAD|AUD)\b")
+
+# Amount lines are matched on their leading label only, so
+# "Please credit the amount invoiced ..." never counts as a total.
+GROSS_LABEL_RE = re.compile(
+    r"^(?:grand\s+total|total\s+due|amount\s+due|balance\s+due|total\s+amount|invoice\s+total"
+    r"|gross\s+amount|total\s+incl|gesamtbetrag|rechnungsbetrag|bruttobetrag|endbetrag)",
+    re.IGNORECASE
+)
+NET_LABEL_RE = re.compile(
+    r"^(?:sub\s*-?\s*total|net\s+amount|net\s+total|total\s+net|total\s+excl|nettobetrag|zwischensumme|summe\s+netto)",
+    re.IGNORECASE
+)
+TAX_LABEL_RE = re.compile(r"^(?:vat|tax|sales\s+tax|gst|mwst|ust|umsatzsteuer|mehrwertsteuer)\b", re.IGNORECASE)
+PLAIN_TOTAL_RE = re.compile(r"^(?:total|summe|gesamt)\b", re.IGNORECASE)
+
+LEGAL_FORM_RE = re.compile(
+    r"\b(?:GmbH|AG|KG|UG|SE|Ltd\.?|Limited|LLC|Inc\.?|Corp\.?|Corporation|PLC|S\.?A\.?|B\.?V\.?|Pvt\.?)(?=\W|$)"
+)
+CUSTOMER_LABEL_RE = re.compile(
+    r"^(?:bill\s+to|billed\s+to|invoice\s+to|sold\s+to|customer|client|rechnungsempfänger|kunde)\s*:?\s*(.*)$",
+    re.IGNORECASE
+)
+
+# Table header keywords -> schema item field
+ITEM_COLUMNS = {
+    "description": ("description", "item", "service", "article", "product", "bezeichnung", "leistung", "artikel"),
+    "quantity": ("qty", "quantity", "menge", "anzahl", "units"),
+    "total": ("total", "line amount", "gesamt", "betrag"),
+    "unit_price": ("unit price", "price", "rate", "einzelpreis", "amount"),
+}
+
+# What each check contributes to the confidence score (sums to 1.0)
+WEIGHTS = {
+    "invoice_number": 0.20,
+    "invoice_date": 0.15,
+    "total": 0.20,
+    "amounts_consistent": 0.15,
+    "items": 0.15,
+    "vendor": 0.10,
+    "currency": 0.05,
+}
+
+
+def text_lines(text: str) -> List[str]:
+    """Non-empty lines with whitespace collapsed."""
+    lines = [" ".join(line.split()) for line in (text or "").splitlines()]
+    return [line for line in lines if line]
+
+
+def find_amounts(value: str) -> List[Tuple[int, float]]:
+    """Every money amount in `value` as (position, float), percentages ignored."""
+    # Same-length blanking keeps positions valid
+    cleaned = PERCENT_RE.sub(lambda m: " " * len(m.group(0)), str(value))
+
+    amounts = []
+    for m in AMOUNT_RE.finditer(cleaned):
+        raw = m.group(0).replace(" ", "").replace("'", "")
+        decimal = raw[-3]
+        thousands = "," if decimal == "." else "."
+        amounts.append((m.start(), round(float(raw.replace(thousands, "").replace(decimal, ".")), 2)))
+    return amounts
+
+
+def parse_amount(value) -> Optional[float]:
+    """'1.234,56 €' / '$1,234.56' / '130.00' -> float (last amount); None if no money amount."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    amounts = find_amounts(value)
+    return amounts[-1][1] if amounts else None
+
+
+def parse_quantity(value) -> Optional[float]:
+    if value is None:
+        return None
+    match = re.search(r"-?\d+(?:[.,]\d+)?", str(value))
+    if not match:
+        return None
+    number = float(match.group(0).replace(",", "."))
+    return int(number) if number.is_integer() else number
+
+
+def find_dates(value: str) -> List[Tuple[int, str]]:
+    """Every valid date in `value` as (position, YYYY-MM-DD), in reading order."""
+    if not value:
+        return []
+
+    candidates = []
+
+    for m in NUMERIC_DATE_RE.finditer(value):
+        if m.group(1):
+            year, month, day = m.group(1), m.group(2), m.group(3)
+        else:
+            # dd.mm.yyyy / dd/mm/yyyy (European order, which is what our vendors send)
+            day, month, year = m.group(4), m.group(5), m.group(6)
+        candidates.append((m.start(), int(year), int(month), int(day)))
+
+    for m in DAY_MONTH_YEAR_RE.finditer(value):
+        month = MONTHS.get(m.group(2).lower())
+        if month:
+            candidates.append((m.start(), int(m.group(3)), month, int(m.group(1))))
+
+    for m in MONTH_DAY_YEAR_RE.finditer(value):
+        month = MONTHS.get(m.group(1).lower())
+        if month:
+            candidates.append((m.start(), int(m.group(3)), month, int(m.group(2))))
+
+    dates = []
+    for position, year, month, day in sorted(candidates):
+        try:
+            dates.append((position, datetime(year, month, day).strftime("%Y-%m-%d")))
+        except ValueError:
+            continue
+    return dates
+
+
+def parse_date(value: str) -> Optional[str]:
+    """First date in `value` as YYYY-MM-DD (numeric, '1. März 2024', 'March 1, 2024')."""
+    dates = find_dates(value)
+    return dates[0][1] if dates else None
+
+
+def _header(name) -> str:
+    return " ".join(str(name).lower().split())
+
+
+def item_columns(rows: List[Dict]) -> Optional[Dict[str, str]]:
+    """Schema item field -> column from the header keywords; None if not an item table."""
+    if not rows:
+        return None
+
+    columns = {}
+    for key in rows[0]:
+        label = _header(key)
+        for field, keywords in ITEM_COLUMNS.items():
+            if field not in columns and any(k in label for k in keywords):
+                columns[field] = key
+                break
+
+    return columns if {"description", "total"} <= columns.keys() else None
+
+
+def items_from_rows(rows: List[Dict], columns: Dict[str, str]) -> List[Dict]:
+    """
+    Item rows -> schema items, given {"description"/"quantity"/"unit_price"/"total": column}.
+    Summary rows (Total / VAT / Gross) have no description and are skipped.
+    """
+    items = []
+    for row in rows:
+        description = " ".join(str(row.get(columns["description"]) or "").split())
+        line_total = parse_amount(row.get(columns["total"]))
+        if not description or line_total is None:
+            continue
+        items.append({
+            "description": description,
+            "quantity": parse_quantity(row.get(columns.get("quantity"))),
+            "unit_price": parse_amount(row.get(columns.get("unit_price"))),
+            "total": line_total,
+        })
+    return items
+
+
+class RuleExtractor:
+    """
+    Rule-Based Invoice Extractor
+    ============================
+    Deterministic fast path for clean, machine-generated invoices.
+
+    Fills the same JSON schema as AIExtractor from the PDFProcessor text
+    and tables using compiled patterns and a few layout rules:
+    - key/value header tables ("Invoice No" | "Date" over one value row)
+    - labelled lines ("Invoice No: ...", "Total 381,12 €")
+    - item tables mapped by header keywords
+    - sender line ("Name - Street - City") above the recipient block
+
+    Every result carries a confidence score in [0, 1] built from which
+    fields were found and whether the amounts add up
+    (subtotal + tax = total, item totals = subtotal). The pipeline only
+    calls Gemini when the score is below RULE_MIN_CONFIDENCE.
+    """
+
+    def __init__(self, min_confidence: Optional[float] = None):
+        self.min_confidence = settings.RULE_MIN_CONFIDENCE if min_confidence is None else min_confidence
+        self.stats = {"hits": 0, "misses": 0}
+
+    # ============================================
+    # ENTRY POINTS
+    # ============================================
+
+    def fast_path(self, text: str, tables: List) -> Optional[Dict]:
+        """Rule result when confident enough, otherwise None (caller falls back to the LLM)."""
+        result = self.extract(text, tables)
+        if result["_metadata"]["rule_confidence"] >= self.min_confidence:
+            self.stats["hits"] += 1
+            return result
+
+        self.stats["misses"] += 1
+        return None
+
+    def extract(self, text: str, tables: List) -> Dict:
+        lines = text_lines(text)
+        rows = [row for table in tables or [] for row in (table if isinstance(table, list) else [table])]
+        rows = [row for row in rows if isinstance(row, dict)]
+
+        header_fields = self._header_table_fields(rows)
+        vendor = self._vendor(lines)
+        items = self._items(tables or [])
+        subtotal, tax, total = self._amounts(lines + self._table_lines(rows))
+
+        data = {
+            "invoice_number": header_fields.get("invoice_number") or self._invoice_number(lines),
+            "invoice_date": header_fields.get("invoice_date") or self._invoice_date(lines),
+            "vendor": vendor,
+            "customer": {"name": self._customer(lines, vendor["name"])},
+            "items": items,
+            "subtotal": subtotal,
+            "tax_amount": tax,
+            "total": total,
+            "currency": self._currency(text or ""),
+        }
+
+        checks = self._checks(data)
+        score = round(sum(WEIGHTS[name] for name, ok in checks.items() if ok), 2)
+
+        data["currency"] = data["currency"] or "EUR"
+        data["_metadata"] = {
+            "extraction_timestamp": datetime.now().isoformat(),
+            "confidence": f"RULES ({score:.2f})",
+            "method": "rules",
+            "rule_confidence": score,
+            "rule_checks": checks,
+        }
+        return data
+
+    # ============================================
+    # FIELDS
+    # ============================================
+
+    @staticmethod
+    def _header_table_fields(rows: List[Dict]) -> Dict:
+        """Header tables: column names are labels, the single row holds the values."""
+        found = {}
+        for row in rows:
+            for key, value in row.items():
+                label, value = _header(key), str(value or "").strip()
+                if not value:
+                    continue
+                if "invoice_number" not in found and re.fullmatch(
+                    r"(?:invoice|rechnung)\s*(?:no\.?|number|nr\.?|nummer|#)", label
+                ):
+                    found["invoice_number"] = value.split()[0]
+                elif "invoice_date" not in found and label in ("date", "invoice date", "datum", "rechnungsdatum"):
+                    date = parse_date(value)
+                    if date:
+                        found["invoice_date"] = date
+        return found
+
+    @staticmethod
+    def _invoice_number(lines: List[str]) -> Optional[str]:
+        for i, line in enumerate(lines):
+            match = INVOICE_NUMBER_RE.search(line)
+            if match and any(c.isdigit() for c in match.group(1)):
+                return match.group(1).rstrip(".")
+
+            # Label row with the values on the next line ("Invoice No  Customer No ...")
+            if re.match(r"^(?:invoice|rechnung)\s*(?:no\.?|nr\.?|number|nummer)\b", line, re.IGNORECASE) \
+                    and i + 1 < len(lines):
+                token = lines[i + 1].split()[0]
+                if any(c.isdigit() for c in token):
+                    return token
+        return None
+
+    @staticmethod
+    def _invoice_date(lines: List[str]) -> Optional[str]:
+        for line in lines:
+            match = DATE_LABEL_RE.search(line)
+            if match:
+                date = parse_date(match.group(1))
+                if date:
+                    return date
+        return None
+
+    @staticmethod
+    def _table_lines(rows: List[Dict]) -> List[str]:
+        """Summary rows of item tables ("", "Total", "", "381,12 €") as flat lines."""
+        return [" ".join(str(v) for v in row.values() if str(v or "").strip()) for row in rows]
+
+    @staticmethod
+    def _amounts(lines: List[str]) -> Tuple[Optional[float], Optional[float], Optional[float]]:
+        gross = net = tax = plain = None
+
+        for line in lines:
+            amount = parse_amount(line)
+            if amount is None:
+                continue
+
+            if gross is None and GROSS_LABEL_RE.match(line):
+                gross = amount
+            elif net is None and NET_LABEL_RE.match(line):
+                net = amount
+            elif tax is None and TAX_LABEL_RE.match(line):
+                tax = amount
+            elif plain is None and PLAIN_TOTAL_RE.match(line):
+                plain = amount
+
+        # A bare "Total" is the net sum when a gross line exists, the grand total otherwise
+        if gross is not None:
+            net = net if net is not None else plain
+            return net, tax, gross
+        return net, tax, plain
+
+    @staticmethod
+    def _items(tables: List) -> List[Dict]:
+        for table in tables:
+            rows = [row for row in (table if isinstance(table, list) else []) if isinstance(row, dict)]
+            columns = item_columns(rows)
+            if columns is None:
+                continue
+
+            items = items_from_rows(rows, columns)
+            if items:
+                return items
+
+        return []
+
+    @staticmethod
+    def _vendor(lines: List[str]) -> Dict:
+        for line in lines[:15]:
+            if not LEGAL_FORM_RE.search(line):
+                continue
+
+            # Sender line above the address window: "Name - Street - City"
+            parts = [p.strip() for p in re.split(r"\s+[-–|·•]\s+", line) if p.strip()]
+            return {
+                "name": parts[0],
+                "address": ", ".join(parts[1:]) or None,
+            }
+        return {"name": None, "address": None}
+
+    @staticmethod
+    def _customer(lines: List[str], vendor_name: Optional[str]) -> Optional[str]:
+        for i, line in enumerate(lines):
+            match = CUSTOMER_LABEL_RE.match(line)
+            if match:
+                rest = match.group(1).strip()
+                if rest and not any(c.isdigit() for c in rest):
+                    return rest
+                if i + 1 < len(lines):
+                    return lines[i + 1]
+
+        # Otherwise the first company line of the recipient block under the sender line
+        seen_vendor = False
+        for line in lines[:15]:
+            if vendor_name and vendor_name in line:
+                seen_vendor = True
+                continue
+            if seen_vendor and LEGAL_FORM_RE.search(line):
+                return line
+        return None
+
+    @staticmethod
+    def _currency(text: str) -> Optional[str]:
+        counts = {}
+        for symbol, code in CURRENCY_SYMBOLS.items():
+            counts[code] = counts.get(code, 0) + text.count(symbol)
+        for code in CURRENCY_CODE_RE.findall(text):
+            counts[code] = counts.get(code, 0) + 1
+
+        best = max(counts, key=counts.get) if counts else None
+        return best if best and counts[best] else None
+
+    # ============================================
+    # CONFIDENCE
+    # ============================================
+
+    @staticmethod
+    def _checks(data: Dict) -> Dict[str, bool]:
+        subtotal, tax, total = data["subtotal"], data["tax_amount"], data["total"]
+        items = data["items"]
+
+        amounts_consistent = (
+            subtotal is not None and tax is not None and total is not None
+            and abs(subtotal + tax - total) <= 0.011
+        )
+
+        target = subtotal if subtotal is not None else total
+        items_consistent = bool(items) and target is not None and abs(
+            sum(item["total"] for item in items) - target
+        ) <= 0.011 * max(1, len(items))
+
+        return {
+            "invoice_number": bool(data["invoice_number"]),
+            "invoice_date": bool(data["invoice_date"]),
+            "total": total is not None,
+            "amounts_consistent": amounts_consistent,
+            "items": items_consistent,
+            "vendor": bool(data["vendor"]["name"]),
+            "currency": bool(data["currency"]),
+        }
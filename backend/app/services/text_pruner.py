@@ -0,0 +1,185 @@
+import re
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.services.gemini_client import estimate_tokens
+from app.services.rule_extractor import INVOICE_NUMBER_RE, LEGAL_FORM_RE, find_amounts, find_dates
+from app.utils.config import settings
+
+# A line containing any of these is boilerplate (payment terms, bank details,
+# legal footer, contact lines); matched case-insensitively on word boundaries
+DEFAULT_PHRASES = (
+    "terms of payment", "payment terms", "zahlungsbedingungen", "zahlbar",
+    "bank charges", "bank fees", "please credit", "please transfer", "bitte überweisen",
+    "bank details", "bankverbindung", "iban", "bic", "swift",
+    "generated automatically", "will not be signed", "without signature", "ohne unterschrift",
+    "registered office", "managing director", "geschäftsführer", "geschäftsführung", "sitz der gesellschaft",
+    "amtsgericht", "handelsregister", "registergericht", "court of registration", "hrb",
+    "thank you for your", "vielen dank", "privacy policy", "datenschutz",
+    "www", "http", "https", "e-mail", "email", "phone", "telefon", "tel", "fax",
+)
+
+# A line containing one of these starts a block (T&C section) that runs until
+# the next line carrying invoice data, or the end of the page
+DEFAULT_BLOCK_PHRASES = (
+    "terms and conditions", "terms & conditions", "general terms", "conditions of sale",
+    "allgemeine geschäftsbedingungen", "agb",
+)
+
+PAGE_NUMBER_RE = re.compile(
+    r"^(?:page|seite|pg\.?)?\s*\d{1,4}\s*(?:/|of|von|-)\s*\d{1,4}$|^(?:page|seite)\s*\d{1,4}$",
+    re.IGNORECASE
+)
+
+
+def _phrase_index(phrases: Iterable[str]) -> Optional[re.Pattern]:
+    phrases = sorted({p.strip().lower() for p in phrases if p.strip()}, key=len, reverse=True)
+    if not phrases:
+        return None
+    return re.compile(r"(?<!\w)(?:" + "|".join(re.escape(p) for p in phrases) + r")(?!\w)", re.IGNORECASE)
+
+
+def load_phrases(path: str) -> Tuple[List[str], List[str]]:
+    """
+    Phrase file: one phrase per line, "#" comments; a "block:" prefix marks
+    a phrase that starts a boilerplate block. Returns (phrases, block phrases).
+    """
+    phrases, blocks = [], []
+    for line in Path(path).read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.lower().startswith("block:"):
+            blocks.append(line[6:].strip())
+        else:
+            phrases.append(line)
+    return phrases, blocks
+
+
+class TextPruner:
+    """
+    Boilerplate Pruner
+    ==================
+    Drops text that never holds invoice fields before it goes into the
+    LLM prompt:
+    - lines repeated on several pages (page headers / footers), first
+      occurrence kept
+    - page number lines ("Page 2 of 3")
+    - lines matching the phrase index (payment terms, bank details, legal
+      footer, contact lines)
+    - blocks starting at a T&C heading, up to the next data line
+
+    Lines with a money amount, a date or an invoice number label, and the
+    first line naming a company (legal form), are never dropped.
+
+    Phrases: DEFAULT_PHRASES / DEFAULT_BLOCK_PHRASES plus PRUNE_PHRASES_FILE.
+    The full text stays available to rules, templates and the repair pass;
+    only the prompt copy is pruned.
+    """
+
+    def __init__(
+        self,
+        phrases: Optional[Iterable[str]] = None,
+        block_phrases: Optional[Iterable[str]] = None,
+        phrases_file: Optional[str] = None
+    ):
+        phrases = list(DEFAULT_PHRASES if phrases is None else phrases)
+        block_phrases = list(DEFAULT_BLOCK_PHRASES if block_phrases is None else block_phrases)
+
+        phrases_file = settings.PRUNE_PHRASES_FILE if phrases_file is None else phrases_file
+        if phrases_file:
+            extra, extra_blocks = load_phrases(phrases_file)
+            phrases += extra
+            block_phrases += extra_blocks
+
+        self._phrases = _phrase_index(phrases)
+        self._blocks = _phrase_index(block_phrases)
+        self.stats = {"documents": 0, "tokens_saved": 0}
+
+    @staticmethod
+    def _key(line: str) -> str:
+        return " ".join(line.lower().split())
+
+    @staticmethod
+    def _carries_data(line: str) -> bool:
+        return bool(find_amounts(line) or find_dates(line) or INVOICE_NUMBER_RE.search(line))
+
+    # ============================================
+    # PRUNE
+    # ============================================
+
+    def prune_pages(self, pages: List[str]) -> Tuple[List[str], Dict[str, int]]:
+        """Pruned text of each page, plus dropped line counts by reason."""
+        dropped = {"duplicates": 0, "page_numbers": 0, "phrases": 0, "blocks": 0}
+
+        # On how many pages each line appears
+        pages_with = {}
+        for page in pages:
+            for key in {self._key(line) for line in page.splitlines()}:
+                pages_with[key] = pages_with.get(key, 0) + 1
+
+        seen, companies = set(), set()
+        pruned = []
+        for page in pages:
+            kept, in_block = [], False
+            for line in page.splitlines():
+                key = self._key(line)
+                if not key:
+                    continue
+
+                if self._carries_data(line):
+                    in_block = False
+                    kept.append(line)
+                elif LEGAL_FORM_RE.search(line) and key not in companies:
+                    companies.add(key)
+                    kept.append(line)
+                elif PAGE_NUMBER_RE.match(key):
+                    dropped["page_numbers"] += 1
+                elif in_block or (self._blocks and self._blocks.search(line)):
+                    in_block = True
+                    dropped["blocks"] += 1
+                elif self._phrases and self._phrases.search(line):
+                    dropped["phrases"] += 1
+                elif key in seen and pages_with[key] > 1:
+                    dropped["duplicates"] += 1
+                else:
+                    kept.append(line)
+                seen.add(key)
+
+            pruned.append("\n".join(kept))
+        return pruned, dropped
+
+    def prune(self, parsed: Dict) -> Dict:
+        """
+        Copy of a PDFProcessor.process result with pruned "text" and
+        matching "page_offsets", plus a "pruning" report:
+        {"tokens_before", "tokens_after", "tokens_saved", "lines_dropped": {reason: n}}.
+        """
+        text = parsed.get("text") or ""
+        offsets = parsed.get("page_offsets") or [{"page": 1, "start": 0, "end": len(text)}]
+
+        pages, dropped = self.prune_pages([text[span["start"]:span["end"]] for span in offsets])
+
+        new_offsets, cursor = [], 0
+        for span, page_text in zip(offsets, pages):
+            if new_offsets:
+                cursor += 1  # "\n" separator
+            new_offsets.append({"page": span["page"], "start": cursor, "end": cursor + len(page_text)})
+            cursor += len(page_text)
+        pruned_text = "\n".join(pages)
+
+        before, after = estimate_tokens(text), estimate_tokens(pruned_text)
+        self.stats["documents"] += 1
+        self.stats["tokens_saved"] += before - after
+
+        return {
+            **parsed,
+            "text": pruned_text,
+            "page_offsets": new_offsets if parsed.get("page_offsets") else [],
+            "pruning": {
+                "tokens_before": before,
+                "tokens_after": after,
+                "tokens_saved": before - after,
+                "lines_dropped": dropped,
+            },
+        }
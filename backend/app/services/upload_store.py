@@ -0,0 +1,126 @@
+import hashlib
+import os
+import uuid
+from typing import BinaryIO, Optional
+
+from app.utils.config import settings
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class UploadTooLarge(Exception):
+    """Upload exceeded MAX_FILE_SIZE_MB (HTTP 413)."""
+
+
+class StoredUpload:
+    def __init__(self, path: Optional[str], digest: str, size: int, data: Optional[bytes] = None):
+        self.path = path
+        self.digest = digest
+        self.size = size
+        self.data = data
+
+    @property
+    def source(self):
+        """What the parser should open: the bytes (diskless) or the path."""
+        return self.data if self.data is not None else self.path
+
+
+class UploadStore:
+    """
+    Upload Storage
+    ==============
+    Streams uploads to disk in chunks, hashing while writing.
+
+    - rejects an upload as soon as it passes MAX_FILE_SIZE_MB
+    - stores files under their SHA-256 (<digest>.pdf), so concurrent
+      uploads never overwrite each other with different content
+    """
+
+    def __init__(self, upload_dir: str, max_file_size_mb: Optional[int] = None):
+        self.upload_dir = upload_dir
+        self.max_bytes = (max_file_size_mb or settings.MAX_FILE_SIZE_MB) * 1024 * 1024
+        os.makedirs(upload_dir, exist_ok=True)
+
+    def _part_path(self) -> str:
+        return os.path.join(self.upload_dir, f".{uuid.uuid4().hex}.part")
+
+    def _finalize(self, part_path: str, hasher, size: int, suffix: str) -> StoredUpload:
+        digest = hasher.hexdigest()
+        final_path = os.path.join(self.upload_dir, f"{digest}{suffix}")
+        # Same name => same bytes, so an atomic replace is always safe
+        os.replace(part_path, final_path)
+        return StoredUpload(final_path, digest, size)
+
+    def _too_large(self, part_path: Optional[str] = None):
+        if part_path:
+            os.remove(part_path)
+        raise UploadTooLarge(
+            f"File exceeds {self.max_bytes // (1024 * 1024)} MB limit"
+        )
+
+    def save(self, source: BinaryIO, suffix: str = ".pdf") -> StoredUpload:
+        """Save a synchronous binary stream (e.g. a zip entry)."""
+        part_path = self._part_path()
+        hasher = hashlib.sha256()
+        size = 0
+
+        with open(part_path, "wb") as out:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_bytes:
+                    out.close()
+                    self._too_large(part_path)
+                hasher.update(chunk)
+                out.write(chunk)
+
+        return self._finalize(part_path, hasher, size, suffix)
+
+    async def save_upload(self, upload, suffix: str = ".pdf") -> StoredUpload:
+        """Save a FastAPI UploadFile without blocking on a full read."""
+        declared = getattr(upload, "size", None)
+        if declared is not None and declared > self.max_bytes:
+            self._too_large()
+
+        part_path = self._part_path()
+        hasher = hashlib.sha256()
+        size = 0
+
+        with open(part_path, "wb") as out:
+            while True:
+                chunk = await upload.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_bytes:
+                    out.close()
+                    self._too_large(part_path)
+                hasher.update(chunk)
+                out.write(chunk)
+
+        return self._finalize(part_path, hasher, size, suffix)
+
+    async def read_upload(self, upload) -> StoredUpload:
+        """
+        Diskless variant of save_upload: same chunked, size-bounded,
+        hash-while-reading pass, but the bytes stay in memory.
+        """
+        declared = getattr(upload, "size", None)
+        if declared is not None and declared > self.max_bytes:
+            self._too_large()
+
+        hasher = hashlib.sha256()
+        buffer = bytearray()
+
+        while True:
+            chunk = await upload.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if len(buffer) + len(chunk) > self.max_bytes:
+                self._too_large()
+            hasher.update(chunk)
+            buffer.extend(chunk)
+
+        return StoredUpload(None, hasher.hexdigest(), len(buffer), bytes(buffer))
@@ -31,6 +31,12 @@ class Settings:
     MONGODB_DB_NAME: str = os.getenv("MONGODB_DB_NAME")
 
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "models/gemini-2.5-flash")
+    GEMINI_API_BASE: str = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com")
+
+    # "gemini" (SDK + async REST client) or "http" (Gemini REST at GEMINI_API_BASE, no key needed)
+    LLM_PROVIDER: str = os.getenv("LLM_PROVIDER", "gemini")
+    LLM_JSON_MODE: bool = os.getenv("LLM_JSON_MODE", "True").lower() in ("true", "1", "yes")
 
     MAX_FILE_SIZE_MB: int = int(os.getenv("MAX_FILE_SIZE_MB", "10"))
     ALLOWED_EXTENSIONS: List[str] = [
@@ -57,6 +63,13 @@ class Settings:
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE: Path = BASE_DIR / os.getenv("LOG_FILE", "logs/app.log")
 
+    # Header row + delimited value rows instead of indented JSON in the prompt
+    COMPACT_TABLES: bool = os.getenv("COMPACT_TABLES", "True").lower() in ("true", "1", "yes")
+    # Short keys + positional item arrays in the LLM answer, expanded to the full JSON shape locally
+    COMPACT_OUTPUT: bool = os.getenv("COMPACT_OUTPUT", "False").lower() in ("true", "1", "yes")
+    # Cut camelot table regions out of the prompt TEXT; the TABLES section already carries them
+    EXCLUDE_TABLE_TEXT: bool = os.getenv("EXCLUDE_TABLE_TEXT", "True").lower() in ("true", "1", "yes")
+
     AI_CONFIDENCE_THRESHOLD: float = float(os.getenv("AI_CONFIDENCE_THRESHOLD", 0.7))
     MAX_TOKENS: int = int(os.getenv("MAX_TOKENS", 1000))
     TEMPERATURE: float = float(os.getenv("TEMPERATURE", 0.1))
@@ -65,6 +78,98 @@ class Settings:
     IMAGE_QUALITY: int = int(os.getenv("IMAGE_QUALITY", 95))
     PDF_DPI: int = int(os.getenv("PDF_DPI", 300))
 
+    # Parallel text extraction for long PDFs (TEXT_WORKERS <= 1 disables it).
+    # In the server it only applies with PARSE_WORKERS=0: parse processes never shard
+    TEXT_WORKERS: int = int(os.getenv("TEXT_WORKERS", min(4, os.cpu_count() or 1)))
+    PARALLEL_TEXT_MIN_PAGES: int = int(os.getenv("PARALLEL_TEXT_MIN_PAGES", 50))
+
+    # Skip camelot on pages without a ruling grid (see PDFProcessor.plan_table_pages)
+    TABLE_PREPASS_ENABLED: bool = os.getenv("TABLE_PREPASS_ENABLED", "True").lower() in ("true", "1", "yes")
+    TABLE_MIN_RULINGS: int = int(os.getenv("TABLE_MIN_RULINGS", 2))
+
+    # Diskless mode: /extract-invoice parses uploads from memory, never writes them to UPLOAD_FOLDER
+    IN_MEMORY_PROCESSING: bool = os.getenv("IN_MEMORY_PROCESSING", "False").lower() in ("true", "1", "yes")
+    IN_MEMORY_TMPFS_DIR: str = os.getenv("IN_MEMORY_TMPFS_DIR", "/dev/shm")
+
+    # Bump when parsing/prompting changes so old cached results are ignored
+    PIPELINE_VERSION: str = os.getenv("PIPELINE_VERSION", "8")
+
+    RESULT_CACHE_ENABLED: bool = os.getenv("RESULT_CACHE_ENABLED", "True").lower() in ("true", "1", "yes")
+    RESULT_CACHE_MEMORY_MB: int = int(os.getenv("RESULT_CACHE_MEMORY_MB", 32))
+    RESULT_CACHE_DISK_MB: int = int(os.getenv("RESULT_CACHE_DISK_MB", 512))
+    RESULT_CACHE_DB: Path = BASE_DIR / os.getenv("RESULT_CACHE_DB", "cache/results.sqlite3")
+
+    # 0 parse workers = parse on LLM_CONCURRENCY threads instead of a process pool
+    PARSE_WORKERS: int = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 2))
+    LLM_CONCURRENCY: int = int(os.getenv("LLM_CONCURRENCY", 8))
+
+    # Async LLM path: shared HTTP client, LLM_CONCURRENCY in flight, RPM/TPM token buckets (0 = off)
+    LLM_ASYNC: bool = os.getenv("LLM_ASYNC", "True").lower() in ("true", "1", "yes")
+    LLM_RPM: int = int(os.getenv("LLM_RPM", 1000))
+    LLM_TPM: int = int(os.getenv("LLM_TPM", 1000000))
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", 120))
+
+    # Retries on 429/5xx/timeouts only, full-jitter exponential backoff
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", 3))
+    LLM_BACKOFF_BASE_SECONDS: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 0.5))
+    LLM_BACKOFF_MAX_SECONDS: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 20))
+
+    # Hedging: duplicate a request still running after the observed quantile latency
+    LLM_HEDGING: bool = os.getenv("LLM_HEDGING", "False").lower() in ("true", "1", "yes")
+    LLM_HEDGE_QUANTILE: float = float(os.getenv("LLM_HEDGE_QUANTILE", 0.95))
+    LLM_HEDGE_MIN_SAMPLES: int = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", 20))
+
+    # USD per million tokens, for the per-call cost in _metadata["llm"] and /metrics
+    LLM_PRICE_INPUT_PER_MTOK: float = float(os.getenv("LLM_PRICE_INPUT_PER_MTOK", 0.30))
+    LLM_PRICE_OUTPUT_PER_MTOK: float = float(os.getenv("LLM_PRICE_OUTPUT_PER_MTOK", 2.50))
+    # Prompt tokens the provider served from its implicit prefix cache
+    # (cachedContentTokenCount). The static prefix (~170 tokens) is under
+    # Gemini's 1024-token caching minimum, so today this only applies to
+    # prompts whose document part repeats as well.
+    LLM_PRICE_CACHED_INPUT_PER_MTOK: float = float(os.getenv("LLM_PRICE_CACHED_INPUT_PER_MTOK", 0.03))
+
+    MAX_PENDING_EXTRACTIONS: int = int(os.getenv("MAX_PENDING_EXTRACTIONS", 32))
+    OVERLOAD_RETRY_AFTER_SECONDS: int = int(os.getenv("OVERLOAD_RETRY_AFTER_SECONDS", 5))
+
+    BULK_CONCURRENCY: int = int(os.getenv("BULK_CONCURRENCY", 4))
+
+    # Deterministic rule extractor first; Gemini only when its confidence is below the threshold
+    RULE_FASTPATH_ENABLED: bool = os.getenv("RULE_FASTPATH_ENABLED", "True").lower() in ("true", "1", "yes")
+    RULE_MIN_CONFIDENCE: float = float(os.getenv("RULE_MIN_CONFIDENCE", 0.9))
+
+    # Per-vendor layout templates learned from /save-invoice, replayed before rules/LLM
+    TEMPLATES_ENABLED: bool = os.getenv("TEMPLATES_ENABLED", "True").lower() in ("true", "1", "yes")
+    TEMPLATE_DB: Path = BASE_DIR / os.getenv("TEMPLATE_DB", "data/templates.sqlite3")
+    TEMPLATE_MAX_COUNT: int = int(os.getenv("TEMPLATE_MAX_COUNT", 500))
+    TEMPLATE_TTL_DAYS: float = float(os.getenv("TEMPLATE_TTL_DAYS", 90))
+    TEMPLATE_MAX_FAILURES: int = int(os.getenv("TEMPLATE_MAX_FAILURES", 3))
+    TEMPLATE_RECENT_DOCUMENTS: int = int(os.getenv("TEMPLATE_RECENT_DOCUMENTS", 256))
+
+    # Long invoices: split on page boundaries and extract the chunks concurrently
+    CHUNKED_EXTRACTION: bool = os.getenv("CHUNKED_EXTRACTION", "True").lower() in ("true", "1", "yes")
+    CHUNK_MIN_PAGES: int = int(os.getenv("CHUNK_MIN_PAGES", 40))
+    CHUNK_PAGES: int = int(os.getenv("CHUNK_PAGES", 10))
+    CHUNK_MAX_TOKENS: int = int(os.getenv("CHUNK_MAX_TOKENS", 12000))
+
+    # Drop repeated page headers/footers and boilerplate lines from the prompt text
+    PRUNE_ENABLED: bool = os.getenv("PRUNE_ENABLED", "True").lower() in ("true", "1", "yes")
+    # Extra phrases, one per line ("block: ..." starts a block); see TextPruner
+    PRUNE_PHRASES_FILE: str = os.getenv("PRUNE_PHRASES_FILE", "")
+
+    # Follow-up call for just the missing / inconsistent fields of an LLM answer
+    REPAIR_ENABLED: bool = os.getenv("REPAIR_ENABLED", "True").lower() in ("true", "1", "yes")
+    REPAIR_MAX_CHARS: int = int(os.getenv("REPAIR_MAX_CHARS", 6000))
+
+    # Pack several waiting invoices into one Gemini request (useful for backfills)
+    LLM_BATCHING: bool = os.getenv("LLM_BATCHING", "False").lower() in ("true", "1", "yes")
+    LLM_BATCH_MAX_TOKENS: int = int(os.getenv("LLM_BATCH_MAX_TOKENS", 24000))
+    LLM_BATCH_MAX_ITEMS: int = int(os.getenv("LLM_BATCH_MAX_ITEMS", 8))
+    LLM_BATCH_MAX_WAIT_MS: int = int(os.getenv("LLM_BATCH_MAX_WAIT_MS", 250))
+
+    JOB_WORKERS: int = int(os.getenv("JOB_WORKERS", 2))
+    JOB_DB: Path = BASE_DIR / os.getenv("JOB_DB", "data/jobs.sqlite3")
+    JOB_POLL_INTERVAL_SECONDS: float = float(os.getenv("JOB_POLL_INTERVAL_SECONDS", 1.0))
+
     @classmethod
     def get_temp_folder(cls) -> Path:
         temp = cls.BASE_DIR / "temp"
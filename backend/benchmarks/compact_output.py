@@ -0,0 +1,128 @@
+"""
+Benchmark: full vs. compact (COMPACT_OUTPUT) LLM answer on long invoices
+========================================================================
+Builds an invoice with --items line items, has the Gemini stand-in
+answer it in both formats (it charges --decode-ms-per-token for every
+output token), and reports output tokens, latency and cost per format.
+The expanded compact answers (plain and streamed) must equal the full
+ones, or the run exits non-zero.
+
+Run from backend/:
+    python -m benchmarks.compact_output
+    python -m benchmarks.compact_output --items 500 --decode-ms-per-token 8
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+
+
+def long_invoice(items: int):
+    rows = [
+        {
+            "description": f"Transaction fee segment {i % 12 + 1}, account user-{i:04d}",
+            "quantity": i % 40 + 1,
+            "unit_price": round(0.5 + (i % 7) * 0.25, 2),
+            "total": round((i % 40 + 1) * (0.5 + (i % 7) * 0.25), 2),
+        }
+        for i in range(items)
+    ]
+    subtotal = round(sum(row["total"] for row in rows), 2)
+    tax = round(subtotal * 0.19, 2)
+    invoice = {
+        "invoice_number": "123100401",
+        "invoice_date": "2024-03-01",
+        "vendor": {"name": "CPB Software (Germany) GmbH", "address": "Im Bruch 3, 63897 Miltenberg/Main"},
+        "customer": {"name": "Musterkunde AG"},
+        "items": rows,
+        "subtotal": subtotal,
+        "tax_amount": tax,
+        "total": round(subtotal + tax, 2),
+        "currency": "EUR",
+    }
+    text = (f"CPB Software (Germany) GmbH\nInvoice No 123100401\nDate 1. März 2024\n"
+            f"Total net {subtotal}\nVAT 19% {tax}\nTotal {invoice['total']}")
+    return invoice, text, [rows]
+
+
+def _strip(data):
+    return {key: value for key, value in data.items() if key != "_metadata"}
+
+
+async def run_calls(extractor, text, tables, calls: int):
+    results = [await extractor.extract_async(text, tables) for _ in range(calls)]
+    return results, [result["_metadata"]["llm"] for result in results]
+
+
+def summary(label: str, records) -> str:
+    output = statistics.mean(r["output_tokens"] for r in records)
+    seconds = statistics.mean(r["seconds"] for r in records)
+    cost = sum(r["cost_usd"] for r in records)
+    return f"{label:<8} output_tokens={output:>7.0f} avg={seconds:.3f}s cost=${cost:.6f}"
+
+
+async def run(args):
+    # Imported here: Settings reads the environment prepared in main()
+    from app.services.ai_extractor import AIExtractor
+    from benchmarks import gemini_stub
+
+    invoice, text, tables = long_invoice(args.items)
+    gemini_stub.config.fixture = invoice
+
+    full = AIExtractor(compact_output=False)
+    short = AIExtractor(compact_output=True)
+    full_results, full_records = await run_calls(full, text, tables, args.calls)
+    short_results, short_records = await run_calls(short, text, tables, args.calls)
+
+    streamed, items = None, 0
+    async for event in short.extract_stream(text, tables):
+        if event["type"] == "item":
+            items += 1
+        elif event["type"] == "result":
+            streamed = event["value"]
+
+    await full.aclose()
+    await short.aclose()
+
+    print(f"{args.items} line items, {args.calls} calls per format")
+    print(summary("full", full_records))
+    print(summary("compact", short_records))
+
+    saved = 1 - statistics.mean(r["output_tokens"] for r in short_records) / statistics.mean(
+        r["output_tokens"] for r in full_records)
+    faster = 1 - statistics.mean(r["seconds"] for r in short_records) / statistics.mean(
+        r["seconds"] for r in full_records)
+    print(f"compact: -{100 * saved:.0f}% output tokens, -{100 * faster:.0f}% latency")
+
+    expected = _strip(full_results[0])
+    same = all(_strip(result) == expected for result in short_results) and _strip(streamed) == expected
+    print(f"expanded answers match the full format: {same} (streamed items: {items})")
+    return same and items == args.items
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=200)
+    parser.add_argument("--calls", type=int, default=3)
+    parser.add_argument("--port", type=int, default=8013)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--decode-ms-per-token", type=float, default=4)
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = "http"
+    os.environ["GEMINI_API_BASE"] = f"http://127.0.0.1:{args.port}"
+
+    from benchmarks import gemini_stub
+
+    gemini_stub.config.latency_ms = args.latency_ms
+    gemini_stub.config.jitter_ms = 0
+    gemini_stub.config.decode_ms_per_token = args.decode_ms_per_token
+    gemini_stub.serve_in_background(port=args.port)
+
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,377 @@
+"""
+Local Gemini stand-in server
+============================
+Speaks enough of the Gemini REST API (generateContent) for the app to
+run against it with no network: fixed latency plus jitter, simulated 429s
+(random and/or over an RPM quota), 5xx errors, hung requests, malformed
+JSON output, and response fixtures; streamGenerateContent (alt=sse)
+spreads the latency over --stream-chunks pieces.
+
+Implicit prefix caching: the longest start a prompt shares with one of
+the recent prompts is served from cache once it reaches --cache-min-tokens
+(Gemini: 1024); it is reported as cachedContentTokenCount and skips its
+prefill time (--prefill-ms-per-1k per 1000 uncached prompt tokens).
+Output is charged --decode-ms-per-token; a prompt asking for the compact
+format (COMPACT_OUTPUT) is answered in it.
+
+Batches (ExtractionBatcher): a prompt with "=== INVOICE <id> ===" sections
+is answered with one object keyed by those ids, each value picked for its
+own section; --batch-drop leaves that many ids out at the end, like a
+model that stops early.
+
+Run from backend/:
+    python -m benchmarks.gemini_stub --port 8001 --latency-ms 400 --rpm 60 --error-429 0.1
+
+then point the app at it:
+    LLM_PROVIDER=http GEMINI_API_BASE=http://127.0.0.1:8001
+
+Fixtures: --fixture FILE always answers with that JSON; --fixtures DIR
+answers with the *.json whose invoice_number appears in the prompt
+(round-robin when none does). Settings can be changed at runtime with
+POST /config, e.g. {"error_5xx": 0.2}; GET /stats, POST /stats/reset.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.services.compact_output import COMPACT_JSON_FORMAT, compact
+
+DEFAULT_INVOICE = {
+    "invoice_number": "123100401",
+    "invoice_date": "2024-03-01",
+    "vendor": {"name": "CPB Software (Germany) GmbH", "address": "Im Bruch 3, 63897 Miltenberg/Main"},
+    "customer": {"name": "Musterkunde AG"},
+    "items": [
+        {"description": "Basic Fee wmView", "quantity": 1, "unit_price": 130.0, "total": 130.0},
+        {"description": "Transaction Fee T1", "quantity": 14, "unit_price": 0.58, "total": 8.12},
+        {"description": "Transaction Fee T3", "quantity": 162, "unit_price": 1.5, "total": 243.0},
+    ],
+    "subtotal": 381.12,
+    "tax_amount": 72.41,
+    "total": 453.53,
+    "currency": "EUR",
+}
+
+
+class StubConfig:
+    latency_ms: float = 300
+    jitter_ms: float = 100
+    error_429: float = 0.0
+    error_5xx: float = 0.0
+    rpm: int = 0
+    hang: float = 0.0
+    hang_seconds: float = 300
+    malformed: float = 0.0
+    stream_chunks: int = 8
+    prefill_ms_per_1k: float = 0.0
+    decode_ms_per_token: float = 0.0
+    cache_min_tokens: int = 1024
+    batch_drop: int = 0
+    fixture: dict = DEFAULT_INVOICE
+    fixtures: list = []
+
+
+config = StubConfig()
+stats = {
+    "requests": 0, "ok": 0, "429": 0, "5xx": 0, "hung": 0, "malformed": 0, "cache_hits": 0, "cached_tokens": 0,
+    "batched_invoices": 0,
+    # Most generateContent requests being worked on at once (client concurrency cap)
+    "max_in_flight": 0,
+}
+_in_flight = 0
+# Prompts the implicit prefix cache can match against
+_seen_prompts = deque(maxlen=64)
+_recent = deque()
+_round_robin = itertools.count()
+
+BATCH_SECTION = re.compile(r"^=== INVOICE (\S+) ===$", re.MULTILINE)
+
+app = FastAPI(title="Gemini stub")
+
+
+def _quota_wait() -> float:
+    """Seconds until the RPM quota has room again (0 = request admitted)."""
+    if config.rpm <= 0:
+        return 0.0
+
+    now = time.monotonic()
+    while _recent and now - _recent[0] > 60:
+        _recent.popleft()
+    if len(_recent) >= config.rpm:
+        return 60 - (now - _recent[0])
+
+    _recent.append(now)
+    return 0.0
+
+
+def _pick_fixture(prompt: str) -> dict:
+    if not config.fixtures:
+        return config.fixture
+
+    for fixture in config.fixtures:
+        number = fixture.get("invoice_number")
+        if number and str(number) in prompt:
+            return fixture
+    return config.fixtures[next(_round_robin) % len(config.fixtures)]
+
+
+def load_fixtures(directory: str) -> list:
+    return [json.loads(path.read_text()) for path in sorted(Path(directory).glob("*.json"))]
+
+
+def _prompt_text(body: dict) -> str:
+    return "".join(
+        part.get("text", "")
+        for content in body.get("contents", [])
+        for part in content.get("parts", [])
+    )
+
+
+def _rejection():
+    """Simulated 429 (answered immediately), or None."""
+    wait = _quota_wait()
+    if wait or random.random() < config.error_429:
+        stats["429"] += 1
+        return JSONResponse(
+            {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+            status_code=429,
+            headers={"Retry-After": str(max(1, round(wait)))}
+        )
+    return None
+
+
+async def _fault():
+    """Simulated hang / 5xx once the request was accepted, or None."""
+    if random.random() < config.hang:
+        # Client timeout path: hold the request far past any sane deadline
+        stats["hung"] += 1
+        await asyncio.sleep(config.hang_seconds)
+
+    if random.random() < config.error_5xx:
+        stats["5xx"] += 1
+        return JSONResponse({"error": {"code": 503, "status": "UNAVAILABLE"}}, status_code=503)
+
+    return None
+
+
+def _latency(uncached_tokens: int = 0, output_tokens: int = 0) -> float:
+    prefill = config.prefill_ms_per_1k * uncached_tokens / 1000
+    decode = config.decode_ms_per_token * output_tokens
+    return max(0.0, config.latency_ms + prefill + decode + random.uniform(-1, 1) * config.jitter_ms) / 1000
+
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _cached_tokens(prompt: str) -> int:
+    """Tokens of the prompt's start the implicit prefix cache serves (0 = none)."""
+    shared = max((len(os.path.commonprefix([prompt, seen])) for seen in _seen_prompts), default=0)
+    _seen_prompts.append(prompt)
+
+    tokens = shared // 4
+    if not tokens or tokens < config.cache_min_tokens:
+        return 0
+    stats["cache_hits"] += 1
+    stats["cached_tokens"] += tokens
+    return tokens
+
+
+def _batch_answer(prompt: str, markers: list) -> dict:
+    """invoice id -> fixture for that invoice's own section of the prompt."""
+    answer = {}
+    for i, marker in enumerate(markers[:max(0, len(markers) - config.batch_drop)]):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(prompt)
+        answer[marker.group(1)] = _pick_fixture(prompt[marker.end():end])
+    stats["batched_invoices"] += len(answer)
+    return answer
+
+
+def _answer(prompt: str) -> str:
+    markers = list(BATCH_SECTION.finditer(prompt))
+    shape = compact if COMPACT_JSON_FORMAT in prompt else (lambda fixture: fixture)
+    if markers:
+        text = json.dumps({key: shape(value) for key, value in _batch_answer(prompt, markers).items()})
+    else:
+        text = json.dumps(shape(_pick_fixture(prompt)))
+    if random.random() < config.malformed:
+        stats["malformed"] += 1
+        text = text[: len(text) // 2]
+    return text
+
+
+def _usage(prompt: str, text: str, cached_tokens: int = 0) -> dict:
+    prompt_tokens = _tokens(prompt)
+    output_tokens = _tokens(text)
+    usage = {
+        "promptTokenCount": prompt_tokens,
+        "candidatesTokenCount": output_tokens,
+        "totalTokenCount": prompt_tokens + output_tokens,
+    }
+    if cached_tokens:
+        usage["cachedContentTokenCount"] = cached_tokens
+    return usage
+
+
+@app.post("/v1beta/models/{model}:generateContent")
+async def generate_content(model: str, request: Request):
+    body = await request.json()
+    stats["requests"] += 1
+
+    failure = _rejection()
+    if failure is not None:
+        return failure
+
+    prompt = _prompt_text(body)
+    cached_tokens = _cached_tokens(prompt)
+    # Picked up front: its length sets the decode time
+    text = _answer(prompt)
+
+    global _in_flight
+    _in_flight += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], _in_flight)
+    try:
+        await asyncio.sleep(_latency(_tokens(prompt) - cached_tokens, _tokens(text)))
+        failure = await _fault()
+    finally:
+        _in_flight -= 1
+    if failure is not None:
+        return failure
+
+    stats["ok"] += 1
+    return {
+        "candidates": [{"content": {"role": "model", "parts": [{"text": text}]}, "finishReason": "STOP"}],
+        "usageMetadata": _usage(prompt, text, cached_tokens),
+        "modelVersion": model,
+    }
+
+
+@app.post("/v1beta/models/{model}:streamGenerateContent")
+async def stream_generate_content(model: str, request: Request):
+    """SSE (alt=sse): the latency is spread over `stream_chunks` pieces of the answer."""
+    body = await request.json()
+    stats["requests"] += 1
+
+    failure = _rejection() or await _fault()
+    if failure is not None:
+        return failure
+
+    prompt = _prompt_text(body)
+    cached_tokens = _cached_tokens(prompt)
+    text = _answer(prompt)
+    pieces = max(1, config.stream_chunks)
+    size = -(-len(text) // pieces)
+    delay = _latency(_tokens(prompt) - cached_tokens, _tokens(text)) / pieces
+
+    async def events():
+        for start in range(0, len(text), size):
+            await asyncio.sleep(delay)
+            chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": text[start:start + size]}]}}]}
+            yield f"data: {json.dumps(chunk)}\r\n\r\n"
+
+        final = {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": ""}]}, "finishReason": "STOP"}],
+            "usageMetadata": _usage(prompt, text, cached_tokens),
+            "modelVersion": model,
+        }
+        yield f"data: {json.dumps(final)}\r\n\r\n"
+        stats["ok"] += 1
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@app.get("/stats")
+def get_stats():
+    return stats
+
+
+@app.post("/stats/reset")
+def reset_stats():
+    for key in stats:
+        stats[key] = 0
+    _recent.clear()
+    _seen_prompts.clear()
+    return stats
+
+
+@app.post("/config")
+async def update_config(request: Request):
+    changes = await request.json()
+    unknown = [key for key in changes if not hasattr(StubConfig, key)]
+    if unknown:
+        return JSONResponse({"error": f"unknown settings: {unknown}"}, status_code=400)
+
+    for key, value in changes.items():
+        setattr(config, key, value)
+    return {key: getattr(config, key) for key in changes}
+
+
+def serve_in_background(host: str = "127.0.0.1", port: int = 8001):
+    """Start the stub on a daemon thread (for benchmarks / CI in one process)."""
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=config.jitter_ms)
+    parser.add_argument("--error-429", type=float, default=0.0, help="probability of a random 429")
+    parser.add_argument("--error-5xx", type=float, default=0.0, help="probability of a 503")
+    parser.add_argument("--rpm", type=int, default=0, help="simulated quota; 429 above it (0 = none)")
+    parser.add_argument("--hang", type=float, default=0.0, help="probability a request never answers in time")
+    parser.add_argument("--malformed", type=float, default=0.0, help="probability of truncated (invalid) JSON output")
+    parser.add_argument("--stream-chunks", type=int, default=config.stream_chunks, help="pieces per streamed answer")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=0.0, help="extra latency per 1000 uncached prompt tokens")
+    parser.add_argument("--cache-min-tokens", type=int, default=config.cache_min_tokens, help="smallest shared prompt start served from cache")
+    parser.add_argument("--batch-drop", type=int, default=0, help="ids left out of every batch answer")
+    parser.add_argument("--decode-ms-per-token", type=float, default=0.0, help="extra latency per output token")
+    parser.add_argument("--fixture", help="JSON file returned as the model output")
+    parser.add_argument("--fixtures", help="directory of *.json outputs, matched by invoice_number")
+    args = parser.parse_args()
+
+    config.latency_ms = args.latency_ms
+    config.jitter_ms = args.jitter_ms
+    config.error_429 = args.error_429
+    config.error_5xx = args.error_5xx
+    config.rpm = args.rpm
+    config.hang = args.hang
+    config.malformed = args.malformed
+    config.stream_chunks = args.stream_chunks
+    config.prefill_ms_per_1k = args.prefill_ms_per_1k
+    config.cache_min_tokens = args.cache_min_tokens
+    config.decode_ms_per_token = args.decode_ms_per_token
+    config.batch_drop = args.batch_drop
+    if args.fixture:
+        with open(args.fixture) as f:
+            config.fixture = json.load(f)
+    if args.fixtures:
+        config.fixtures = load_fixtures(args.fixtures)
+
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
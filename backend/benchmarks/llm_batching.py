@@ -0,0 +1,101 @@
+"""
+Benchmark: backfill throughput with and without ExtractionBatcher
+=================================================================
+Submits --invoices small invoices at once, first as one extract_async
+call each, then through ExtractionBatcher (LLM_BATCH_MAX_ITEMS per
+request), against the Gemini stand-in with a fixed round trip and
+--decode-ms-per-token per output token. Both runs share the same
+in-flight cap (--concurrency), like a backfill hitting LLM_CONCURRENCY.
+
+Reports wall time, invoices/s and provider requests per mode. Every
+caller must get back its own invoice (by invoice_number), or the run
+exits non-zero.
+
+Run from backend/:
+    python -m benchmarks.llm_batching
+    python -m benchmarks.llm_batching --invoices 200 --batch-items 16 --batch-drop 1
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+
+def invoices(count: int):
+    from benchmarks import gemini_stub
+
+    fixtures, texts = [], []
+    for i in range(count):
+        number = f"BF-{i:05d}"
+        fixtures.append({**gemini_stub.DEFAULT_INVOICE, "invoice_number": number, "total": float(i)})
+        texts.append(f"Invoice No {number}\nDate 1. März 2024\nTotal {i:.2f} EUR")
+    return fixtures, texts
+
+
+async def timed(label: str, calls, texts, stub_stats) -> bool:
+    start = time.perf_counter()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    wall = time.perf_counter() - start
+
+    wrong = sum(
+        1 for text, result in zip(texts, results)
+        if isinstance(result, BaseException) or result.get("invoice_number") not in text
+    )
+    print(f"{label:<9} invoices={len(texts)} wall={wall:.2f}s throughput={len(texts) / wall:.1f}/s "
+          f"requests={stub_stats['requests']} wrong_or_failed={wrong}")
+    return wrong == 0
+
+
+async def run(args) -> bool:
+    # Imported here: Settings reads the environment prepared in main()
+    from app.services.ai_extractor import AIExtractor
+    from app.services.llm_batcher import ExtractionBatcher
+    from benchmarks import gemini_stub
+
+    fixtures, texts = invoices(args.invoices)
+    gemini_stub.config.fixtures = fixtures
+    extractor = AIExtractor()
+
+    gemini_stub.reset_stats()
+    ok = await timed("single", (extractor.extract_async(text, []) for text in texts), texts, gemini_stub.stats)
+
+    gemini_stub.reset_stats()
+    batcher = ExtractionBatcher(extractor, executor=None, max_items=args.batch_items)
+    ok &= await timed("batched", (batcher.submit(text, []) for text in texts), texts, gemini_stub.stats)
+    print("batcher:", batcher.stats)
+
+    await extractor.aclose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--invoices", type=int, default=64)
+    parser.add_argument("--batch-items", type=int, default=8)
+    parser.add_argument("--batch-drop", type=int, default=0, help="ids the stand-in leaves out of every batch answer")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8014)
+    parser.add_argument("--latency-ms", type=float, default=400)
+    parser.add_argument("--decode-ms-per-token", type=float, default=1)
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = "http"
+    os.environ["LLM_ASYNC"] = "true"
+    os.environ["GEMINI_API_BASE"] = f"http://127.0.0.1:{args.port}"
+    os.environ["LLM_CONCURRENCY"] = str(args.concurrency)
+
+    from benchmarks import gemini_stub
+
+    gemini_stub.config.latency_ms = args.latency_ms
+    gemini_stub.config.jitter_ms = 0
+    gemini_stub.config.decode_ms_per_token = args.decode_ms_per_token
+    gemini_stub.config.batch_drop = args.batch_drop
+    gemini_stub.serve_in_background(port=args.port)
+
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: async extraction throughput under the LLM rate limiter
+=================================================================
+Fires N concurrent AIExtractor.extract_async calls and reports wall time,
+latency percentiles and how many 429s the provider returned.
+
+Meant to run against the local stand-in (no network, no quota):
+    python -m benchmarks.gemini_stub --port 8001 --rpm 120 --error-429 0.05 &
+    LLM_PROVIDER=http GEMINI_API_BASE=http://127.0.0.1:8001 \\
+        LLM_CONCURRENCY=16 LLM_RPM=100 python -m benchmarks.llm_concurrency --requests 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+from app.services.ai_extractor import AIExtractor
+from app.utils.config import settings
+
+SAMPLE_TEXT = "Invoice No 123100401\nDate 1. März 2024\nTotal 453,53 €\n" * 20
+
+
+async def run(requests: int):
+    extractor = AIExtractor()
+    latencies = []
+    failures = 0
+
+    async def one():
+        nonlocal failures
+        start = time.perf_counter()
+        try:
+            await extractor.extract_async(SAMPLE_TEXT, [])
+            latencies.append(time.perf_counter() - start)
+        except Exception as e:
+            failures += 1
+            print(f"  ❌ {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    wall = time.perf_counter() - start
+    await extractor.aclose()
+
+    print(f"requests={requests} ok={len(latencies)} failed={failures} wall={wall:.2f}s "
+          f"throughput={len(latencies) / wall:.1f}/s")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(f"latency p50={statistics.median(latencies):.3f}s p95={p95:.3f}s max={latencies[-1]:.3f}s")
+
+    try:
+        async with httpx.AsyncClient(base_url=settings.GEMINI_API_BASE) as client:
+            print("stub stats:", (await client.get("/stats")).json())
+    except httpx.HTTPError:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"base={settings.GEMINI_API_BASE} in_flight={settings.LLM_CONCURRENCY} "
+          f"rpm={settings.LLM_RPM} tpm={settings.LLM_TPM}")
+    asyncio.run(run(args.requests))
+
+
+if __name__ == "__main__":
+    main()
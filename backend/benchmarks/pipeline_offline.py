@@ -0,0 +1,103 @@
+"""
+Benchmark: full extraction pipeline with no network
+===================================================
+Starts the Gemini stand-in (benchmarks/gemini_stub.py) in-process, points
+the http LLM backend at it and pushes the test invoices through
+ExtractionPipeline (parse pool + LLM path) concurrently. Exits non-zero
+if any document failed, so it doubles as an offline CI smoke test.
+
+Run from backend/:
+    python -m benchmarks.pipeline_offline
+    python -m benchmarks.pipeline_offline --documents 40 --concurrency 8 --latency-ms 300 --error-5xx 0.05
+    python -m benchmarks.pipeline_offline --rules          # let the rule fast path answer first
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+TEST_INVOICES = Path(__file__).resolve().parent.parent / "test_invoices"
+
+
+async def run(args) -> int:
+    # Imported here: Settings reads the environment prepared in main()
+    from app.services.ai_extractor import AIExtractor
+    from app.services.pipeline import ExtractionPipeline
+    from benchmarks import gemini_stub
+
+    pdfs = sorted(str(p) for p in TEST_INVOICES.glob("*.pdf"))
+    documents = [pdfs[i % len(pdfs)] for i in range(args.documents)]
+
+    extractor = AIExtractor()
+    pipeline = ExtractionPipeline(extractor, parse_workers=args.parse_workers)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, failures = [], 0
+
+    async def one(path: str):
+        nonlocal failures
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await pipeline.run(path)
+                latencies.append(time.perf_counter() - start)
+            except Exception as e:
+                failures += 1
+                print(f"  ❌ {Path(path).name}: {type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in documents))
+    wall = time.perf_counter() - start
+
+    pipeline.shutdown()
+    await extractor.aclose()
+
+    print(f"documents={len(documents)} ok={len(latencies)} failed={failures} wall={wall:.2f}s "
+          f"throughput={len(latencies) / wall:.1f}/s")
+    if latencies:
+        latencies.sort()
+        p95 = latencies[int(0.95 * (len(latencies) - 1))]
+        print(f"latency p50={statistics.median(latencies):.3f}s p95={p95:.3f}s max={latencies[-1]:.3f}s")
+    if pipeline.rules:
+        print("rule fast path:", pipeline.rules.stats)
+    print("stub stats:", gemini_stub.stats)
+
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--parse-workers", type=int, default=0, help="0 = parse in a thread")
+    parser.add_argument("--port", type=int, default=8011)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--error-429", type=float, default=0.0)
+    parser.add_argument("--error-5xx", type=float, default=0.0)
+    parser.add_argument("--fixture", help="JSON file returned as the model output")
+    parser.add_argument("--rules", action="store_true", help="keep the rule-based fast path on")
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = "http"
+    os.environ["GEMINI_API_BASE"] = f"http://127.0.0.1:{args.port}"
+    os.environ["RESULT_CACHE_ENABLED"] = "false"
+    os.environ["RULE_FASTPATH_ENABLED"] = "true" if args.rules else "false"
+    os.environ.setdefault("LLM_BACKOFF_BASE_SECONDS", "0.05")
+
+    from benchmarks import gemini_stub
+
+    gemini_stub.config.latency_ms = args.latency_ms
+    gemini_stub.config.error_429 = args.error_429
+    gemini_stub.config.error_5xx = args.error_5xx
+    if args.fixture:
+        gemini_stub.config.fixture = gemini_stub.json.loads(Path(args.fixture).read_text())
+    gemini_stub.serve_in_background(port=args.port)
+
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark: implicit caching of the static prompt prefix
+=======================================================
+Parses the sample invoices once, then extracts them through the http
+backend against the Gemini stand-in, which serves the start a prompt
+shares with recent prompts from its implicit prefix cache once it
+reaches --cache-min-tokens (Gemini: 1024). The run is repeated with no
+minimum to show what caching the whole static prefix would save. The
+stub charges --prefill-ms-per-1k for every uncached prompt token, and
+cost uses the LLM_PRICE_* settings.
+
+Run from backend/:
+    python -m benchmarks.prompt_cache
+    python -m benchmarks.prompt_cache --calls 40 --prefill-ms-per-1k 300
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+from pathlib import Path
+
+TEST_INVOICES = Path(__file__).resolve().parent.parent / "test_invoices"
+
+
+async def run_calls(extractor, documents, calls: int):
+    records = []
+    for i in range(calls):
+        parsed = documents[i % len(documents)]
+        # A different document every call: only the static prefix is shared
+        result = await extractor.extract_async(f"Copy {i}\n{parsed['text']}", parsed["tables"])
+        records.append(result["_metadata"]["llm"])
+    return records
+
+
+def summary(label: str, records) -> str:
+    seconds = statistics.mean(r["seconds"] for r in records)
+    cached = sum(r["prefix_cached_tokens"] for r in records)
+    billed = sum(r["prefix_billed_tokens"] for r in records)
+    cost = sum(r["cost_usd"] for r in records)
+    return (f"{label:<12} avg={seconds:.3f}s prefix_cached={cached:>6} prefix_billed={billed:>6} "
+            f"cost=${cost:.6f}")
+
+
+async def run(args):
+    # Imported here: Settings reads the environment prepared in main()
+    from app.services.ai_extractor import AIExtractor
+    from app.services.gemini_client import estimate_tokens
+    from app.services.pdf_processor import PDFProcessor
+    from benchmarks import gemini_stub
+
+    processor = PDFProcessor()
+    documents = [processor.process(str(p)) for p in sorted(TEST_INVOICES.glob("*.pdf"))]
+
+    extractor = AIExtractor()
+    print(f"static prefix: ~{estimate_tokens(extractor.prefix)} tokens, "
+          f"provider caching minimum: {args.cache_min_tokens}")
+
+    for label, minimum in ((f"min={args.cache_min_tokens}", args.cache_min_tokens), ("min=0", 0)):
+        gemini_stub.config.cache_min_tokens = minimum
+        gemini_stub.reset_stats()
+        print(summary(label, await run_calls(extractor, documents, args.calls)))
+
+    await extractor.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8012)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=200)
+    parser.add_argument("--cache-min-tokens", type=int, default=1024)
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = "http"
+    os.environ["GEMINI_API_BASE"] = f"http://127.0.0.1:{args.port}"
+
+    from benchmarks import gemini_stub
+
+    gemini_stub.config.latency_ms = args.latency_ms
+    gemini_stub.config.jitter_ms = 0
+    gemini_stub.config.prefill_ms_per_1k = args.prefill_ms_per_1k
+    gemini_stub.serve_in_background(port=args.port)
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: prompt tokens spent on TABLES, indented JSON vs. compact rows
+=======================================================================
+Parses each PDF with PDFProcessor and compares the size of the TABLES
+section of the prompt in both encodings.
+
+Token counts come from Gemini's count_tokens when GEMINI_API_KEY is set,
+otherwise from a ~4 chars/token estimate.
+
+Run from backend/:
+    python -m benchmarks.prompt_tokens
+    python -m benchmarks.prompt_tokens path/to/a.pdf path/to/b.pdf
+"""
+
+import argparse
+from pathlib import Path
+
+from app.services.ai_extractor import format_tables
+from app.services.gemini_client import estimate_tokens
+from app.services.pdf_processor import PDFProcessor
+from app.utils.config import settings
+
+SAMPLE_PDF = Path(__file__).resolve().parent.parent / "test_invoices" / "sampleinvoice.pdf"
+
+
+def token_counter():
+    if not settings.GEMINI_API_KEY:
+        return estimate_tokens, "estimate"
+
+    import google.generativeai as genai
+
+    genai.configure(api_key=settings.GEMINI_API_KEY)
+    model = genai.GenerativeModel(model_name="models/gemini-2.5-flash")
+    return (lambda text: model.count_tokens(text).total_tokens), "count_tokens"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdfs", nargs="*", default=[str(SAMPLE_PDF)])
+    args = parser.parse_args()
+
+    count, source = token_counter()
+    processor = PDFProcessor()
+
+    print(f"Token source: {source}")
+    print(f"{'file':<32} {'rows':>5} {'json':>7} {'compact':>8} {'saved':>7}")
+
+    total_json = total_compact = 0
+    for pdf in args.pdfs:
+        parsed = processor.process(pdf)
+        tables = parsed["tables"]
+        rows = sum(len(t) for t in tables)
+
+        json_tokens = count(format_tables(tables, compact=False))
+        compact_tokens = count(format_tables(tables, compact=True))
+        total_json += json_tokens
+        total_compact += compact_tokens
+
+        saved = 1 - compact_tokens / json_tokens if json_tokens else 0
+        print(f"{Path(pdf).name[:32]:<32} {rows:>5} {json_tokens:>7} {compact_tokens:>8} {saved:>6.1%}")
+
+    if total_json:
+        print(f"{'TOTAL':<32} {'':>5} {total_json:>7} {total_compact:>8} {1 - total_compact / total_json:>6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: boilerplate pruning, tokens saved vs. extraction accuracy
+====================================================================
+For every test_invoices/<name>.pdf with a <name>.golden.json answer:
+- prompt text tokens before / after TextPruner
+- golden values (invoice number, vendor, customer, amounts) still present
+  in the pruned text
+- field accuracy against the golden answer, full vs. pruned text, with
+  the rule extractor and (--llm) with AIExtractor on the configured
+  LLM_PROVIDER
+
+Exits non-zero if pruning loses a golden value or lowers accuracy, so it
+can gate changes to the phrase list.
+
+Run from backend/:
+    python -m benchmarks.pruning_golden
+    python -m benchmarks.pruning_golden --llm          # needs GEMINI_API_KEY (or LLM_PROVIDER=http)
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from app.services.pdf_processor import PDFProcessor
+from app.services.rule_extractor import find_amounts, parse_amount
+from app.services.text_pruner import TextPruner
+
+TEST_INVOICES = Path(__file__).resolve().parent.parent / "test_invoices"
+
+FIELDS = ("invoice_number", "invoice_date", "vendor", "customer", "subtotal", "tax_amount", "total", "currency", "items")
+
+
+def _value(data, field):
+    value = data.get(field)
+    if field in ("vendor", "customer"):
+        return " ".join(str((value or {}).get("name") or "").lower().split())
+    if field in ("subtotal", "tax_amount", "total"):
+        return parse_amount(value)
+    if field == "items":
+        items = [item for item in value or [] if isinstance(item, dict)]
+        return len(items), round(sum(parse_amount(item.get("total")) or 0 for item in items), 2)
+    return value
+
+
+def accuracy(result, golden) -> float:
+    return sum(_value(result, f) == _value(golden, f) for f in FIELDS) / len(FIELDS)
+
+
+def missing_values(full_text: str, pruned_text: str, golden) -> list:
+    """Golden values found in the full text but not in the pruned one."""
+    values = [golden.get("invoice_number"), (golden.get("vendor") or {}).get("name"),
+              (golden.get("customer") or {}).get("name")]
+    missing = [v for v in values if v and v in full_text and v not in pruned_text]
+
+    pruned_amounts = {amount for _, amount in find_amounts(pruned_text)}
+    for field in ("subtotal", "tax_amount", "total"):
+        amount = parse_amount(golden.get(field))
+        if amount is not None and amount not in pruned_amounts:
+            missing.append(f"{field}={amount}")
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm", action="store_true", help="also compare AIExtractor on full vs. pruned text")
+    args = parser.parse_args()
+
+    from app.services.rule_extractor import RuleExtractor
+
+    extractors = {"rules": lambda parsed: RuleExtractor().extract(parsed["text"], parsed["tables"])}
+    if args.llm:
+        from app.services.ai_extractor import AIExtractor
+
+        ai = AIExtractor()
+        extractors["llm"] = lambda parsed: ai.extract(parsed["text"], parsed["tables"])
+
+    processor, pruner = PDFProcessor(), TextPruner()
+    failed = False
+
+    for golden_path in sorted(TEST_INVOICES.glob("*.golden.json")):
+        pdf = golden_path.with_name(golden_path.name.replace(".golden.json", ".pdf"))
+        golden = json.loads(golden_path.read_text(encoding="utf-8"))
+
+        parsed = processor.process(str(pdf))
+        pruned = pruner.prune(parsed)
+        report = pruned["pruning"]
+        print(f"{pdf.name}: tokens {report['tokens_before']} -> {report['tokens_after']} "
+              f"(-{report['tokens_saved']}) dropped={report['lines_dropped']}")
+
+        missing = missing_values(parsed["text"], pruned["text"], golden)
+        if missing:
+            failed = True
+            print(f"  ❌ golden values pruned away: {missing}")
+
+        for name, extract in extractors.items():
+            full, after = accuracy(extract(parsed), golden), accuracy(extract(pruned), golden)
+            failed |= after < full
+            print(f"  {name:<5} accuracy full={full:.2f} pruned={after:.2f}{'  ❌' if after < full else ''}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
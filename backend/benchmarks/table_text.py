@@ -0,0 +1,75 @@
+"""
+Benchmark: prompt with vs. without the table regions in TEXT
+============================================================
+For every test_invoices/<name>.pdf with a <name>.golden.json answer:
+- per-document prompt tokens (TEXT + TABLES) with the full text and with
+  the table regions replaced by placeholders (EXCLUDE_TABLE_TEXT)
+- golden values still present in the stripped prompt (TEXT or TABLES)
+- (--llm) AIExtractor field accuracy on both prompts, on the configured
+  LLM_PROVIDER
+
+Exits non-zero if a golden value is lost or accuracy drops.
+
+Run from backend/:
+    python -m benchmarks.table_text
+    python -m benchmarks.table_text --llm          # needs GEMINI_API_KEY (or LLM_PROVIDER=http)
+"""
+
+import argparse
+import json
+import sys
+
+from app.services.ai_extractor import format_tables
+from app.services.gemini_client import estimate_tokens
+from app.services.pdf_processor import PDFProcessor
+from app.utils.config import settings
+from benchmarks.pruning_golden import TEST_INVOICES, accuracy, missing_values
+
+
+def prompt_tokens(text: str, tables) -> int:
+    return estimate_tokens(f"TEXT:\n{text}\n\nTABLES:\n{format_tables(tables, compact=settings.COMPACT_TABLES)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--llm", action="store_true", help="also compare AIExtractor on both prompts")
+    args = parser.parse_args()
+
+    extract = None
+    if args.llm:
+        from app.services.ai_extractor import AIExtractor
+
+        ai = AIExtractor()
+        extract = lambda text, tables: ai.extract(text, tables)
+
+    processor = PDFProcessor()
+    failed = False
+
+    for golden_path in sorted(TEST_INVOICES.glob("*.golden.json")):
+        pdf = golden_path.with_name(golden_path.name.replace(".golden.json", ".pdf"))
+        golden = json.loads(golden_path.read_text(encoding="utf-8"))
+
+        parsed = processor.process(str(pdf))
+        text, tables = parsed["text"], parsed["tables"]
+        stripped = parsed.get("prompt_text", text)
+
+        before, after = prompt_tokens(text, tables), prompt_tokens(stripped, tables)
+        print(f"{pdf.name}: tables removed={parsed.get('tables_removed', 0)} "
+              f"prompt tokens {before} -> {after} (-{before - after}, {100 * (before - after) / before:.0f}%)")
+
+        tables_text = format_tables(tables)
+        missing = missing_values(text + "\n" + tables_text, stripped + "\n" + tables_text, golden)
+        if missing:
+            failed = True
+            print(f"  ❌ golden values lost: {missing}")
+
+        if extract:
+            full, after = accuracy(extract(text, tables), golden), accuracy(extract(stripped, tables), golden)
+            failed |= after < full
+            print(f"  llm   accuracy full={full:.2f} stripped={after:.2f}{'  ❌' if after < full else ''}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: PDFProcessor text extraction, sequential vs. sharded
+================================================================
+Builds synthetic long PDFs by repeating the sample invoice pages and
+times extract_text_with_offsets for each page count / worker count.
+
+Run from backend/:
+    python -m benchmarks.text_extraction
+    python -m benchmarks.text_extraction --pages 20 100 300 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from pypdf import PdfReader, PdfWriter
+
+from app.services.pdf_processor import PDFProcessor
+
+SAMPLE_PDF = Path(__file__).resolve().parent.parent / "test_invoices" / "sampleinvoice.pdf"
+
+
+def build_pdf(page_count: int, out_dir: str) -> str:
+    reader = PdfReader(str(SAMPLE_PDF))
+    writer = PdfWriter()
+    for i in range(page_count):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+
+    path = os.path.join(out_dir, f"bench_{page_count}p.pdf")
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def time_extract(pdf_path: str, workers: int, repeat: int) -> float:
+    processor = PDFProcessor(text_workers=workers)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        processor.extract_text_with_offsets(pdf_path, parallel=workers > 1)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100, 200])
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"CPU cores: {os.cpu_count()}")
+    print(f"{'pages':>6} {'workers':>8} {'seconds':>9} {'speedup':>8}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            pdf_path = build_pdf(pages, tmp)
+            baseline = None
+            for workers in args.workers:
+                elapsed = time_extract(pdf_path, workers, args.repeat)
+                baseline = baseline or elapsed
+                print(f"{pages:>6} {workers:>8} {elapsed:>9.3f} {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
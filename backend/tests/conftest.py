@@ -0,0 +1,32 @@
+import socket
+import sys
+from pathlib import Path
+
+import pytest
+
+# Tests import the app as `app.…`, like the server run from backend/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def stub_url():
+    """benchmarks/gemini_stub.py served on a free local port for the whole run."""
+    from benchmarks import gemini_stub
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    gemini_stub.serve_in_background(port=port)
+    return f"http://127.0.0.1:{port}"
+
+
+@pytest.fixture
+def stub(stub_url):
+    """The stub with default settings (fast, no jitter) and zeroed stats."""
+    from benchmarks import gemini_stub
+
+    gemini_stub.config = gemini_stub.StubConfig()
+    gemini_stub.config.latency_ms = 20
+    gemini_stub.config.jitter_ms = 0
+    gemini_stub.reset_stats()
+    return gemini_stub
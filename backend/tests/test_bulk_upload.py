@@ -0,0 +1,77 @@
+import io
+import json
+import os
+import sys
+import zipfile
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.services.pipeline import PipelineOverloaded
+from app.utils.config import settings
+
+SAMPLE = Path(__file__).resolve().parent.parent / "test_invoices" / "sampleinvoice.pdf"
+
+
+class FakePipeline:
+    """Admits a document only after `busy` PipelineOverloaded rejections."""
+
+    def __init__(self, busy: int):
+        self.busy = busy
+        self.runs = []
+
+    def lookup(self, digest):
+        return None
+
+    async def run(self, source, digest=None, on_stage=None):
+        if self.busy:
+            self.busy -= 1
+            raise PipelineOverloaded("busy")
+        self.runs.append(source)
+        return {"invoice_number": "123100401"}
+
+    async def process(self, *args, **kwargs):
+        raise AssertionError("bulk uploads must go through the admission gate (pipeline.run)")
+
+
+@pytest.fixture
+def main(monkeypatch, tmp_path):
+    # app.main opens its stores and creates uploads/ at import time: keep
+    # all of that under tmp_path instead of the developer's backend/ state
+    monkeypatch.setenv("MONGO_URI", os.getenv("MONGO_URI") or "mongodb://127.0.0.1:1")
+    monkeypatch.setattr(settings, "LLM_PROVIDER", "http")
+    monkeypatch.setattr(settings, "OVERLOAD_RETRY_AFTER_SECONDS", 0)
+    monkeypatch.setattr(settings, "RESULT_CACHE_DB", tmp_path / "results.sqlite3")
+    monkeypatch.setattr(settings, "JOB_DB", tmp_path / "jobs.sqlite3")
+    monkeypatch.setattr(settings, "TEMPLATE_DB", tmp_path / "templates.sqlite3")
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delitem(sys.modules, "app.main", raising=False)
+    import app.main as main
+
+    pipeline = main.pipeline
+    yield main
+    pipeline.shutdown()
+    sys.modules.pop("app.main", None)
+
+
+def test_bulk_zip_waits_out_the_admission_gate(main, monkeypatch):
+    pipeline = FakePipeline(busy=2)
+    monkeypatch.setattr(main, "pipeline", pipeline)
+
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        zf.writestr("a.pdf", SAMPLE.read_bytes())
+        zf.writestr("b/b.pdf", SAMPLE.read_bytes() + b"\n")
+        zf.writestr("notes.txt", "not a pdf")
+
+    response = TestClient(main.app).post(
+        "/extract-invoices/bulk",
+        files=[("files", ("batch.zip", archive.getvalue(), "application/zip"))]
+    )
+
+    lines = {line["file_name"]: line for line in map(json.loads, response.text.splitlines())}
+    assert lines["a.pdf"]["status"] == "ok"
+    assert lines["b/b.pdf"]["result"] == {"invoice_number": "123100401"}
+    assert lines["notes.txt"] == {"file_name": "notes.txt", "status": "error", "error": "Only PDF allowed"}
+    assert len(pipeline.runs) == 2
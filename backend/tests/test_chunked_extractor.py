@@ -0,0 +1,50 @@
+from app.services.chunked_extractor import merge_chunks
+
+EMPTY_HEADER = {
+    "invoice_number": None,
+    "invoice_date": None,
+    "vendor": {"name": None, "address": None},
+    "customer": {"name": None},
+    "currency": None,
+}
+
+
+def test_empty_party_from_an_earlier_chunk_does_not_win():
+    results = [
+        {**EMPTY_HEADER, "items": [{"description": "Seat", "quantity": 1, "unit_price": 10.0, "total": 10.0}]},
+        {
+            **EMPTY_HEADER,
+            "invoice_number": "123100401",
+            "vendor": {"name": "CPB Software (Germany) GmbH", "address": None},
+            "customer": {"name": "Musterkunde AG"},
+            "items": [],
+            "total": 10.0,
+        },
+    ]
+
+    merged = merge_chunks(results)
+
+    assert merged["vendor"] == {"name": "CPB Software (Germany) GmbH", "address": None}
+    assert merged["customer"] == {"name": "Musterkunde AG"}
+    assert merged["invoice_number"] == "123100401"
+    assert merged["total"] == 10.0
+
+
+def test_party_missing_from_every_chunk_is_none():
+    merged = merge_chunks([{**EMPTY_HEADER, "items": []}, {**EMPTY_HEADER, "items": []}])
+
+    assert merged["vendor"] is None
+    assert merged["customer"] is None
+
+
+def test_repeated_row_at_a_chunk_boundary_is_dropped_once():
+    row = {"description": "Seat  licence", "quantity": 2, "unit_price": 5.0, "total": 10.0}
+    results = [
+        {**EMPTY_HEADER, "items": [dict(row, description="Other"), row]},
+        {**EMPTY_HEADER, "items": [dict(row, description="seat licence"), row]},
+    ]
+
+    merged = merge_chunks(results)
+
+    assert len(merged["items"]) == 3
+    assert merged["_metadata"] == {"duplicate_items_dropped": 1}
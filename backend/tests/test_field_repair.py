@@ -0,0 +1,82 @@
+import asyncio
+
+from app.services.field_repair import FieldRepairer, find_issues
+
+PARSED = {
+    "text": "ACME GmbH\nInvoice No 4711\nDate 01.03.2024\nNet 100,00 €\nVAT 19,00 €\nTotal 119,00 €",
+    "tables": [],
+    "page_offsets": [],
+}
+
+
+def invoice(**fields):
+    data = {
+        "invoice_number": "4711",
+        "invoice_date": "2024-03-01",
+        "vendor": {"name": "ACME GmbH", "address": None},
+        "customer": {"name": "Musterkunde AG"},
+        "items": [{"description": "Service", "quantity": 1, "unit_price": 100.0, "total": 100.0}],
+        "subtotal": 100.0,
+        "tax_amount": 19.0,
+        "total": 119.0,
+        "currency": "EUR",
+    }
+    data.update(fields)
+    return data
+
+
+class FakeExtractor:
+    """Answers every repair call with `answer` (or raises it)."""
+
+    def __init__(self, answer):
+        self.answer = answer
+        self.prompts = []
+
+    async def complete_async(self, prompt, kind):
+        self.prompts.append(prompt)
+        if isinstance(self.answer, Exception):
+            raise self.answer
+        return self.answer, {"kind": kind}
+
+
+def repair(data, answer):
+    extractor = FakeExtractor(answer)
+    result = asyncio.run(FieldRepairer(extractor).repair(data, PARSED))
+    return result, extractor
+
+
+def test_string_vendor_in_extraction_is_not_an_issue():
+    data = invoice(vendor="ACME GmbH", customer="Musterkunde AG")
+    result, extractor = repair(data, {})
+
+    assert result["vendor"] == {"name": "ACME GmbH"}
+    assert result["customer"] == {"name": "Musterkunde AG"}
+    assert extractor.prompts == []
+
+
+def test_find_issues_treats_string_vendor_as_missing():
+    assert find_issues(invoice(vendor="ACME GmbH")) == {"header": ["vendor missing"]}
+    assert find_issues(["not", "an", "object"]) == {"header": ["answer is not a JSON object"]}
+
+
+def test_string_vendor_in_repair_answer_is_applied_as_object():
+    result, extractor = repair(invoice(vendor=None), {"vendor": "ACME GmbH"})
+
+    assert result["vendor"] == {"name": "ACME GmbH"}
+    assert result["_metadata"]["repair"]["repaired"] == ["header"]
+    assert 'vendor = an object {"name", "address"}' in extractor.prompts[0]
+
+
+def test_malformed_repair_answer_keeps_first_result():
+    data = invoice(vendor=None)
+    result, _ = repair(data, ["ACME GmbH"])
+
+    assert result["vendor"] is None
+    assert result["_metadata"]["repair"]["repaired"] == []
+
+
+def test_failed_repair_call_keeps_first_result():
+    result, _ = repair(invoice(total=None), RuntimeError("boom"))
+
+    assert result["total"] is None
+    assert result["_metadata"]["repair"]["error"] == "RuntimeError: boom"
@@ -0,0 +1,11 @@
+from app.services.ai_extractor import PROMPT_PREFIX, format_tables
+
+
+def test_pipe_in_a_cell_is_escaped_not_replaced():
+    table = [{"Part | No": "AB|12/7", "IBAN": "DE89 3704|0044"}]
+
+    lines = format_tables([table]).splitlines()
+
+    assert lines[-2] == "Part \\| No | IBAN"
+    assert lines[-1] == "AB\\|12/7 | DE89 3704\\|0044"
+    assert '"\\|" inside a cell is a literal "|"' in PROMPT_PREFIX
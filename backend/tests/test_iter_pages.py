@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import camelot
+from pypdf import PdfReader, PdfWriter
+
+from app.services.pdf_processor import PDFProcessor
+
+SAMPLE = Path(__file__).resolve().parent.parent / "test_invoices" / "sampleinvoice.pdf"
+
+
+def long_pdf(tmp_path, pages: int) -> str:
+    reader = PdfReader(str(SAMPLE))
+    writer = PdfWriter()
+    for i in range(pages):
+        writer.add_page(reader.pages[i % len(reader.pages)])
+    path = tmp_path / "long.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_first_page_is_yielded_before_later_pages_are_parsed(tmp_path):
+    processor = PDFProcessor()
+
+    with processor.open(long_pdf(tmp_path, 6)) as doc:
+        pages = processor.iter_pages(doc, tables=False)
+        first = next(pages)
+
+        assert first["page"] == 1
+        assert "123100401" in first["text"]
+        assert first["words"] and {"text", "x0", "top"} <= set(first["words"][0])
+        assert all(page._text is None and page._words is None for page in doc.pages[1:])
+
+        second = next(pages)
+
+        # Page 1 was released once the consumer moved on
+        assert second["page"] == 2
+        assert doc.pages[0]._text is None and doc.pages[0]._words is None
+        assert [result["page"] for result in pages] == [3, 4, 5, 6]
+
+
+def test_camelot_reads_one_page_file_per_planned_page(tmp_path, monkeypatch):
+    calls = []
+    read_pdf = camelot.read_pdf
+
+    def recording_read_pdf(path, **kwargs):
+        calls.append((len(PdfReader(path).pages), kwargs["pages"]))
+        return read_pdf(path, **kwargs)
+
+    monkeypatch.setattr(camelot, "read_pdf", recording_read_pdf)
+    processor = PDFProcessor()
+    path = long_pdf(tmp_path, 4)
+
+    results = list(processor.iter_pages(path))
+
+    planned = [result["page"] for result in results if result["table_decision"]["run"]]
+    assert calls == [(1, "1")] * len(planned)
+    # Same tables as the whole-document pass, page by page
+    assert [table for result in results for table in result["tables"]] == processor.process(path)["tables"]
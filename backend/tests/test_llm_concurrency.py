@@ -0,0 +1,258 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from app.services.gemini_client import AsyncGeminiClient, LLMError
+from app.services.llm_retry import RetryPolicy
+from app.services.rate_limiter import LLMRateLimiter
+from app.utils.config import settings
+
+MAX_RETRIES = 2
+
+
+class RecordingLimiter(LLMRateLimiter):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.cool_downs = []
+
+    def cool_down(self, seconds: float):
+        self.cool_downs.append(seconds)
+        super().cool_down(seconds)
+
+
+def make_client(stub_url: str, max_in_flight: int = 4, cap: float = 0.05) -> AsyncGeminiClient:
+    client = AsyncGeminiClient(
+        api_key="test",
+        base_url=stub_url,
+        limiter=RecordingLimiter(max_in_flight=max_in_flight, rpm=0, tpm=0)
+    )
+    client.retry = RetryPolicy(max_retries=MAX_RETRIES, base=0.01, cap=cap)
+    return client
+
+
+async def generate(client: AsyncGeminiClient, info: dict):
+    try:
+        return await client.generate("prompt", info=info)
+    finally:
+        await client.aclose()
+
+
+def test_transient_5xx_is_retried_until_max_retries(stub, stub_url):
+    stub.config.error_5xx = 1.0
+    info = {}
+
+    with pytest.raises(LLMError) as error:
+        asyncio.run(generate(make_client(stub_url), info))
+
+    assert error.value.status_code == 503
+    assert stub.stats["5xx"] == MAX_RETRIES + 1
+    assert info["retries"] == MAX_RETRIES
+
+
+def test_retry_succeeds_once_the_provider_recovers(stub, stub_url):
+    stub.config.error_5xx = 1.0
+    client = make_client(stub_url)
+    info = {}
+
+    async def run():
+        call = asyncio.ensure_future(generate(client, info))
+        while stub.stats["5xx"] < 1:
+            await asyncio.sleep(0.005)
+        stub.config.error_5xx = 0.0
+        return await call
+
+    text, usage = asyncio.run(run())
+    assert '"invoice_number"' in text
+    assert info["retries"] >= 1
+    assert usage["candidatesTokenCount"] > 0
+
+
+def test_429_cools_down_the_shared_limiter(stub, stub_url):
+    stub.config.error_429 = 1.0
+    client = make_client(stub_url, cap=0.2)
+    info = {}
+
+    with pytest.raises(LLMError) as error:
+        asyncio.run(generate(client, info))
+
+    assert error.value.status_code == 429
+    assert stub.stats["429"] == MAX_RETRIES + 1
+    # Retry-After (1s) capped at LLM_BACKOFF_MAX_SECONDS, applied to every caller
+    assert client.limiter.cool_downs == [0.2] * MAX_RETRIES
+
+
+def test_cool_down_holds_back_new_requests():
+    limiter = LLMRateLimiter(max_in_flight=2, rpm=0, tpm=0)
+
+    async def run():
+        limiter.cool_down(0.2)
+        start = time.monotonic()
+        async with limiter.slot(10):
+            return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.19
+
+
+def test_timeouts_are_retried(stub, stub_url):
+    stub.config.hang = 1.0
+    stub.config.hang_seconds = 0.5
+    client = make_client(stub_url)
+    client.timeout = 0.2
+    info = {}
+
+    with pytest.raises(httpx.TimeoutException):
+        asyncio.run(generate(client, info))
+
+    assert stub.stats["hung"] == MAX_RETRIES + 1
+    assert info["retries"] == MAX_RETRIES
+    # Let the abandoned requests finish before the next test reads the stats
+    time.sleep(stub.config.hang_seconds)
+
+
+def test_in_flight_requests_are_capped(stub, stub_url):
+    stub.config.latency_ms = 100
+    client = make_client(stub_url, max_in_flight=2)
+
+    async def run():
+        try:
+            await asyncio.gather(*(client.generate(f"prompt {i}") for i in range(6)))
+        finally:
+            await client.aclose()
+
+    start = time.monotonic()
+    asyncio.run(run())
+
+    assert stub.stats["ok"] == 6
+    assert stub.stats["max_in_flight"] == 2
+    # 6 requests, 2 at a time, 100 ms each
+    assert time.monotonic() - start >= 0.29
+
+
+class NoExecutor(ThreadPoolExecutor):
+    def submit(self, *args, **kwargs):
+        raise AssertionError("LLM_ASYNC batches must not use the thread pool")
+
+
+@pytest.fixture
+def batcher(stub, stub_url, monkeypatch):
+    """ExtractionBatcher on the async client; records the limiter slots it takes."""
+    from app.services.ai_extractor import AIExtractor
+    from app.services.llm_backends import HTTPBackend
+    from app.services.llm_batcher import ExtractionBatcher
+
+    monkeypatch.setattr(settings, "LLM_ASYNC", True)
+    stub.config.fixtures = [
+        {**stub.DEFAULT_INVOICE, "invoice_number": "INV-1001", "total": 100.0},
+        {**stub.DEFAULT_INVOICE, "invoice_number": "INV-2002", "total": 200.0},
+    ]
+    backend = HTTPBackend(base_url=stub_url)
+    backend.async_client.retry = RetryPolicy(max_retries=1, base=0.01, cap=0.05)
+    limiter = backend.async_client.limiter
+    original_slot = limiter.slot
+    slots = []
+
+    def counting_slot(estimated_tokens):
+        slots.append(estimated_tokens)
+        return original_slot(estimated_tokens)
+
+    monkeypatch.setattr(limiter, "slot", counting_slot)
+    executor = NoExecutor(max_workers=1)
+    batcher = ExtractionBatcher(AIExtractor(backend=backend), executor, max_items=2, max_wait_ms=10)
+    batcher.slots = slots
+    yield batcher
+    executor.shutdown()
+
+
+def submit_both(batcher):
+    async def run():
+        try:
+            return await asyncio.gather(
+                batcher.submit("Invoice INV-1001\nTotal 100.00", []),
+                batcher.submit("Invoice INV-2002\nTotal 200.00", []),
+                return_exceptions=True
+            )
+        finally:
+            await batcher.ai_extractor.aclose()
+
+    return asyncio.run(run())
+
+
+def test_batch_answer_goes_back_to_the_right_callers(batcher, stub):
+    first, second = submit_both(batcher)
+
+    assert (first["invoice_number"], first["total"]) == ("INV-1001", 100.0)
+    assert (second["invoice_number"], second["total"]) == ("INV-2002", 200.0)
+    assert first["_metadata"]["batch_size"] == 2
+    assert batcher.stats == {"batches": 1, "batched_invoices": 2, "single_calls": 0, "fallbacks": 0, "failed_batches": 0}
+    # One request for both invoices, through the shared rate limiter
+    assert len(batcher.slots) == 1
+    assert stub.stats["requests"] == 1
+
+
+def test_id_left_out_of_the_batch_answer_falls_back_to_a_single_call(batcher, stub):
+    stub.config.batch_drop = 1
+
+    first, second = submit_both(batcher)
+
+    assert first["invoice_number"] == "INV-1001"
+    assert "batch_size" in first["_metadata"]
+    assert second["invoice_number"] == "INV-2002"
+    assert "batch_size" not in second["_metadata"]
+    assert batcher.stats == {"batches": 1, "batched_invoices": 1, "single_calls": 1, "fallbacks": 1, "failed_batches": 0}
+    assert len(batcher.slots) == 2
+
+
+def test_failed_batch_call_fails_its_callers_without_single_calls(batcher, stub):
+    stub.config.error_5xx = 1.0
+
+    results = submit_both(batcher)
+
+    assert [type(r) for r in results] == [LLMError, LLMError]
+    assert batcher.stats["failed_batches"] == 1
+    assert batcher.stats["single_calls"] == 0
+    # The batch call and its one retry, nothing per invoice
+    assert stub.stats["5xx"] == 2
+
+
+def test_cancelled_call_does_not_leave_its_hedge_primary_running(stub, stub_url, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGING", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 1)
+    stub.config.latency_ms = 300
+    client = make_client(stub_url)
+    # Hedge only after 1s, so the caller is cancelled inside the first wait
+    client.latencies.record("single", 1.0)
+
+    async def run():
+        try:
+            call = asyncio.ensure_future(client.generate("prompt", info={"kind": "single"}))
+            await asyncio.sleep(0.1)
+            assert client.limiter.in_flight == 1
+            call.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await call
+            # Long enough for a cancelled attempt to unwind, far less than the 300 ms request
+            await asyncio.sleep(0.05)
+            return client.limiter.in_flight
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(run()) == 0
+    assert client.stats["hedges"] == 0
+
+
+def test_hedge_delay_is_tracked_per_call_kind(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_HEDGING", True)
+    monkeypatch.setattr(settings, "LLM_HEDGE_MIN_SAMPLES", 3)
+    client = AsyncGeminiClient(api_key="test", base_url="http://127.0.0.1:1")
+
+    for _ in range(10):
+        client.latencies.record("repair", 0.2)
+    assert client._hedge_delay("single") is None
+
+    for seconds in (4.0, 5.0, 6.0):
+        client.latencies.record("single", seconds)
+    assert client._hedge_delay("single") == 6.0
+    assert client._hedge_delay("repair") == 0.2
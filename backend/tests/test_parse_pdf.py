@@ -0,0 +1,54 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+from app.services.pdf_processor import PDFProcessor
+from app.services.pipeline import ExtractionPipeline, parse_pdf
+from app.utils.config import settings
+
+SAMPLE = Path(__file__).resolve().parent.parent / "test_invoices" / "sampleinvoice.pdf"
+
+
+def test_parse_workers_never_shard_text(monkeypatch):
+    # Long-document sharding is configured for every document...
+    monkeypatch.setattr(settings, "TEXT_WORKERS", 4)
+    monkeypatch.setattr(settings, "PARALLEL_TEXT_MIN_PAGES", 1)
+    calls = []
+    monkeypatch.setattr(PDFProcessor, "_extract_text_parallel", lambda self, *args: calls.append(args))
+
+    # ...but a parse worker must not start a nested process pool
+    parsed = parse_pdf(str(SAMPLE))
+
+    assert calls == []
+    assert "123100401" in parsed["text"]
+
+
+def test_thread_parsing_runs_documents_concurrently(monkeypatch):
+    from app.services import pipeline as pipeline_module
+
+    running, peak, lock = [0], [0], threading.Lock()
+
+    def slow_parse(source, parallel):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.1)
+        with lock:
+            running[0] -= 1
+        # PARSE_WORKERS=0: long documents may shard (auto), nothing to nest under
+        return {"parallel": parallel}
+
+    monkeypatch.setattr(pipeline_module, "parse_pdf", slow_parse)
+    pipeline = ExtractionPipeline(ai_extractor=None, parse_workers=0, llm_concurrency=3)
+
+    async def run():
+        return await asyncio.gather(*(pipeline.parse(f"{i}.pdf") for i in range(3)))
+
+    try:
+        results = asyncio.run(run())
+    finally:
+        pipeline.shutdown()
+
+    assert results == [{"parallel": None}] * 3
+    assert peak[0] == 3
@@ -0,0 +1,33 @@
+import asyncio
+
+from app.services.ai_extractor import AIExtractor
+from app.services.gemini_client import estimate_tokens
+from app.services.llm_backends import HTTPBackend
+
+
+def extract_twice(stub_url: str):
+    extractor = AIExtractor(backend=HTTPBackend(base_url=stub_url))
+    try:
+        return [extractor.extract(f"Invoice {i}\nTotal 453.53", [])["_metadata"]["llm"] for i in range(2)]
+    finally:
+        asyncio.run(extractor.aclose())
+
+
+def test_prefix_served_from_the_provider_cache_is_reported(stub, stub_url):
+    stub.config.cache_min_tokens = 0
+
+    first, second = extract_twice(stub_url)
+
+    prefix_tokens = estimate_tokens(AIExtractor(backend=HTTPBackend(base_url=stub_url)).prefix)
+    assert (first["prefix_cached_tokens"], first["prefix_billed_tokens"]) == (0, prefix_tokens)
+    assert (second["prefix_cached_tokens"], second["prefix_billed_tokens"]) == (prefix_tokens, 0)
+    assert second["cost_usd"] < first["cost_usd"]
+
+
+def test_prefix_below_the_provider_minimum_is_billed(stub, stub_url):
+    stub.config.cache_min_tokens = 1024
+
+    records = extract_twice(stub_url)
+
+    assert [r["prefix_cached_tokens"] for r in records] == [0, 0]
+    assert stub.stats["cache_hits"] == 0